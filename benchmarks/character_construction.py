@@ -0,0 +1,58 @@
+"""
+Time it takes to build the Character of tests/fixtures/character.json for each command, from the
+character data and from its snapshot. 'all items' builds every weapon, armor and spell as well (what
+every command paid before they were built on first use) and 'command' only what the command uses.
+Run it from the root of the repository:
+
+    $ python benchmarks/character_construction.py
+"""
+import os
+import sys
+import json
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.character import Character
+from models.character_data import compact_character_data
+
+NUMBER = 2000
+
+# Attributes of the character each command reads
+COMMANDS = [
+    ('/status', lambda c: (c.current_hit_points, c.max_hit_points, c.current_experience)),
+    ('/initiative_roll', lambda c: c.dex_mod),
+    ('/weapons', lambda c: c.weapons),
+    ('/spells', lambda c: c.spells),
+    ('/attack_roll', lambda c: (c.get_weapon('dagger'), c.get_spell('fire-bolt'))),
+]
+
+def all_items(character):
+    return character.weapons, character.armor, character.spells
+
+def usec(build, use):
+    return timeit.timeit(lambda: use(build()), number=NUMBER) / NUMBER * 1000000
+
+def measure():
+    """Returns a list of (command, source, usec with all items, usec with the command's)."""
+    with open('tests/fixtures/character.json', 'r') as jd:
+        character_data = compact_character_data(json.loads(jd.read()))
+    with open('tests/fixtures/race_data.json', 'r') as rd:
+        race_data = json.loads(rd.read())
+    snapshot = Character(character_data, race_data, False).to_snapshot()
+
+    sources = [
+        ('character data', lambda: Character(character_data, race_data, False)),
+        ('snapshot', lambda: Character.from_snapshot(snapshot, character_data))
+    ]
+
+    results = []
+    for command, use in COMMANDS:
+        for source, build in sources:
+            results.append((command, source, usec(build, all_items), usec(build, use)))
+    return results
+
+if __name__ == "__main__":
+    print(f"{'command':<18} {'built from':<16} {'all items':>10} {'command':>10}  (usec)")
+    for command, source, eager, lazy in measure():
+        print(f"{command:<18} {source:<16} {eager:>10.1f} {lazy:>10.1f}")
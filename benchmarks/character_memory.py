@@ -0,0 +1,54 @@
+"""
+Memory a Character takes while it's kept in memory (see the identity map of storage.Storage),
+built from tests/fixtures/character.json both from the character data and from its snapshot.
+Run it from the root of the repository:
+
+    $ python benchmarks/character_memory.py
+"""
+import os
+import sys
+import json
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.character import Character
+from models.character_data import compact_character_data
+
+CHARACTERS = 500
+
+def load_fixtures():
+    with open('tests/fixtures/character.json', 'r') as jd:
+        character_data = compact_character_data(json.loads(jd.read()))
+    with open('tests/fixtures/race_data.json', 'r') as rd:
+        race_data = json.loads(rd.read())
+    return character_data, race_data
+
+def bytes_per_character(build):
+    """Bytes still allocated per character after building CHARACTERS of them with build()."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    characters = [build() for _ in range(CHARACTERS)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del characters
+    return size // CHARACTERS
+
+def measure():
+    """Returns a list of (source, bytes per character)."""
+    character_data, race_data = load_fixtures()
+    # The JSON is parsed every time a character is loaded, so each character gets its own copy
+    snapshot = json.dumps(Character(character_data, race_data, False).to_snapshot())
+    data = json.dumps(character_data)
+
+    return [
+        ('character data', bytes_per_character(lambda: Character(json.loads(data), race_data, False))),
+        ('snapshot', bytes_per_character(lambda: Character.from_snapshot(json.loads(snapshot), json.loads(data))))
+    ]
+
+if __name__ == "__main__":
+    print(f"{'built from':<20} {'bytes':>10}")
+    for source, size in measure():
+        print(f"{source:<20} {size:>10}")
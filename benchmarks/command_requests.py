@@ -0,0 +1,90 @@
+"""
+Round trips and payload each command costs against the Firebase REST API, measured with the
+in-process fake of tests/firebase_fake.py. Run it from the root of the repository:
+
+    $ python benchmarks/command_requests.py
+"""
+import os
+import sys
+import json
+import requests
+
+from unittest.mock import patch, Mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+from models.character import Character
+from models.character_data import compact_character_data
+from tests.firebase_fake import FakeFirebaseApplication
+from handlers.turns import handler as turns_handler
+from handlers.character import handler as character_handler
+
+CHAT_ID = 123456
+CAMPAIGN_ID = '-Lcampaign'
+CHARACTER_ID = '15376426'
+FIREBASE_DB_URL = 'https://fake.firebaseio.com'
+
+COMMANDS = [
+    (turns_handler, '/turn', '', 'foo'),
+    (turns_handler, '/next_turn', '', 'foo'),
+    (turns_handler, '/set_turns', 'foo, bar, baz', 'dm'),
+    (character_handler, '/status', '', 'foo'),
+    (character_handler, '/initiative_roll', '', 'foo'),
+    (character_handler, '/damage', 'foo 3', 'dm'),
+    (character_handler, '/set_currency', 'foo 10gp', 'dm'),
+    (character_handler, '/link_char', f'foo {CHARACTER_ID}', 'dm'),
+]
+
+def initial_data():
+    with open('tests/fixtures/character.json', 'r') as jd:
+        character_data = json.loads(jd.read())
+    with open('tests/fixtures/race_data.json', 'r') as rd:
+        race_data = json.loads(rd.read())
+
+    stored_character = compact_character_data(character_data)
+    stored_character['snapshot'] = Character(stored_character, race_data, False).to_snapshot()
+
+    return {
+        'chat_campaigns': {str(CHAT_ID): CAMPAIGN_ID},
+        'campaigns': {
+            CAMPAIGN_ID: {
+                'active': True,
+                'chat_id': CHAT_ID,
+                'dm_username': 'dm',
+                'turns': ['foo', 'bar'],
+                'turn_index': 0,
+                'characters': {'foo': CHARACTER_ID}
+            }
+        },
+        'characters': {CHARACTER_ID: stored_character},
+        'character_sheets': {CHARACTER_ID: character_data}
+    }
+
+def measure():
+    """Returns a list of (command, requests, bytes sent, bytes received), one per command."""
+    with open('tests/fixtures/race_data.json', 'r') as rd:
+        race_data = json.loads(rd.read())
+
+    results = []
+    session = requests.Session()
+    with patch('database.firebase.FirebaseApplication', FakeFirebaseApplication), \
+         patch('database.FIREBASE_DB_URL', FIREBASE_DB_URL), \
+         patch('database.get_session', return_value=session), \
+         patch('storage.get_race_data', return_value=race_data):
+        db = Database()
+        session.mount(FIREBASE_DB_URL, db.firebase_db.adapter())
+        for handler, command, txt_args, username in COMMANDS:
+            db.firebase_db.load(initial_data())
+            db.firebase_db.reset_stats()
+            with db.unit_of_work():
+                handler(Mock(), Mock(), command, txt_args, username, CHAT_ID, db)
+            firebase_db = db.firebase_db
+            results.append((f'{command} {txt_args}'.strip(), firebase_db.request_count,
+                            firebase_db.bytes_sent, firebase_db.bytes_received))
+    return results
+
+if __name__ == "__main__":
+    print(f"{'command':<30} {'requests':>8} {'sent':>8} {'received':>10}")
+    for command, requests, sent, received in measure():
+        print(f"{command:<30} {requests:>8} {sent:>8} {received:>10}")
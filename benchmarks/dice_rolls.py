@@ -0,0 +1,65 @@
+"""
+Time it takes to roll big dice pools: a random.randint() call per die (how the dice were rolled
+before dice) against dice.Dice, which draws all the dice of a term at once or samples the total of
+plain pools from its exact distribution. The cold column is the first roll of a pool with the exact
+sampler, which builds its distribution. Run it from the root of the repository:
+
+    $ python benchmarks/dice_rolls.py
+"""
+import os
+import sys
+import random
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dice
+
+NUMBER = 200
+
+POOLS = [
+    (999, 999),
+    (100, 6),
+    (50, 20),
+    (100, 20),
+    (10, 10),
+]
+
+def roll_per_die(count, sides):
+    return sum(random.randint(1, sides) for _ in range(count))
+
+def usec(function):
+    return timeit.timeit(function, number=NUMBER) / NUMBER * 1000000
+
+def cold_usec(expression):
+    """The slowest of a few first rolls, each building the distribution again."""
+    times = []
+    for _ in range(5):
+        dice.sum_distribution.cache_clear()
+        times.append(timeit.timeit(lambda: expression.roll(), number=1) * 1000000)
+    return max(times)
+
+def measure():
+    """
+    Returns a list of (pool, usec per die, usec batched, usec with the exact sampler, usec of its
+    first roll), the last two being None for pools that don't use the sampler.
+    """
+    results = []
+    for count, sides in POOLS:
+        notation = f'{count}d{sides}'
+        expression = dice.compile_expression(notation)
+        exact = cold = None
+        if dice.use_exact_sampler(count, sides):
+            cold = cold_usec(expression)
+            exact = usec(lambda: expression.roll())
+        results.append((notation, usec(lambda: roll_per_die(count, sides)),
+                        usec(lambda: sum(expression.roll_dice())), exact, cold))
+    return results
+
+def column(value):
+    return f'{value:>10.1f}' if value is not None else f"{'-':>10}"
+
+if __name__ == "__main__":
+    print(f"{'pool':<10} {'per die':>10} {'batched':>10} {'exact':>10} {'cold':>10}  (usec)")
+    for notation, per_die, batched, exact, cold in measure():
+        print(f"{notation:<10} {per_die:>10.1f} {batched:>10.1f} {column(exact)} {column(cold)}")
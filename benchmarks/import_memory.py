@@ -0,0 +1,39 @@
+"""
+Peak memory /import_char takes to download and parse tests/fixtures/character.json, streamed in
+chunks as http_session.read_body() reads it. Run it from the root of the repository:
+
+    $ python benchmarks/import_memory.py
+"""
+import os
+import sys
+import tracemalloc
+
+from unittest.mock import Mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import http_session
+from handlers.character import import_character
+
+def fixture_response(body):
+    response = Mock()
+    response.status_code = 200
+    response.headers = {'Content-Length': str(len(body))}
+    response.iter_content = lambda size: (body[i:i + size] for i in range(0, len(body), size))
+    return response
+
+def measure():
+    """Returns (size of the sheet, peak bytes allocated while importing it)."""
+    with open('tests/fixtures/character.json', 'rb') as jd:
+        body = jd.read()
+
+    response = fixture_response(body)
+    tracemalloc.start()
+    import_character('https://www.dndbeyond.com/character/15376426/json', Mock(), Mock(return_value=response))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(body), peak
+
+if __name__ == "__main__":
+    size, peak = measure()
+    print(f'sheet: {size} bytes, peak: {peak} bytes ({peak / size:.1f}x), chunks of {http_session.HTTP_CHUNK_SIZE} bytes')
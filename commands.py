@@ -1,13 +1,43 @@
+import sys
+import importlib
+import subprocess
+
 from exceptions import CommandNotFound, NotACommand
-from handlers.roll import handler as roll_handler
-from handlers.charsheet import handler as charsheet_handler
-from handlers.character import handler as character_handler
-from handlers.turns import handler as turn_handler
-from handlers.dm import handler as dm_handler
-from handlers.campaign import handler as campaign_handler
-from handlers.npc.handlers import handler as npc_handler
-from handlers.monster.handlers import handler as monster_handler
-from handlers.adventure.handlers import handler as adventure_handler
+
+class LazyHandler:
+    """
+    Reference to the handler of a command that imports its module the first time the command is
+    dispatched. Keeps cold starts cheap: a /roll doesn't have to pull in firebase, requests and every
+    model just because other commands need them.
+    """
+
+    def __init__(self, module_name, attribute='handler'):
+        self.module_name = module_name
+        self.attribute = attribute
+        self._handler = None
+
+    def load(self):
+        if self._handler is None:
+            module = importlib.import_module(self.module_name)
+            self._handler = getattr(module, self.attribute)
+        return self._handler
+
+    def __call__(self, *args, **kargs):
+        return self.load()(*args, **kargs)
+
+    def __repr__(self):
+        return f"<LazyHandler {self.module_name}.{self.attribute}>"
+
+roll_handler = LazyHandler('handlers.roll')
+odds_handler = LazyHandler('handlers.odds')
+charsheet_handler = LazyHandler('handlers.charsheet')
+character_handler = LazyHandler('handlers.character')
+turn_handler = LazyHandler('handlers.turns')
+dm_handler = LazyHandler('handlers.dm')
+campaign_handler = LazyHandler('handlers.campaign')
+npc_handler = LazyHandler('handlers.npc.handlers')
+monster_handler = LazyHandler('handlers.monster.handlers')
+adventure_handler = LazyHandler('handlers.adventure.handlers')
 
 # Each command should be defined using the expression below:
 #
@@ -15,14 +45,16 @@ from handlers.adventure.handlers import handler as adventure_handler
 #
 # where:
 #   cmd: the command string
-#   handler: is the method that will handle the action requested with the command
+#   handler: is the method that will handle the action requested with the command, wrapped in a
+#            LazyHandler so its module is only imported when the command is used
 #   args: is an array of arguments the command need. Args wrapped between `<>` are mandatory and wrapped
 #         between `()` are optional. Can be None if no arguments are required.
 #   description: the text that will describe the command
 
 GENERAL_COMMANDS = {
     "/start": (None, None, "starts the DnDCompanionBot"),
-    "/roll": (roll_handler, ["<expression>"], "rolls the dice using the [dice notation](https://en.wikipedia.org/wiki/Dice_notation)"),
+    "/roll": (roll_handler, ["<expression>"], "rolls the dice using the [dice notation](https://en.wikipedia.org/wiki/Dice_notation), Nx<expression> rolls it for N creatures"),
+    "/odds": (odds_handler, ["<expression>", "(vs DC)"], "shows the exact odds of a dice expression, which can use your character's mods (1d20+dex), and the chance to meet a DC or AC"),
     "/charsheet": (charsheet_handler, ["<username>"], "returns the character sheet associated with username"),
     "/help": (None, None, "shows this help message"),
     "/create_npc": (npc_handler, ["<name>", "<race>", "<class>"], "creates a new NPC character"),
@@ -52,6 +84,7 @@ CAMPAIGN_COMMANDS = {
     "/set_turns": (turn_handler, ["<username1>", "...", "<usernameN>"], "creates a list with the order of players for a given round"),
     "/turn": (turn_handler, None, "shows the current player in the turns list"),
     "/next_turn": (turn_handler,  None, "moves to the next player in the turns list"),
+    "/group_roll": (roll_handler, ["<monster>", "<n>", "<check>"], "rolls a check (ability, skill or initiative) for n monsters at once"),
     "/set_dm": (dm_handler, ["<username>"], "sets the username of the DM for the current campaign"),
     "/dm": (dm_handler, None, "shows the DM for the current campaign"),
     "/start_battle": (campaign_handler, ["<width>", "<height>"], "generates a new battle field"),
@@ -91,7 +124,7 @@ def command_handler(command):
     #    return default_handler
     #elif command == "/start":
     elif command in ALL_COMMANDS:
-        return ALL_COMMANDS[command][0]
+        return ALL_COMMANDS[command][0].load()
     else:
         raise CommandNotFound
 
@@ -110,3 +143,41 @@ def parse_command(txt_message):
     if cmd.find('@') >= 0:
         cmd = cmd.split('@')[0]
     return cmd
+
+# Run by import_times() in a fresh interpreter: prints the microseconds importing sys.argv[1] takes
+IMPORT_TIME_SCRIPT = (
+    'import sys, time, importlib\n'
+    'started = time.perf_counter()\n'
+    'importlib.import_module(sys.argv[1])\n'
+    'print(int((time.perf_counter() - started) * 1000000))\n'
+)
+
+def import_times():
+    """
+    Returns a list of (module, microseconds) with the cumulative import time of the webhook (main,
+    what every cold start pays before dispatching) and of each handler module, most expensive first.
+    Every module is imported in a fresh interpreter so shared dependencies are counted for each of
+    them, as it happens on a cold start. The import is timed around importlib.import_module, since
+    python -X importtime needs Python 3.7 and the bot runs on 3.6.
+    """
+    modules = sorted(set(info[0].module_name for info in ALL_COMMANDS.values() if info[0] is not None))
+    modules.insert(0, 'commands')
+    modules.insert(0, 'main')
+
+    times = []
+    for module in modules:
+        result = subprocess.run([sys.executable, '-c', IMPORT_TIME_SCRIPT, module],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        output = result.stdout.strip()
+        cumulative = int(output) if result.returncode == 0 and output.isdigit() else None
+        times.append((module, cumulative))
+
+    return sorted(times, key=lambda t: -1 if t[1] is None else t[1], reverse=True)
+
+# To print the import time of the webhook and of each handler module:
+# python3 commands.py --import-times
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in ("--import-times", "-i"):
+        for module, cumulative in import_times():
+            cost = f"{cumulative / 1000:.1f} ms" if cumulative is not None else "import failed"
+            print(f"{module:<30} {cost}")
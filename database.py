@@ -1,255 +1,579 @@
 import os
+import sys
+import copy
 import json
-import requests
+import utils
 
+from exceptions import ConcurrentUpdate, EntityExists
+
+from storage import Storage, CampaignActiveException, CampaignNotFoundException, character_name_updates, entity_summary, SUMMARY_FIELDS
 from models.campaign import Campaign
-from models.character import Character
+from models.character_data import compact_character_data
+from models.adventure import Adventure
+from models.monster import Monster
+from models.npc import NPC
 
+from services.http_session import get_session, HTTP_TIMEOUT
 from firebase import firebase
 from firebase.jsonutil import JSONEncoder
 
 FIREBASE_DB_URL = os.environ.get('FIREBASE_DB_URL')
 FIREBASE_API_SECRET = os.environ.get('FIREBASE_API_SECRET')
 
-RACE_URLS = {
-    "Dwarf": "http://www.dnd5eapi.co/api/races/1",
-    "Elf": "http://www.dnd5eapi.co/api/races/2",
-    "Halfling": "http://www.dnd5eapi.co/api/races/3",
-    "Human": "http://www.dnd5eapi.co/api/races/4",
-    "Dragonborn": "http://www.dnd5eapi.co/api/races/5",
-    "Gnome": "http://www.dnd5eapi.co/api/races/6",
-    "Half-Elf": "http://www.dnd5eapi.co/api/races/7",
-    "Half-Orc": "http://www.dnd5eapi.co/api/races/8",
-    "Tiefling": "http://www.dnd5eapi.co/api/races/9"
-}
-
-class Database:
+# Attempts of a conditional write before giving up because the value keeps changing
+FIREBASE_TRANSACTION_ATTEMPTS = int(os.environ.get('FIREBASE_TRANSACTION_ATTEMPTS', '5'))
+
+# The /campaigns node only has to be checked once per process. Warm invocations reuse the same
+# container, so there is no point in paying that round trip on every update.
+_campaigns_directory_ready = False
+
+class Database(Storage):
+    """Storage backed by the Firebase Realtime Database REST API."""
+
     def __init__(self):
         """Initialize Firebase database connection."""
+        super().__init__()
         self.firebase_db = firebase.FirebaseApplication(FIREBASE_DB_URL, None)
+        self._pending_writes = None
         self._ensure_campaigns_directory()
 
     def _ensure_campaigns_directory(self):
         """Ensure campaigns directory exists in Firebase."""
-        if not self.firebase_db.get('/campaigns', None):
-            self.firebase_db.put('/', 'campaigns', {}, params={'auth': FIREBASE_API_SECRET})
-
-    def create_campaign(self, chat_id, campaign_name, dm_username):
-        """
-        Create a new campaign.
-        
-        Args:
-            chat_id (int): Chat ID where campaign is created
-            campaign_name (str): Name of the campaign
-            dm_username (str): Username of the Dungeon Master
-        
-        Returns:
-            tuple: (campaign_id, campaign_data)
-        """
-        campaign_data = {
-            'name': campaign_name,
-            'dm': dm_username,
-            'chat_id': chat_id,
-            'active': True,
-            'created_at': datetime.now().isoformat(),
-            'updated_at': datetime.now().isoformat(),
-            }
-            
-            self.ref.child('campaigns').push(campaign_data)
-        except Exception as e:
-            logger.error(f"Error adding campaign: {str(e)}")
-            raise
-
-    def get_campaign(self, campaign_id: str) -> Campaign:
-        """Get a campaign by ID."""
-        campaign_data = self.ref.child(f'campaigns/{campaign_id}').get()
-        if not campaign_data:
-            raise exceptions.CampaignNotFound(f"Campaign {campaign_id} not found")
-            
-        return Campaign(
-            id=campaign_id,
-            name=campaign_data['name'],
-            description=campaign_data['description'],
-            dm=campaign_data['dm'],
-            players=campaign_data['players'],
-            current_turn=campaign_data['current_turn']
-        )
-
-    def update_campaign(self, campaign_id: str, campaign: Campaign) -> None:
-        """Update an existing campaign."""
-        try:
-            campaign_data = {
-                'name': campaign.name,
-                'description': campaign.description,
-                'updated_at': datetime.now().isoformat(),
-                'dm': campaign.dm,
-                'players': campaign.players,
-                'current_turn': campaign.current_turn
-            }
-            
-            self.ref.child(f'campaigns/{campaign_id}').update(campaign_data)
-        except Exception as e:
-            logger.error(f"Error updating campaign: {str(e)}")
-            raise
-
-    def delete_campaign(self, campaign_id: str) -> None:
+        global _campaigns_directory_ready
+        if _campaigns_directory_ready:
+            return
+
+        if not self.firebase_db.get('/campaigns', None, connection=get_session(),
+                                 params={'shallow': 'true', 'auth': FIREBASE_API_SECRET}):
+            self.firebase_db.put('/', 'campaigns', {}, connection=get_session(), params={'auth': FIREBASE_API_SECRET})
+        _campaigns_directory_ready = True
+
+    def _begin(self):
+        # Field updates are gathered and sent as a single multi-location PATCH when the unit of
+        # work ends, so all the changes of a command are applied together
+        self._pending_writes = {}
+
+    def _commit(self):
+        self.flush()
+        self._pending_writes = None
+
+    def _rollback(self):
+        self._pending_writes = None
+
+    def flush(self):
+        """Send the pending field updates of the unit of work."""
+        if self._pending_writes:
+            updates = self._pending_writes
+            self._pending_writes = {}
+            self._patch('/', updates)
+
+    def _write(self, updates):
+        """
+        Update the given {path: value} locations. Inside a unit of work the updates are only recorded
+        and will be sent by flush().
+        """
+        if self._pending_writes is None:
+            return self._patch('/', updates)
+
+        for path, value in updates.items():
+            self._add_pending_write(path, value)
+        return updates
+
+    def _add_pending_write(self, path, value):
+        # Firebase rejects multi-location updates where one path contains another, so a write under
+        # a pending path is merged into its value and a write over pending paths replaces them.
+        for pending in list(self._pending_writes.keys()):
+            if path.startswith(pending + '/'):
+                current = self._pending_writes[pending]
+                node = copy.deepcopy(current) if isinstance(current, dict) else {}
+                self._pending_writes[pending] = node
+                keys = path[len(pending) + 1:].split('/')
+                for key in keys[:-1]:
+                    if not isinstance(node.get(key), dict):
+                        node[key] = {}
+                    node = node[key]
+                node[keys[-1]] = value
+                return
+            elif pending.startswith(path + '/'):
+                del self._pending_writes[pending]
+
+        self._pending_writes[path] = value
+
+    # python-firebase opens a new requests.Session (and a new TLS connection) for every call that
+    # isn't given one, so all of them go through the session shared by the process
+
+    def _get(self, path, name=None, params=None):
+        query = {'auth': FIREBASE_API_SECRET}
+        query.update(params or {})
+        return self.firebase_db.get(path, name, connection=get_session(), params=query)
+
+    def _put(self, path, name, data):
+        return self.firebase_db.put(path, name, data, connection=get_session(), params={'auth': FIREBASE_API_SECRET})
+
+    def _post(self, path, data):
+        return self.firebase_db.post(path, data, connection=get_session(), params={'auth': FIREBASE_API_SECRET})
+
+    def _patch(self, path, data):
+        return self.firebase_db.patch(path, data, connection=get_session(), params={'auth': FIREBASE_API_SECRET})
+
+    def _delete(self, path, name):
+        return self.firebase_db.delete(path, name, connection=get_session(), params={'auth': FIREBASE_API_SECRET})
+
+    def _transaction(self, path, update):
+        """
+        Write update(current value) to path with a conditional request (ETag / if-match). When another
+        request changed the value first, Firebase rejects the write and returns the new value, and
+        update is applied again on it. Returns the value written.
+
+        python-firebase doesn't expose the response headers, so these requests go directly through
+        the shared session. They are sent right away, also inside a unit of work, after the writes
+        pending in it (which could otherwise overwrite the value later).
+        """
+        if self._pending_writes:
+            self.flush()
+
+        response = self._get_with_etag(path)
+        for attempt in range(FIREBASE_TRANSACTION_ATTEMPTS):
+            value = update(response.json())
+            response = self._put_if_match(path, value, response.headers['ETag'])
+            if response.status_code != 412:
+                response.raise_for_status()
+                return value
+
+        raise ConcurrentUpdate(f'{path} changed {FIREBASE_TRANSACTION_ATTEMPTS} times while updating it')
+
+    def _get_with_etag(self, path):
+        """GET path asking for its ETag, which _put_if_match() needs."""
+        response = get_session().get(self._url(path), params={'auth': FIREBASE_API_SECRET},
+                                     headers={'X-Firebase-ETag': 'true'}, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        return response
+
+    def _put_if_match(self, path, value, etag):
+        """PUT value at path only if it still has the given ETag. Firebase answers 412 otherwise."""
+        return get_session().put(self._url(path), params={'auth': FIREBASE_API_SECRET}, data=json.dumps(value),
+                                 headers={'if-match': etag}, timeout=HTTP_TIMEOUT)
+
+    def _url(self, path):
+        return f'{self.firebase_db.dsn}/{path}.json'
+
+    # Updates
+
+    def claim_update(self, update_id, window):
+        """
+        Record update_id as processed. Returns False if it had already been recorded.
+
+        The entry is written with a conditional request on the ETag of the empty location, so when a
+        retry reaches two containers at once only one of them claims it (the other gets a 412). The
+        entry of update_id - window is removed afterwards, so the node keeps roughly window entries
+        since Telegram update ids are sequential.
+        """
+        path = f'processed_updates/{update_id}'
+        response = self._get_with_etag(path)
+        if response.json() is not None:
+            return False
+
+        response = self._put_if_match(path, {'.sv': 'timestamp'}, response.headers['ETag'])
+        if response.status_code == 412:
+            return False
+        response.raise_for_status()
+
+        self._delete('/processed_updates', str(update_id - window))
+        return True
+
+    def release_update(self, update_id):
+        """Forget that update_id was processed, so it is processed when it is delivered again."""
+        self._delete('/processed_updates', str(update_id))
+
+    # Campaigns
+
+    def create_campaign(self, chat_id, campaign_name):
+        """Create a new active campaign for the chat."""
+        campaign = Campaign(chat_id, campaign_name)
+        result = self._post('/campaigns', campaign.to_json())
+        self._forget(('campaign', int(chat_id)))
+        if not result:
+            return None
+
+        self._put('/chat_campaigns', str(int(chat_id)), result['name'])
+        return result['name']
+
+    def _load_campaign(self, chat_id):
+        # /chat_campaigns/<chat_id> holds the id of the active campaign of each chat, so the lookup
+        # doesn't depend on how many campaigns (active or not) the database holds
+        campaign_id = self._get('/chat_campaigns', str(int(chat_id)))
+        if campaign_id is None:
+            return (None, None)
+
+        campaign = self._get('/campaigns', campaign_id)
+        if campaign is None or campaign.get('active', False) is not True:
+            return (None, None)
+
+        return (campaign_id, campaign)
+
+    def close_campaign(self, campaign_id):
+        """Mark a campaign as inactive."""
+        chat_id = self._get_campaign_chat_id(campaign_id)
+        self._forget_campaign(campaign_id)
+        return self._write({f'campaigns/{campaign_id}/active': False, f'chat_campaigns/{chat_id}': None})
+
+    def delete_campaign(self, campaign_id):
         """Delete a campaign."""
-        try:
-            self.ref.child(f'campaigns/{campaign_id}').set(None)
-        except Exception as e:
-            logger.error(f"Error deleting campaign: {str(e)}")
-            raise
-
-    def add_character(self, campaign_id: str, character: Character) -> None:
-        """Add a character to a campaign."""
-        try:
-            character_data = {
-                'name': character.name,
-                'race': character.race,
-                'character_class': character.character_class,
-                'level': character.level,
-                'experience': character.experience,
-                'hit_points': character.hit_points,
-                'current_hit_points': character.current_hit_points,
-                'currency': character.currency,
-                'created_at': datetime.now().isoformat(),
-                'updated_at': datetime.now().isoformat()
-            }
-            
-            self.ref.child(f'campaigns/{campaign_id}/characters').push(character_data)
-        except Exception as e:
-            logger.error(f"Error adding character: {str(e)}")
-            raise
-
-    def get_characters(self, campaign_id: str) -> list:
-        """Get all characters in a campaign."""
-        characters = self.ref.child(f'campaigns/{campaign_id}/characters').get()
-        if not characters:
-            return []
-            
-        return list(characters.values())
-
-    def update_character(self, campaign_id: str, character: Character) -> None:
-        """Update a character."""
-        try:
-            character_data = {
-                'name': character.name,
-                'race': character.race,
-                'character_class': character.character_class,
-                'level': character.level,
-                'experience': character.experience,
-                'hit_points': character.hit_points,
-                'current_hit_points': character.current_hit_points,
-                'currency': character.currency,
-                'updated_at': datetime.now().isoformat()
-            }
-            
-            self.ref.child(f'campaigns/{campaign_id}/characters/{character.id}').update(character_data)
-        except Exception as e:
-            logger.error(f"Error updating character: {str(e)}")
-            raise
-
-    def delete_character(self, campaign_id: str, character_id: str) -> None:
-        """Delete a character from a campaign."""
-        try:
-            self.ref.child(f'campaigns/{campaign_id}/characters/{character_id}').set(None)
-        except Exception as e:
-            logger.error(f"Error deleting character: {str(e)}")
-            raise
-
-    def add_npc(self, campaign_id: str, npc: NPC) -> None:
-        """Add an NPC to a campaign."""
-        try:
-            npc_data = {
-                'name': npc.name,
-                'race': npc.race,
-                'npc_class': npc.npc_class,
-                'created_at': datetime.now().isoformat(),
-                'updated_at': datetime.now().isoformat()
-            }
-            
-            self.ref.child(f'campaigns/{campaign_id}/npcs').push(npc_data)
-        except Exception as e:
-            logger.error(f"Error adding NPC: {str(e)}")
-            raise
-
-    def get_npcs(self, campaign_id: str) -> list:
-        """Get all NPCs in a campaign."""
-        npcs = self.ref.child(f'campaigns/{campaign_id}/npcs').get()
+        chat_id = self._get_campaign_chat_id(campaign_id)
+        self._forget_campaign(campaign_id)
+        return self._write({f'campaigns/{campaign_id}': None, f'chat_campaigns/{chat_id}': None})
+
+    def _get_campaign_chat_id(self, campaign_id):
+        chat_id = self._cached_campaign_chat_id(campaign_id)
+        if chat_id is None:
+            chat_id = int(self._get(f'/campaigns/{campaign_id}', 'chat_id'))
+        return chat_id
+
+    def backfill_chat_campaigns(self):
+        """
+        Build /chat_campaigns from the campaigns stored before the index existed. Returns the number of
+        chats indexed.
+        """
+        campaigns = self._get('/campaigns') or {}
+        index = {}
+        for campaign_id, campaign in campaigns.items():
+            if campaign.get('active', False) is True and campaign.get('chat_id') is not None:
+                index[str(int(campaign['chat_id']))] = campaign_id
+
+        if len(index) > 0:
+            self._patch('/chat_campaigns', index)
+        return len(index)
+
+    def set_dm(self, campaign_id, user_id, username):
+        """Set the Dungeon Master of a campaign."""
+        fields = {'dm_user_id': int(user_id), 'dm_username': username}
+        self._update_cached_campaign(campaign_id, fields)
+        return self._write({f'campaigns/{campaign_id}/{k}': v for k, v in fields.items()})
+
+    def set_turns(self, campaign_id, turns):
+        """Set the turns order and restart the turn index."""
+        fields = {'turns': turns, 'turn_index': 0}
+        self._update_cached_campaign(campaign_id, fields)
+        return self._write({f'campaigns/{campaign_id}/{k}': v for k, v in fields.items()})
+
+    def set_turn_index(self, campaign_id, turn_index):
+        """Set the turn index of a campaign."""
+        self._update_cached_campaign(campaign_id, {'turn_index': turn_index})
+        return self._write({f'campaigns/{campaign_id}/turn_index': turn_index})
+
+    def change_turn_index(self, campaign_id, diff):
+        """Add diff to the turn index of a campaign and return the new index."""
+        turn_index = self._transaction(f'campaigns/{campaign_id}/turn_index', lambda value: int(value or 0) + diff)
+        self._update_cached_campaign(campaign_id, {'turn_index': turn_index})
+        return turn_index
+
+    def start_battle(self, campaign_id, battle_field):
+        """Create a new battle field for a campaign."""
+        self._update_cached_campaign(campaign_id, {'battle_field': battle_field})
+        return self._write({f'campaigns/{campaign_id}/battle_field': battle_field})
+
+    def set_battle_positions(self, campaign_id, positions):
+        """Set the positions of the characters in the battle field."""
+        self._forget_campaign(campaign_id)
+        return self._write({f'campaigns/{campaign_id}/battle_field/positions': positions})
+
+    def set_char_position(self, campaign_id, username, position):
+        """Move a character in the battle field. Returns None if the character is not in it."""
+        current = self._get(f'/campaigns/{campaign_id}/battle_field/positions', username)
+        if current is None:
+            return None
+
+        self._forget_campaign(campaign_id)
+        return self._write({f'campaigns/{campaign_id}/battle_field/positions/{username}': position})
+
+    # Characters
+
+    def save_character_info(self, character_id, character_data):
+        """
+        Store a character imported from D&D Beyond: its compact projection in /characters, which is
+        what the commands read, and the raw sheet in /character_sheets.
+        """
+        self._forget(('character', str(character_id)))
+        return self._write({
+            f'characters/{character_id}': compact_character_data(character_data),
+            f'character_sheets/{character_id}': character_data
+        })
+
+    def get_character_sheet(self, character_id):
+        """Return the raw D&D Beyond sheet of a character, or None."""
+        return self._get('/character_sheets', str(character_id))
+
+    def _save_character_data(self, character_id, character_data):
+        self._write({f'characters/{character_id}': character_data})
+
+    def _save_character_snapshot(self, character_id, snapshot):
+        self._write({f'characters/{character_id}/snapshot': snapshot})
+
+    def set_character_link(self, campaign_id, username, character_id):
+        """
+        Link a character to a player of a campaign. The keys of the character name are written to the
+        campaign's character_names in the same PATCH (see character_name_updates), so get_character_id
+        can also resolve the character by name with a single keyed read.
+        """
+        links = self._get(f'/campaigns/{campaign_id}', 'characters') or {}
+        names = self._get(f'/campaigns/{campaign_id}', 'character_names') or {}
+        name = self._get(f'/characters/{character_id}/character', 'name')
+
+        updates = {f'campaigns/{campaign_id}/characters/{username}': character_id}
+        for key, value in character_name_updates(names, links, username, character_id, name).items():
+            updates[f'campaigns/{campaign_id}/character_names/{key}'] = value
+
+        self._forget_character_ids(campaign_id)
+        self._remember(('character_id', campaign_id, username), character_id)
+        return self._write(updates)
+
+    def _load_character_id(self, campaign_id, search):
+        # Usernames come first, so a character name can never take the place of a player
+        character_id = self._get(f'/campaigns/{campaign_id}/characters', search)
+        if character_id is None:
+            character_id = self._get(f'/campaigns/{campaign_id}/character_names', utils.index_key(search))
+        return character_id
+
+    def _load_character(self, character_id):
+        character_data = self._get('/characters', character_id)
+        if character_data is None:
+            return None
+
+        return self._character_from_data(character_id, character_data)
+
+    def set_char_hp(self, character_id, hit_points):
+        """Set the removed hit points of a character."""
+        return self._write({f'characters/{character_id}/character/removedHitPoints': hit_points})
+
+    def change_char_hp(self, character_id, points, max_hit_points):
+        """Remove points hit points from a character (negative points heal it). Returns the new removed hit points."""
+        return self._transaction(f'characters/{character_id}/character/removedHitPoints',
+                                 lambda value: min(max_hit_points, max(0, int(value or 0) + points)))
+
+    def set_char_xp(self, character_id, xp):
+        """Set the experience points of a character."""
+        return self._write({f'characters/{character_id}/character/currentXp': xp})
+
+    def set_char_level(self, character_id, level):
+        """Set the level of a character."""
+        # Most derived attributes depend on the level, so the snapshot is built again on the next load
+        self._forget(('character', str(character_id)))
+        return self._write({f'characters/{character_id}/character/classes/0/level': level,
+                            f'characters/{character_id}/snapshot': None})
+
+    def set_char_currency(self, character_id, currencies):
+        """Set the currency pouch of a character."""
+        return self._write({f'characters/{character_id}/character/currencies': currencies})
+
+    # NPCs
+
+    def add_npc(self, chat_id, npc):
+        """Add an NPC to the active campaign."""
+        campaign_id = self._get_campaign_id(chat_id)
+        return self._add_entity(campaign_id, 'npcs', npc.to_json())
+
+    def get_npcs(self, chat_id):
+        """Get all NPCs in the active campaign."""
+        campaign_id = self._get_campaign_id(chat_id)
+        npcs = self._get(f'/campaigns/{campaign_id}/npcs')
         if not npcs:
             return []
-            
-        return list(npcs.values())
+
+        return [NPC(npc) for npc in npcs.values()]
+
+    def get_npc_summaries(self, chat_id):
+        """Get the summaries of the NPCs in the active campaign, as a list of dicts."""
+        campaign_id = self._get_campaign_id(chat_id)
+        return self._get_summaries(campaign_id, 'npcs')
+
+    def get_npc_by_name(self, chat_id, name):
+        """Get an NPC by name."""
+        campaign_id = self._get_campaign_id(chat_id)
+        npc_data = self._get_entity(campaign_id, 'npcs', name)
+        return NPC(npc_data) if npc_data is not None else None
+
+    def update_npc(self, chat_id, npc):
+        """Update an existing NPC."""
+        campaign_id = self._get_campaign_id(chat_id)
+        self._set_entity(campaign_id, 'npcs', npc.to_json())
+
+    def delete_npc(self, chat_id, npc):
+        """Delete an NPC from the active campaign."""
+        campaign_id = self._get_campaign_id(chat_id)
+        self._delete_entity(campaign_id, 'npcs', npc.name)
+
+    # Monsters
+
+    def add_monster(self, chat_id, monster):
+        """Add a monster to the active campaign."""
+        campaign_id = self._get_campaign_id(chat_id)
+        return self._add_entity(campaign_id, 'monsters', monster.to_json())
+
+    def get_monsters(self, chat_id):
+        """Get all monsters in the active campaign."""
+        campaign_id = self._get_campaign_id(chat_id)
+        monsters = self._get(f'/campaigns/{campaign_id}/monsters')
+        if not monsters:
+            return []
+
+        return [Monster(monster) for monster in monsters.values()]
+
+    def get_monster_summaries(self, chat_id):
+        """Get the summaries of the monsters in the active campaign, as a list of dicts."""
+        campaign_id = self._get_campaign_id(chat_id)
+        return self._get_summaries(campaign_id, 'monsters')
+
+    def get_monster_by_name(self, chat_id, name):
+        """Get a monster by name."""
+        campaign_id = self._get_campaign_id(chat_id)
+        monster_data = self._get_entity(campaign_id, 'monsters', name)
+        return Monster(monster_data) if monster_data is not None else None
+
+    def update_monster(self, chat_id, monster):
+        """Update an existing monster."""
+        campaign_id = self._get_campaign_id(chat_id)
+        self._set_entity(campaign_id, 'monsters', monster.to_json())
+
+    def delete_monster(self, chat_id, monster):
+        """Delete a monster from the active campaign."""
+        campaign_id = self._get_campaign_id(chat_id)
+        self._delete_entity(campaign_id, 'monsters', monster.name)
+
+    # Adventures
+
+    def add_adventure(self, chat_id, adventure):
+        """Add an adventure to the active campaign."""
+        campaign_id = self._get_campaign_id(chat_id)
+        adventure_data = adventure.to_json()
+        adventure_data['chat_id'] = chat_id
+        return self._add_entity(campaign_id, 'adventures', adventure_data)
+
+    def get_adventures(self, chat_id):
+        """Get all adventures in the active campaign."""
+        campaign_id = self._get_campaign_id(chat_id)
+        adventures = self._get(f'/campaigns/{campaign_id}/adventures')
+        if not adventures:
+            return []
+
         return [Adventure(adventure) for adventure in adventures.values()]
 
+    def get_adventure_summaries(self, chat_id):
+        """Get the summaries of the adventures in the active campaign, as a list of dicts."""
+        campaign_id = self._get_campaign_id(chat_id)
+        return self._get_summaries(campaign_id, 'adventures')
+
     def get_adventure_by_name(self, chat_id, name):
         """Get an adventure by name."""
-        campaign_id, campaign = self.get_campaign(chat_id)
-        if campaign_id is None:
-            raise CampaignNotFoundException("No active campaign found")
-
-        adventures = self.firebase_db.get(f'/campaigns/{campaign_id}/adventures',
-                                  None,
-                                  params={'auth': FIREBASE_API_SECRET})
-        
-        if adventures is None:
-            return None
-            
-        for adventure in adventures.values():
-            if adventure['name'].lower() == name.lower():
-                return Adventure(adventure)
-        
-        return None
+        campaign_id = self._get_campaign_id(chat_id)
+        adventure_data = self._get_entity(campaign_id, 'adventures', name)
+        return Adventure(adventure_data) if adventure_data is not None else None
 
     def update_adventure(self, chat_id, adventure):
         """Update an existing adventure."""
-        campaign_id, campaign = self.get_campaign(chat_id)
-        if campaign_id is None:
-            raise CampaignNotFoundException("No active campaign found")
-
+        campaign_id = self._get_campaign_id(chat_id)
         adventure_data = adventure.to_json()
         adventure_data['chat_id'] = chat_id
-        
-        adventures = self.firebase_db.get(f'/campaigns/{campaign_id}/adventures',
-                                  None,
-                                  params={'auth': FIREBASE_API_SECRET})
-        
-        if adventures is None:
-            return
-            
-        for adventure_id, adventure_data in adventures.items():
-            if adventure_data['name'].lower() == adventure.name.lower():
-                self.firebase_db.patch(f'/campaigns/{campaign_id}/adventures/{adventure_id}',
-                                     data=adventure_data,
-                                     params={'auth': FIREBASE_API_SECRET})
-                break
+        self._set_entity(campaign_id, 'adventures', adventure_data)
 
     def delete_adventure(self, chat_id, adventure):
         """Delete an adventure from the campaign."""
-        campaign_id, campaign = self.get_campaign(chat_id)
-        if campaign_id is None:
-            raise CampaignNotFoundException("No active campaign found")
+        campaign_id = self._get_campaign_id(chat_id)
+        self._delete_entity(campaign_id, 'adventures', adventure.name)
 
-        adventures = self.firebase_db.get(f'/campaigns/{campaign_id}/adventures',
-                                  None,
-                                  params={'auth': FIREBASE_API_SECRET})
-        
-        if adventures is None:
-            return
-            
-        for adventure_id, adventure_data in adventures.items():
-            if adventure_data['name'].lower() == adventure.name.lower():
-                self.firebase_db.delete(f'/campaigns/{campaign_id}/adventures/{adventure_id}',
-                                      None,
-                                      params={'auth': FIREBASE_API_SECRET})
-                break
+    # NPCs, monsters and adventures are stored in /campaigns/<id>/<kind>/<name key>, so finding,
+    # updating or deleting one is a single keyed request. Each one has a summary, written along with
+    # it, in /campaigns/<id>/summaries/<kind>/<name key>, so the listings don't download the whole
+    # content of every entry.
+
+    def _add_entity(self, campaign_id, kind, data):
+        key = utils.index_key(data['name'])
+        if self._get(f'/campaigns/{campaign_id}/{kind}', key, params={'shallow': 'true'}) is not None:
+            raise EntityExists(data['name'])
+        return self._set_entity(campaign_id, kind, data)
+
+    def _set_entity(self, campaign_id, kind, data):
+        key = utils.index_key(data['name'])
+        self._write({
+            f'campaigns/{campaign_id}/{kind}/{key}': data,
+            f'campaigns/{campaign_id}/summaries/{kind}/{key}': entity_summary(kind, data)
+        })
+        return data
+
+    def _get_entity(self, campaign_id, kind, name):
+        return self._get(f'/campaigns/{campaign_id}/{kind}', utils.index_key(name))
+
+    def _delete_entity(self, campaign_id, kind, name):
+        key = utils.index_key(name)
+        self._write({f'campaigns/{campaign_id}/{kind}/{key}': None, f'campaigns/{campaign_id}/summaries/{kind}/{key}': None})
+
+    def _get_summaries(self, campaign_id, kind):
+        # The keys of the entries (a shallow read) tell which ones were added before the summaries
+        # existed. Their summaries are built once, downloading the entries a single time.
+        keys = self._get(f'/campaigns/{campaign_id}/{kind}', params={'shallow': 'true'}) or {}
+        summaries = self._get(f'/campaigns/{campaign_id}/summaries', kind) or {}
+        missing = [key for key in keys if key not in summaries]
+        if len(missing) > 0:
+            entities = self._get(f'/campaigns/{campaign_id}/{kind}') or {}
+            built = {key: entity_summary(kind, entities[key]) for key in missing if key in entities}
+            self._write({f'campaigns/{campaign_id}/summaries/{kind}/{key}': summary for key, summary in built.items()})
+            summaries.update(built)
 
+        return sorted((summaries[key] for key in keys if key in summaries),
+                      key=lambda summary: summary.get('name', '').lower())
+
+    def rekey_entities(self):
+        """
+        Move the NPCs, monsters and adventures stored under push ids (before they were keyed by name)
+        to their name keys. Returns the number of entries moved.
+        """
+        campaign_ids = self._get('/campaigns', params={'shallow': 'true'}) or {}
+        moved = 0
+        for campaign_id in campaign_ids:
+            updates = {}
+            for kind in SUMMARY_FIELDS:
+                for key, data in (self._get(f'/campaigns/{campaign_id}', kind) or {}).items():
+                    name_key = utils.index_key(data.get('name', ''))
+                    if name_key == '' or name_key == key:
+                        continue
+
+                    updates[f'campaigns/{campaign_id}/{kind}/{key}'] = None
+                    updates[f'campaigns/{campaign_id}/summaries/{kind}/{key}'] = None
+                    updates[f'campaigns/{campaign_id}/{kind}/{name_key}'] = data
+                    updates[f'campaigns/{campaign_id}/summaries/{kind}/{name_key}'] = entity_summary(kind, data)
+                    moved += 1
+
+            if len(updates) > 0:
+                self._patch('/', updates)
+        return moved
+
+    def rebuild_character_names(self):
+        """
+        Build the character_names of every campaign from its links, replacing the character_index
+        where usernames and names were mixed. Returns the number of links indexed.
+        """
+        campaign_ids = self._get('/campaigns', params={'shallow': 'true'}) or {}
+        indexed = 0
+        for campaign_id in campaign_ids:
+            names = {}
+            for username, character_id in (self._get(f'/campaigns/{campaign_id}', 'characters') or {}).items():
+                name = self._get(f'/characters/{character_id}/character', 'name')
+                names.update(character_name_updates(names, {}, username, character_id, name))
+                indexed += 1
 
-class CampaignActiveException(Exception):
-    def __init__(self, message):
-        super().__init__(message)
+            self._patch(f'/campaigns/{campaign_id}', {'character_names': names or None, 'character_index': None})
+        return indexed
 
 
-class CampaignNotFoundException(Exception):
-    def __init__(self, message):
-        super().__init__(message)
+# To index the campaigns created before /chat_campaigns existed:
+# python3 database.py --backfill-chat-campaigns
+# To key by name the NPCs, monsters and adventures created before they were:
+# python3 database.py --rekey-entities
+# To index by name the characters linked before usernames and names were kept apart:
+# python3 database.py --rebuild-character-names
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--backfill-chat-campaigns":
+        print(f"{Database().backfill_chat_campaigns()} chats indexed")
+    elif len(sys.argv) > 1 and sys.argv[1] == "--rekey-entities":
+        print(f"{Database().rekey_entities()} entries moved")
+    elif len(sys.argv) > 1 and sys.argv[1] == "--rebuild-character-names":
+        print(f"{Database().rebuild_character_names()} links indexed")
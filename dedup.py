@@ -0,0 +1,51 @@
+import logging
+
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class UpdateDeduplicator:
+    """
+    Remembers the update_id of the last updates processed so the ones Telegram delivers again (it
+    retries when the webhook is slow to answer) are dropped instead of running their command twice.
+
+    The in-memory window only covers the current container. An optional shared store (any object
+    with claim_update(update_id, window) and release_update(update_id) methods, like Database)
+    covers retries that land in a different container.
+
+    An update whose command fails is released, so the retry of Telegram processes it again.
+    """
+
+    def __init__(self, window=1000, store=None):
+        self.window = window
+        self.store = store
+        self.seen = OrderedDict()
+
+    def is_duplicate(self, update_id):
+        if update_id in self.seen:
+            return True
+
+        self.seen[update_id] = True
+        if len(self.seen) > self.window:
+            self.seen.popitem(last=False)
+
+        if self.store is None:
+            return False
+
+        try:
+            return not self.store.claim_update(update_id, self.window)
+        except Exception as e:
+            # Processing an update twice is better than dropping it
+            logger.warning('Could not check update %s in the shared store: %s', update_id, e)
+            return False
+
+    def release(self, update_id):
+        """Forgets update_id, so the next delivery of it isn't a duplicate."""
+        self.seen.pop(update_id, None)
+        if self.store is None:
+            return
+
+        try:
+            self.store.release_update(update_id)
+        except Exception as e:
+            logger.warning('Could not release update %s in the shared store: %s', update_id, e)
@@ -0,0 +1,553 @@
+"""
+Dice expressions: parsed once into a small tree of Expression nodes (see compile_expression), which
+is rolled as many times as needed.
+
+    2d6+3         dice and arithmetic (+, -, *, / rounding down, parentheses)
+    d20, 1d%      one die, percentile die
+    4d6kh3, 2d20kl1, 4d6dl1, 2d20dh1
+                  keep the highest/lowest dice, drop the lowest/highest ones
+    3d6!, 3d6!>5  exploding dice: each die rolling the max (or at least 5) adds another one
+    2d6r1, 2d6r<2, 2d6ro1
+                  reroll the dice rolling 1 (or at most 2), ro only once
+    {4d6, 3d8}kh1 grouped pool: the totals of the expressions, keeping the highest/lowest ones
+    1d20+dex      names (3 letters or more) of values given later with bind(), like a character's mods
+"""
+import os
+import re
+import bisect
+import random
+import functools
+import itertools
+
+from exceptions import InvalidDiceExpression
+
+# Limits of a message (see check_limits), so spam can't keep the bot rolling: dice rolled and dice
+# terms (4d6kh3, 1d8...) in all its expressions
+MAX_DICE = int(os.environ.get('DICE_MAX_DICE', '1000'))
+MAX_TERMS = int(os.environ.get('DICE_MAX_TERMS', '20'))
+MAX_SIDES = int(os.environ.get('DICE_MAX_SIDES', '1000'))
+# Times an expression can be rolled at once, like the 12 of 12x1d20+2
+MAX_GROUP = int(os.environ.get('DICE_MAX_GROUP', '50'))
+MAX_EXPLOSIONS = 100
+# Tokens (numbers, dice, names, signs, parentheses...) of an expression. Expressions are parsed,
+# rolled and printed recursively, so this bounds how deep those go too.
+MAX_TOKENS = int(os.environ.get('DICE_MAX_TOKENS', '200'))
+
+# Plain pools (no keep, explode or reroll) of at least EXACT_SAMPLER_MIN_DICE dice are sampled from the
+# exact distribution of their total (see sum_distribution) instead of rolling every die, as long as
+# its table takes about EXACT_SAMPLER_MAX_BYTES at most (100d6 or 50d20 fit, 100d20 doesn't). Building
+# one takes a few milliseconds, and only EXACT_SAMPLER_CACHE_SIZE of them are kept. 0 turns the sampler off.
+EXACT_SAMPLER_MIN_DICE = int(os.environ.get('DICE_EXACT_SAMPLER_MIN_DICE', '50'))
+EXACT_SAMPLER_MAX_BYTES = int(os.environ.get('DICE_EXACT_SAMPLER_MAX_BYTES', str(64 * 1024)))
+EXACT_SAMPLER_CACHE_SIZE = 16
+
+DICE_CACHE_SIZE = 256
+
+USAGE = 'Please use the dice notation (for example: 1d6 to roll a die of 6 sides)'
+
+# Names with hyphens, the skills of models.character.SKILLS. Any other hyphen between names is a
+# minus, so 1d20+dex-str is dex minus str.
+HYPHENATED_NAMES = ('sleight-of-hand', 'animal-handling')
+
+TOKEN_PATTERN = re.compile(r'\s*(\d+|' + '|'.join(HYPHENATED_NAMES) + r'|[a-z]{3,}|kh|kl|dh|dl|ro|[kdr%!<>=+\-*/(){},])')
+NAME_PATTERN = re.compile(r'[a-z]{3,}')
+
+class Expression:
+    """A node of a compiled dice expression. Nodes are immutable, so they're shared through the cache."""
+
+    __slots__ = ()
+
+    # Binding of the node when rendered, to know where parentheses are needed
+    precedence = 3
+
+    def roll(self, rng=random):
+        """Rolls the expression and returns its total."""
+        raise NotImplementedError
+
+    def roll_many(self, times, rng=random):
+        """Rolls the expression times times (for a group of creatures) and returns the totals."""
+        return [self.roll(rng) for _ in range(times)]
+
+    def dice_terms(self):
+        """The Dice nodes of the expression."""
+        return ()
+
+    def names(self):
+        """The names (see Name) in the expression."""
+        return ()
+
+    def bind(self, values):
+        """The expression with its names replaced by their values (a dict by name)."""
+        return self
+
+    def _render(self, precedence):
+        text = str(self)
+        return f'({text})' if self.precedence < precedence else text
+
+class Constant(Expression):
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def roll(self, rng=random):
+        return self.value
+
+    def roll_many(self, times, rng=random):
+        return [self.value] * times
+
+    def __str__(self):
+        return str(self.value)
+
+class Name(Expression):
+    """A value given later with bind(), like the dex in 1d20+dex."""
+
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def roll(self, rng=random):
+        raise InvalidDiceExpression(f"your request uses {self.name}, which has no value here!")
+
+    def names(self):
+        return (self.name,)
+
+    def bind(self, values):
+        if self.name not in values:
+            raise InvalidDiceExpression(f"your request uses {self.name}, which has no value here!")
+        return Constant(values[self.name])
+
+    def __str__(self):
+        return self.name
+
+class Dice(Expression):
+    """
+    count dice of sides sides. keep is (n, highest) to keep the n highest (or lowest) dice, explode the
+    value from which a die explodes and reroll (comparison, value, once) the dice to roll again.
+    """
+
+    __slots__ = ('count', 'sides', 'keep', 'explode', 'reroll', 'text')
+
+    def __init__(self, count, sides, keep=None, explode=None, reroll=None, text=None):
+        self.count = count
+        self.sides = sides
+        self.keep = keep
+        self.explode = explode
+        self.reroll = reroll
+        self.text = text or f'{count}d{sides}'
+
+    def roll(self, rng=random):
+        if self.is_plain() and use_exact_sampler(self.count, self.sides):
+            return sample_sum(self.count, self.sides, rng)
+        return sum(self.roll_dice(rng))
+
+    def roll_many(self, times, rng=random):
+        if not self.is_plain() or use_exact_sampler(self.count, self.sides):
+            return super().roll_many(times, rng)
+        # Every die of every roll at once
+        dice = self.draw(self.count * times, rng)
+        return [sum(dice[i:i + self.count]) for i in range(0, len(dice), self.count)]
+
+    def roll_dice(self, rng=random):
+        """Rolls the dice and returns the ones that are kept."""
+        dice = self.draw(self.count, rng)
+
+        if self.explode is not None:
+            explosions = 0
+            exploded = sum(1 for value in dice if value >= self.explode)
+            while exploded > 0 and explosions < MAX_EXPLOSIONS:
+                extra = self.draw(min(exploded, MAX_EXPLOSIONS - explosions), rng)
+                explosions += len(extra)
+                exploded = sum(1 for value in extra if value >= self.explode)
+                dice += extra
+
+        if self.keep is not None:
+            n, highest = self.keep
+            dice = sorted(dice, reverse=highest)[:n]
+        return dice
+
+    def draw(self, count, rng=random):
+        """Rolls count dice at once, rerolling the ones that have to."""
+        values = rng.choices(range(1, self.sides + 1), k=count)
+        if self.reroll is not None:
+            comparison, target, once = self.reroll
+            rerolled = [i for i, value in enumerate(values) if matches(value, comparison, target)]
+            while len(rerolled) > 0:
+                for i, value in zip(rerolled, rng.choices(range(1, self.sides + 1), k=len(rerolled))):
+                    values[i] = value
+                if once:
+                    break
+                rerolled = [i for i in rerolled if matches(values[i], comparison, target)]
+        return values
+
+    def is_plain(self):
+        """Whether the total is just the sum of the dice (nothing kept, exploded or rerolled)."""
+        return self.keep is None and self.explode is None and self.reroll is None
+
+    def dice_terms(self):
+        return (self,)
+
+    def __str__(self):
+        return self.text
+
+class Group(Expression):
+    """The totals of several expressions, keeping the n highest (or lowest) ones with keep (n, highest)."""
+
+    __slots__ = ('expressions', 'keep', 'text')
+
+    def __init__(self, expressions, keep=None, text=None):
+        self.expressions = expressions
+        self.keep = keep
+        self.text = text or '{' + ', '.join(str(e) for e in expressions) + '}'
+
+    def roll(self, rng=random):
+        totals = [e.roll(rng) for e in self.expressions]
+        if self.keep is not None:
+            n, highest = self.keep
+            totals = sorted(totals, reverse=highest)[:n]
+        return sum(totals)
+
+    def dice_terms(self):
+        return tuple(term for e in self.expressions for term in e.dice_terms())
+
+    def names(self):
+        return tuple(name for e in self.expressions for name in e.names())
+
+    def bind(self, values):
+        return Group(tuple(e.bind(values) for e in self.expressions), self.keep)
+
+    def __str__(self):
+        return self.text
+
+class Negate(Expression):
+    __slots__ = ('operand',)
+
+    precedence = 2
+
+    def __init__(self, operand):
+        self.operand = operand
+
+    def roll(self, rng=random):
+        return -self.operand.roll(rng)
+
+    def roll_many(self, times, rng=random):
+        return [-total for total in self.operand.roll_many(times, rng)]
+
+    def dice_terms(self):
+        return self.operand.dice_terms()
+
+    def names(self):
+        return self.operand.names()
+
+    def bind(self, values):
+        return Negate(self.operand.bind(values))
+
+    def __str__(self):
+        return f'-{self.operand._render(3)}'
+
+class BinaryOp(Expression):
+    __slots__ = ('operator', 'left', 'right')
+
+    PRECEDENCE = {'+': 0, '-': 0, '*': 1, '/': 1}
+
+    def __init__(self, operator, left, right):
+        self.operator = operator
+        self.left = left
+        self.right = right
+
+    @property
+    def precedence(self):
+        return BinaryOp.PRECEDENCE[self.operator]
+
+    def roll(self, rng=random):
+        return self.apply(self.left.roll(rng), self.right.roll(rng))
+
+    def roll_many(self, times, rng=random):
+        return [self.apply(left, right) for left, right in
+                zip(self.left.roll_many(times, rng), self.right.roll_many(times, rng))]
+
+    def apply(self, left, right):
+        if self.operator == '+':
+            return left + right
+        if self.operator == '-':
+            return left - right
+        if self.operator == '*':
+            return left * right
+        if right == 0:
+            raise InvalidDiceExpression('your request divides by zero!')
+        return left // right
+
+    def dice_terms(self):
+        return self.left.dice_terms() + self.right.dice_terms()
+
+    def names(self):
+        return self.left.names() + self.right.names()
+
+    def bind(self, values):
+        return BinaryOp(self.operator, self.left.bind(values), self.right.bind(values))
+
+    def __str__(self):
+        # A negative constant is shown as a subtraction: 1d20+-1 is 1d20-1
+        if self.operator in '+-' and isinstance(self.right, Constant) and self.right.value < 0:
+            operator = '-' if self.operator == '+' else '+'
+            return f'{self.left._render(0)}{operator}{-self.right.value}'
+        # Negate binds tighter, but 1d20--2 reads badly
+        right = f'({self.right})' if isinstance(self.right, Negate) else self.right._render(self.precedence + 1)
+        return f'{self.left._render(self.precedence)}{self.operator}{right}'
+
+def matches(value, comparison, target):
+    if comparison == '<':
+        return value <= target
+    if comparison == '>':
+        return value >= target
+    return value == target
+
+@functools.lru_cache(maxsize=DICE_CACHE_SIZE)
+def compile_expression(text):
+    """
+    Parses a dice expression (see the module docstring) into an Expression.
+    Raises InvalidDiceExpression when it isn't valid.
+    """
+    return _Parser(text).parse()
+
+def check_limits(expressions, times=None):
+    """
+    Raises InvalidDiceExpression when the expressions of a message go over MAX_TERMS or MAX_DICE,
+    or over MAX_GROUP times, each of them being rolled the number of times (1 by default) in times.
+    """
+    times = times or [1] * len(expressions)
+    if any(t < 1 or t > MAX_GROUP for t in times):
+        raise InvalidDiceExpression(f'your request can roll an expression from 1 to {MAX_GROUP} times!')
+    terms = [(term, t) for e, t in zip(expressions, times) for term in e.dice_terms()]
+    if len(terms) > MAX_TERMS:
+        raise InvalidDiceExpression(f'your request can have up to {MAX_TERMS} dice terms!')
+    if sum(term.count * t for term, t in terms) > MAX_DICE:
+        raise InvalidDiceExpression(f'your request can roll up to {MAX_DICE} dice at once!')
+
+def use_exact_sampler(count, sides):
+    return EXACT_SAMPLER_MIN_DICE > 0 and count >= EXACT_SAMPLER_MIN_DICE and \
+        distribution_size(count, sides) <= EXACT_SAMPLER_MAX_BYTES
+
+def distribution_size(count, sides):
+    """
+    About how many bytes the table of sum_distribution(count, sides) takes: one int per total, of up
+    to sides ** count, plus the overhead of an int object.
+    """
+    return (count * (sides - 1) + 1) * (28 + count * sides.bit_length() // 8)
+
+@functools.lru_cache(maxsize=EXACT_SAMPLER_CACHE_SIZE)
+def sum_distribution(count, sides):
+    """
+    Distribution of the total of count dice of sides sides: a list whose i-th element is the number
+    of the sides ** count rolls that total count + i or less.
+    """
+    ways = [1]
+    for _ in range(count):
+        # Rolling one more die: each total can be reached from the sides previous ones below it
+        window = 0
+        next_ways = []
+        for total in range(len(ways) + sides - 1):
+            if total < len(ways):
+                window += ways[total]
+            if total >= sides:
+                window -= ways[total - sides]
+            next_ways.append(window)
+        ways = next_ways
+    return list(itertools.accumulate(ways))
+
+def sample_sum(count, sides, rng=random):
+    """The total of count dice of sides sides, drawn at once from the exact distribution of the totals."""
+    cumulative = sum_distribution(count, sides)
+    return count + bisect.bisect_right(cumulative, rng.randrange(cumulative[-1]))
+
+def split(text):
+    """Splits several comma separated expressions ('1d20+2, 1d8') at the top level (not inside groups)."""
+    expressions = []
+    depth = 0
+    start = 0
+    for i, c in enumerate(text):
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+        elif c == ',' and depth == 0:
+            expressions.append(text[start:i].strip())
+            start = i + 1
+    expressions.append(text[start:].strip())
+    return [e for e in expressions if e != '']
+
+@functools.lru_cache(maxsize=DICE_CACHE_SIZE)
+def add(expression, modifier):
+    """expression + modifier, shown as such even when modifier is 0 (1d20+0)."""
+    return BinaryOp('+', expression, Constant(modifier))
+
+class _Parser:
+    """
+    Recursive descent parser of the grammar:
+
+        expression := term (('+' | '-') term)*
+        term       := unary (('*' | '/') unary)*
+        unary      := '-' unary | atom
+        atom       := number | name | dice | '(' expression ')' | '{' expression (',' expression)* '}' keep?
+        dice       := number? 'd' (number | '%') (keep | explode | reroll)*
+    """
+
+    def __init__(self, text):
+        self.text = text.strip().lower()
+        self.tokens = []
+        position = 0
+        while position < len(self.text):
+            match = TOKEN_PATTERN.match(self.text, position)
+            if match is None:
+                if self.text[position:].strip() == '':
+                    break
+                raise InvalidDiceExpression(f"your request was not a valid equation! "
+                                            f"'{self.text[position:].strip()[0]}' is not valid. {USAGE}")
+            self.tokens.append((match.group(1), match.start(1)))
+            if len(self.tokens) > MAX_TOKENS:
+                raise InvalidDiceExpression(f'your request is too long! An expression can have up to {MAX_TOKENS} '
+                                            f'numbers, dice and signs.')
+            position = match.end()
+        self.index = 0
+
+    def parse(self):
+        if len(self.tokens) == 0:
+            raise InvalidDiceExpression(f'your request was not a valid equation! {USAGE}')
+        expression = self.expression()
+        if self.peek() is not None:
+            self.fail()
+        return expression
+
+    def peek(self):
+        return self.tokens[self.index][0] if self.index < len(self.tokens) else None
+
+    def next(self):
+        token = self.peek()
+        if token is None:
+            raise InvalidDiceExpression(f'your request was not a valid equation! It ends too soon. {USAGE}')
+        self.index += 1
+        return token
+
+    def fail(self):
+        token = self.peek()
+        if token is None:
+            raise InvalidDiceExpression(f'your request was not a valid equation! It ends too soon. {USAGE}')
+        raise InvalidDiceExpression(f"your request was not a valid equation! '{token}' was not expected. {USAGE}")
+
+    def number(self):
+        if self.peek() is None or not self.peek().isdigit():
+            self.fail()
+        return int(self.next())
+
+    def expression(self):
+        expression = self.term()
+        while self.peek() in ('+', '-'):
+            expression = BinaryOp(self.next(), expression, self.term())
+        return expression
+
+    def term(self):
+        expression = self.unary()
+        while self.peek() in ('*', '/'):
+            expression = BinaryOp(self.next(), expression, self.unary())
+        return expression
+
+    def unary(self):
+        if self.peek() == '-':
+            self.next()
+            return Negate(self.unary())
+        return self.atom()
+
+    def atom(self):
+        token = self.peek()
+        if token == '(':
+            self.next()
+            expression = self.expression()
+            if self.next() != ')':
+                self.index -= 1
+                self.fail()
+            return expression
+        if token == '{':
+            return self.group()
+        start = self.tokens[self.index][1] if token is not None else None
+        if token is not None and NAME_PATTERN.match(token):
+            self.next()
+            return Name(token)
+        if token == 'd':
+            return self.dice(1, start)
+        count = self.number()
+        if self.peek() == 'd':
+            return self.dice(count, start)
+        return Constant(count)
+
+    def group(self):
+        start = self.tokens[self.index][1]
+        self.next()
+        expressions = [self.expression()]
+        while self.peek() == ',':
+            self.next()
+            expressions.append(self.expression())
+        if self.next() != '}':
+            self.index -= 1
+            self.fail()
+        keep = self.keep(len(expressions))
+        return Group(tuple(expressions), keep, self.source(start))
+
+    def dice(self, count, start):
+        self.next()
+        if self.peek() == '%':
+            self.next()
+            sides = 100
+        else:
+            sides = self.number()
+
+        if count < 1 or count > MAX_DICE:
+            raise InvalidDiceExpression(f'your request can roll from 1 to {MAX_DICE} dice at once!')
+        if sides < 1 or sides > MAX_SIDES:
+            raise InvalidDiceExpression(f'your request can roll dice from 1 to {MAX_SIDES} sides!')
+
+        keep = None
+        explode = None
+        reroll = None
+        while self.peek() in ('kh', 'kl', 'k', 'dh', 'dl', '!', 'r', 'ro'):
+            if self.peek() == '!':
+                self.next()
+                explode = sides
+                if self.peek() == '>':
+                    self.next()
+                    explode = self.number()
+                if explode <= 1:
+                    raise InvalidDiceExpression('your request explodes on every roll!')
+            elif self.peek() in ('r', 'ro'):
+                once = self.next() == 'ro'
+                comparison = self.next() if self.peek() in ('<', '>', '=') else '='
+                target = self.number()
+                if all(matches(value, comparison, target) for value in range(1, sides + 1)):
+                    raise InvalidDiceExpression('your request rerolls every value!')
+                reroll = (comparison, target, once)
+            else:
+                keep = self.keep(count)
+        return Dice(count, sides, keep, explode, reroll, self.source(start))
+
+    def keep(self, count):
+        """Parses kh/kl/k/dh/dl n as (dice kept, highest)."""
+        if self.peek() not in ('kh', 'kl', 'k', 'dh', 'dl'):
+            return None
+        operator = self.next()
+        n = self.number() if self.peek() is not None and self.peek().isdigit() else 1
+        if n > count:
+            raise InvalidDiceExpression(f"your request can't keep or drop {n} of {count}!")
+        if operator in ('kh', 'k'):
+            return (n, True)
+        if operator == 'kl':
+            return (n, False)
+        if operator == 'dh':
+            return (count - n, False)
+        return (count - n, True)
+
+    def source(self, start):
+        end = self.tokens[self.index - 1][1] + len(self.tokens[self.index - 1][0])
+        return re.sub(r'\s+', '', self.text[start:end])
+
+# The d20 of attack rolls, ability checks and initiative, which handlers add their modifiers to
+D20 = compile_expression('1d20')
@@ -21,3 +21,19 @@ class InvalidCommand(Exception):
 class NotADM(Exception):
     """Raised when a dm only command is triggered by a regular user"""
     pass
+
+class ConcurrentUpdate(Exception):
+    """Raised when a value couldn't be updated because other commands kept changing it at the same time"""
+    pass
+
+class DownloadError(Exception):
+    """Raised when a response is too big or takes too long to download"""
+    pass
+
+class InvalidDiceExpression(Exception):
+    """Raised when a dice expression can't be parsed or rolled"""
+    pass
+
+class EntityExists(Exception):
+    """Raised when an NPC, monster or adventure with the same name already exists in the campaign"""
+    pass
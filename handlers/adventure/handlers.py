@@ -1,10 +1,6 @@
-from database import Database
 from models.adventure import Adventure
 from decorators import only_dm, get_campaign
-from exceptions import CampaignNotFound
-from services.external_sources import ExternalSources
-
-external_sources = ExternalSources()
+from exceptions import CampaignNotFound, EntityExists
 
 def handler(bot, update, command, txt_args, username, chat_id, db):
     """Handle adventure-related commands."""
@@ -29,12 +25,15 @@ def handler(bot, update, command, txt_args, username, chat_id, db):
 
 def create_adventure(txt_args, db, chat_id):
     """Create a new adventure."""
-    if not txt_args:
+    args = txt_args.split()
+    if len(args) < 3:
         return "Usage: /create_adventure <name> <description> <level_range>"
     
-    name = txt_args[0]
-    description = txt_args[1]
-    level_range = list(map(int, txt_args[2].split('-'))) if '-' in txt_args[2] else [int(txt_args[2]), int(txt_args[2])]
+    name, description, levels = args[:3]
+    try:
+        level_range = list(map(int, levels.split('-'))) if '-' in levels else [int(levels), int(levels)]
+    except ValueError:
+        return "Usage: /create_adventure <name> <description> <level_range>"
     
     adventure_data = {
         'name': name,
@@ -44,28 +43,35 @@ def create_adventure(txt_args, db, chat_id):
     }
     
     adventure = Adventure(adventure_data)
-    db.add_adventure(chat_id, adventure)
+    try:
+        db.add_adventure(chat_id, adventure)
+    except EntityExists:
+        return f"Adventure '{adventure.name}' already exists in this campaign."
     
     return f"Adventure '{adventure.name}' created successfully!"
 
 def list_adventures(db, chat_id):
     """List all adventures in the campaign."""
-    adventures = db.get_adventures(chat_id)
+    adventures = db.get_adventure_summaries(chat_id)
     if not adventures:
         return "No adventures found in this campaign."
     
     response = "Adventures in this campaign:\n"
     for adventure in adventures:
-        response += f"\n• {adventure.name} (Level {adventure.level_range[0]}-{adventure.level_range[1]})"
+        # Firebase drops empty lists, so the level range may be missing
+        level_range = adventure.get('level_range', [])
+        levels = f" (Level {level_range[0]}-{level_range[-1]})" if level_range else ''
+        response += f"\n• {adventure.get('name')}{levels}"
     
     return response
 
 def view_adventure(txt_args, db, chat_id):
     """View detailed information about an adventure."""
-    if not txt_args:
+    args = txt_args.split()
+    if not args:
         return "Usage: /view_adventure <name>"
     
-    name = txt_args[0]
+    name = args[0]
     adventure = db.get_adventure_by_name(chat_id, name)
     
     if not adventure:
@@ -75,15 +81,20 @@ def view_adventure(txt_args, db, chat_id):
 
 def update_adventure(txt_args, db, chat_id):
     """Update adventure attributes."""
-    if len(txt_args) < 3:
+    args = txt_args.split()
+    if len(args) < 3:
         return "Usage: /update_adventure <name> <attribute> <value>"
     
-    name, attribute, value = txt_args[:3]
+    name, attribute, value = args[:3]
     adventure = db.get_adventure_by_name(chat_id, name)
     
     if not adventure:
         return f"Adventure '{name}' not found in this campaign."
     
+    if attribute == 'name':
+        # The name is the key the adventure is stored with
+        return f"Adventure '{name}' can't be renamed, delete it and create it again."
+
     try:
         setattr(adventure, attribute, value)
         db.update_adventure(chat_id, adventure)
@@ -93,10 +104,11 @@ def update_adventure(txt_args, db, chat_id):
 
 def delete_adventure(txt_args, db, chat_id):
     """Delete an adventure from the campaign."""
-    if not txt_args:
+    args = txt_args.split()
+    if not args:
         return "Usage: /delete_adventure <name>"
     
-    name = txt_args[0]
+    name = args[0]
     adventure = db.get_adventure_by_name(chat_id, name)
     
     if not adventure:
@@ -107,19 +119,21 @@ def delete_adventure(txt_args, db, chat_id):
 
 def import_adventure(txt_args, db, chat_id):
     """Import an adventure from external source."""
-    if not txt_args:
+    args = txt_args.split()
+    if not args:
         return "Usage: /import_adventure <url>"
     
-    url = txt_args[0]
+    url = args[0]
     # TODO: Implement actual import logic
     return "Adventure import functionality will be implemented soon."
 
 def start_adventure(txt_args, db, chat_id):
     """Start an adventure."""
-    if not txt_args:
+    args = txt_args.split()
+    if not args:
         return "Usage: /start_adventure <name>"
     
-    name = txt_args[0]
+    name = args[0]
     adventure = db.get_adventure_by_name(chat_id, name)
     
     if not adventure:
@@ -131,10 +145,11 @@ def start_adventure(txt_args, db, chat_id):
 
 def end_adventure(txt_args, db, chat_id):
     """End an adventure."""
-    if not txt_args:
+    args = txt_args.split()
+    if not args:
         return "Usage: /end_adventure <name>"
     
-    name = txt_args[0]
+    name = args[0]
     adventure = db.get_adventure_by_name(chat_id, name)
     
     if not adventure:
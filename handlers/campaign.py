@@ -2,7 +2,6 @@ import os
 import string
 import utils
 
-from database import Database
 from exceptions import CampaignNotFound, NotADM
 
 def handler(bot, update, command, txt_args, username, chat_id, db):
@@ -135,6 +134,7 @@ def render_map(chat_id, db):
     return bf_map + '```'
 
 if __name__ == "__main__":
+    from database import Database
     db = Database()
     print(start_campaign('3383241', 'TEst', db))
 
@@ -1,20 +1,28 @@
+import os
 import sys
-import requests
+import json
+from services import http_session
 
 from urllib.parse import urlparse
 
 import re
+import dice
 import utils
-from handlers.roll import roll
-from database import Database
 from utils import normalized_username
+from replies import InlineReplyBot
 from currency import optimal_exchange
 from models.character import Character, ABILITIES, SKILLS
 from decorators import only_dm, get_campaign, get_character
-from exceptions import CharacterNotFound, CampaignNotFound, InvalidCommand, NotADM
+from exceptions import CharacterNotFound, CampaignNotFound, InvalidCommand, NotADM, DownloadError
 
 CLOSE_COMBAT_DISTANCE = 5 # feet
 
+# Limits of the D&D Beyond JSON downloaded by /import_char (the sheets weigh around 500 KB) and how
+# often the download progress is reported in the chat
+IMPORT_MAX_BYTES = int(os.environ.get('IMPORT_MAX_BYTES', str(4 * 1024 * 1024)))
+IMPORT_DEADLINE = float(os.environ.get('IMPORT_DEADLINE', '5'))
+IMPORT_PROGRESS_STEP = 256 * 1024
+
 SIZE_MODIFIER = {
     'Colossal': -8,
     'Small': 1,
@@ -32,7 +40,7 @@ CURRENCY_PATTERN = re.compile('([-]?\d+)(cp|sp|ep|gp|pp)*(\d+)*')
 
 def handler(bot, update, command, txt_args, username, chat_id, db):
     if command == '/import_char':
-        response = import_character(txt_args, db, requests.get)
+        response = import_character(txt_args, db, http_session.get, import_progress(bot, chat_id))
     if command == '/link_char':
         response = link_character(command, txt_args, db, chat_id, username)
     elif command == '/attack_roll':
@@ -60,24 +68,58 @@ def handler(bot, update, command, txt_args, username, chat_id, db):
 
     bot.send_message(chat_id=chat_id, text=response, parse_mode="Markdown")
 
-def import_character(url, db, get):
+def import_character(url, db, get, progress=None):
     parsed_url = urlparse(url)
     if parsed_url[0] == '':
         return f'{url} is not a valid URL'
 
-    response = get(url)
+    response = get(url, stream=True, timeout=IMPORT_DEADLINE)
     if response.status_code != 200:
+        response.close()
         return f'Error fetching {url} (status_code: {response.status_code})'
 
-    character_data = response.json()
-    character_id = character_data['character']['id']
-    character_name = character_data['character']['name']
+    try:
+        body = http_session.read_body(response, IMPORT_MAX_BYTES, IMPORT_DEADLINE, progress, starts_with=b'{')
+        character_data = json.loads(body)
+        # Only the parsed sheet is kept while it's stored
+        del body
+        character_id = character_data['character']['id']
+        character_name = character_data['character']['name']
+    except DownloadError as e:
+        return f'Error fetching {url}: {e}'
+    except (ValueError, TypeError, KeyError):
+        return f'{url} is not a D&D Beyond character'
 
     if db.save_character_info(character_id, character_data) != None:
         return f'Character "{character_name}" imported successfully!'
     else:
         return f'Something went wrong importing {character_name}'
 
+def import_progress(bot, chat_id):
+    """
+    Returns a progress callback for http_session.read_body() that reports the download in the chat,
+    every IMPORT_PROGRESS_STEP bytes, editing the same message.
+    """
+    if isinstance(bot, InlineReplyBot):
+        # The inline reply can't be edited and is delivered after everything else, so it's left for
+        # the result and the progress goes through the Bot API
+        bot = bot.bot
+    state = {'message': None, 'reported': 0}
+
+    def progress(received, total):
+        if received - state['reported'] < IMPORT_PROGRESS_STEP:
+            return
+        state['reported'] = received
+        text = f'Downloading character... {received // 1024} KB'
+        if total is not None:
+            text += f' of {total // 1024} KB'
+        if state['message'] is None:
+            state['message'] = bot.send_message(chat_id=chat_id, text=text)
+        else:
+            bot.edit_message_text(text=text, chat_id=chat_id, message_id=state['message'].message_id)
+
+    return progress
+
 @get_campaign
 def link_character(command, txt_args, db, chat_id, username, **kargs):
     campaign = kargs.get('campaign')
@@ -130,10 +172,10 @@ def attack_roll(txt_args, db, chat_id, username):
     # TODO: Attack with spell
     # Attack with weapon
     if attack_type in ["ranged", "r"] and distance > weapon.long_range:
-        return f"You can't attack a target beyond the range of your weapon ({weapon_name}, {weapon.long_range}ft)"
+        return f"You can't attack a target beyond the range of your weapon ({weapon.name}, {weapon.long_range}ft)"
 
     prof = " + PRO(0)"
-    if character.has_proficiency(weapon_name):
+    if character.has_proficiency(weapon.name):
         mods += character.proficiency
         prof = f" + PRO({character.proficiency})"
 
@@ -166,16 +208,13 @@ def attack_roll(txt_args, db, chat_id, username):
         adv_mod = " + ADV"
 
     txt_formula = f"{base_notation}{prof}{txt_mod}{adv_mod}"
-    if mods > 0:
-        dice_notation = f"{base_notation}+{mods}"
-    else:
-        dice_notation = base_notation
+    expression = dice.D20 if mods == 0 else dice.add(dice.D20, mods)
+    dice_notation = str(expression)
+    dice_rolls = [expression.roll()]
 
     if adv_mod != "":
         dice_notation = f"{dice_notation},{dice_notation}"
-
-    results = roll(dice_notation)
-    dice_rolls = results[list(results.keys())[0]]
+        dice_rolls.append(expression.roll())
 
     return (f"@{username} attack roll for {character.name} with {weapon_name} ({attack_type}):"
             f"\r\nFormula: {txt_formula}"
@@ -185,9 +224,9 @@ def attack_roll(txt_args, db, chat_id, username):
 @get_character
 def initiative_roll(command, txt_args, db, chat_id, username, **kargs):
     character = kargs.get('character')
-    dice_notation = f'1d20+{character.dex_mod}'
-    results = roll(dice_notation)
-    dice_rolls = results[list(results.keys())[0]][0]
+    expression = dice.add(dice.D20, character.dex_mod)
+    dice_notation = str(expression)
+    dice_rolls = expression.roll()
     return (f'@{username} initiative roll for {character.name}:'
             f'\r\nFormula: 1d20 + DEX({character.dex_mod})'
             f'\r\n*{dice_notation}*: {dice_rolls}')
@@ -200,9 +239,9 @@ def short_rest_roll(command, txt_args, db, chat_id, username, **kargs):
     if character.hit_dice_used == character.level:
         return f'{character.name} spent all the hit dice already. You need to take a long rest to replenish them.'
 
-    dice_notation = f'1d{character.hit_dice}+{character.con_mod}'
-    results = roll(dice_notation)
-    dice_rolls = results[list(results.keys())[0]][0]
+    expression = dice.add(dice.compile_expression(f'1d{character.hit_dice}'), character.con_mod)
+    dice_notation = str(expression)
+    dice_rolls = expression.roll()
     return (f'@{username} short rest roll for {character.name}:'
             f'\r\nFormula: 1d{character.hit_dice} + CON({character.con_mod})'
             f'\r\n*{dice_notation}*: {dice_rolls}')
@@ -271,12 +310,11 @@ def set_hp(command, txt_args, db, chat_id, username, **kargs):
     character = kargs.get('character')
     command = command.replace('/', '').strip()
 
-    if command == 'damage':
-        character.damage(points)
-    else:
-        character.heal(points)
-
-    db.set_char_hp(character.id, hit_points=character.removed_hit_points)
+    # The database applies the change on the stored hit points, so simultaneous /damage and /heal
+    # commands on the same character don't overwrite each other
+    removed_hit_points = db.change_char_hp(character.id, points if command == 'damage' else -points, character.max_hit_points)
+    character.removed_hit_points = removed_hit_points
+    character.current_hit_points = character.max_hit_points - removed_hit_points
     return f'{character.name} received {points} pts of {command}. HP: {character.current_hit_points}/{character.max_hit_points}'
 
 def talk(command, txt_args):
@@ -350,13 +388,9 @@ def ability_check(txt_args, db, chat_id, username):
         txt_skill_mod = f' + {skill.capitalize()}({character.mods[skill]})'
 
     txt_formula = f"{base_notation}{txt_ability_mod}{txt_skill_mod}"
-    if mods > 0:
-        dice_notation = f"{base_notation}+{mods}"
-    else:
-        dice_notation = base_notation
-
-    results = roll(dice_notation)
-    dice_rolls = results[list(results.keys())[0]]
+    expression = dice.D20 if mods == 0 else dice.add(dice.D20, mods)
+    dice_notation = str(expression)
+    dice_rolls = [expression.roll()]
 
     return (f"@{username} ability check for {character.name} with {ability_desc}:"
             f"\r\nFormula: {txt_formula}"
@@ -1,4 +1,4 @@
-import requests
+from services import http_session
 
 SHEETS_JSON_URL = "https://gist.githubusercontent.com/satanas/0d38dad2f1eae87143a4cd10206eece5/raw/b4bdf85be78e5e15f3a65c7c7474862a2477dc48/character_dnd.json"
 
@@ -15,7 +15,7 @@ def handler(bot, update, command, txt_args, username, chat_id, db):
 
 
 def get_charsheet_link(username):
-    r = requests.get(SHEETS_JSON_URL)
+    r = http_session.get(SHEETS_JSON_URL)
     sheet = r.json()
 
     link = f"{username} has no character sheet registered"
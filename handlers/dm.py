@@ -42,8 +42,11 @@ def add_xp(command, txt_args, db, chat_id, username, **kargs):
     character = kargs.get('character')
     command = command.replace('/', '').strip()
 
+    level = character.level
     character.add_xp(points)
 
     db.set_char_xp(character.id, xp=character.current_experience)
-    db.set_char_level(character.id, level=character.level)
+    if character.level != level:
+        # Changing the level throws the snapshot of the character away
+        db.set_char_level(character.id, level=character.level)
     return f'{character.name} received {points} pts of experience. XP: {character.current_experience} | Level: {character.level}'
@@ -1,7 +1,6 @@
-from database import Database
 from models.monster import Monster
 from decorators import only_dm, get_campaign
-from exceptions import CampaignNotFound
+from exceptions import CampaignNotFound, EntityExists
 
 def handler(bot, update, command, txt_args, username, chat_id, db):
     """Handle monster-related commands."""
@@ -17,17 +16,21 @@ def handler(bot, update, command, txt_args, username, chat_id, db):
         response = delete_monster(txt_args, db, chat_id)
     elif command == '/import_monster':
         response = import_monster(txt_args, db, chat_id)
-    
+
     return response
 
 def create_monster(txt_args, db, chat_id):
     """Create a new monster."""
-    if len(txt_args) < 3:
+    args = txt_args.split()
+    if len(args) < 3:
+        return "Usage: /create_monster <name> <type> <challenge_rating>"
+
+    name, monster_type, cr = args[:3]
+    try:
+        cr = float(cr)
+    except ValueError:
         return "Usage: /create_monster <name> <type> <challenge_rating>"
-    
-    name, monster_type, cr = txt_args[:3]
-    cr = float(cr)
-    
+
     monster_data = {
         'name': name,
         'type': monster_type,
@@ -47,69 +50,87 @@ def create_monster(txt_args, db, chat_id):
         'senses': {},
         'damage_resistances': [],
         'damage_immunities': [],
+        'condition_immunities': [],
+        'special_abilities': [],
+        'legendary_actions': []
+    }
+
+    monster = Monster(monster_data)
+    try:
+        db.add_monster(chat_id, monster)
+    except EntityExists:
+        return f"Monster '{monster.name}' already exists in this campaign."
+
+    return f"Monster '{monster.name}' created successfully!"
 
-@decorators.only_dm
-@decorators.get_campaign
-async def list_monsters(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """List all monsters in the campaign."""
-    monsters = database.get_monsters(context.campaign_id)
+def list_monsters(db, chat_id):
+    """List all monsters in the current campaign."""
+    monsters = db.get_monster_summaries(chat_id)
     if not monsters:
-        await update.message.reply_text("No monsters found in this campaign.")
-        return
-    
-    monster_list = "\n".join([f"{monster['name']} - {monster['type']} CR {monster['challenge_rating']} HP {monster['hp']}" 
-                             for monster in monsters])
-    await update.message.reply_text(f"Monsters in campaign:\n{monster_list}")
-
-@decorators.only_dm
-@decorators.get_campaign
-async def update_monster(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Update an existing monster."""
-    args = context.args
-    if not args or len(args) < 4:
-        await update.message.reply_text("Usage: /update_monster <name> <type> <challenge_rating> <hp>")
-        return
-    
+        return "No monsters found in this campaign."
+
+    response = "Monsters in this campaign:\n"
+    for monster in monsters:
+        response += f"\n• {monster.get('name')} ({monster.get('type')}, CR {monster.get('challenge_rating')}, HP {monster.get('max_hit_points')})"
+
+    return response
+
+def view_monster(txt_args, db, chat_id):
+    """View detailed information about a monster."""
+    args = txt_args.split()
+    if not args:
+        return "Usage: /view_monster <name>"
+
+    name = args[0]
+    monster = db.get_monster_by_name(chat_id, name)
+
+    if not monster:
+        return f"Monster '{name}' not found in this campaign."
+
+    return monster.get_description()
+
+def update_monster(txt_args, db, chat_id):
+    """Update monster attributes."""
+    args = txt_args.split()
+    if len(args) < 3:
+        return "Usage: /update_monster <name> <attribute> <value>"
+
+    name, attribute, value = args[:3]
+    monster = db.get_monster_by_name(chat_id, name)
+
+    if not monster:
+        return f"Monster '{name}' not found in this campaign."
+
+    if attribute == 'name':
+        # The name is the key the monster is stored with
+        return f"Monster '{name}' can't be renamed, delete it and create it again."
+
     try:
-        name = args[0]
-        monster_type = args[1]
-        challenge_rating = float(args[2])
-        hp = int(args[3])
-        
-        monster = Monster(name, monster_type, challenge_rating, hp)
-        database.update_monster(context.campaign_id, monster)
-        await update.message.reply_text(f"Monster {name} updated successfully!")
-    except (IndexError, ValueError):
-        await update.message.reply_text("Invalid arguments. Usage: /update_monster <name> <type> <challenge_rating> <hp>")
-
-@decorators.only_dm
-@decorators.get_campaign
-async def delete_monster(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Delete a monster."""
-    args = context.args
+        setattr(monster, attribute, value)
+        db.update_monster(chat_id, monster)
+        return f"Monster '{name}' updated successfully!"
+    except AttributeError:
+        return f"Invalid attribute '{attribute}' for monster."
+
+def delete_monster(txt_args, db, chat_id):
+    """Delete a monster from the campaign."""
+    args = txt_args.split()
     if not args:
-        await update.message.reply_text("Usage: /delete_monster <name>")
-        return
-    
+        return "Usage: /delete_monster <name>"
+
     name = args[0]
-    monster = database.get_monster_by_name(context.campaign_id, name)
+    monster = db.get_monster_by_name(chat_id, name)
+
     if not monster:
-        await update.message.reply_text(f"Monster {name} not found.")
-        return
-    
-    database.delete_monster(context.campaign_id, monster)
-    await update.message.reply_text(f"Monster {name} deleted successfully!")
-
-@decorators.only_dm
-async def import_monster(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        return f"Monster '{name}' not found in this campaign."
+
+    db.delete_monster(chat_id, monster)
+    return f"Monster '{name}' deleted successfully!"
+
+def import_monster(txt_args, db, chat_id):
     """Import a monster from an external source."""
-    args = context.args
-    if not args:
-        await update.message.reply_text("Usage: /import_monster <url>")
-        return
-    
-    try:
-        # TODO: Implement monster import logic
-        await update.message.reply_text("Monster import feature coming soon!")
-    except Exception as e:
-        await update.message.reply_text(f"Error importing monster: {str(e)}")
+    if not txt_args:
+        return "Usage: /import_monster <url>"
+
+    # TODO: Implement monster import logic
+    return "Monster import feature coming soon!"
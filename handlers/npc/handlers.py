@@ -1,7 +1,6 @@
-from database import Database
 from models.npc import NPC
 from decorators import only_dm, get_campaign
-from exceptions import CampaignNotFound
+from exceptions import CampaignNotFound, EntityExists
 
 def handler(bot, update, command, txt_args, username, chat_id, db):
     """Handle NPC-related commands."""
@@ -20,10 +19,11 @@ def handler(bot, update, command, txt_args, username, chat_id, db):
 
 def create_npc(txt_args, db, chat_id):
     """Create a new NPC."""
-    if not txt_args:
+    args = txt_args.split()
+    if len(args) < 3:
         return "Usage: /create_npc <name> <race> <class>"
     
-    name, race, npc_class = txt_args[:3]
+    name, race, npc_class = args[:3]
     
     npc_data = {
         'name': name,
@@ -46,28 +46,32 @@ def create_npc(txt_args, db, chat_id):
     }
     
     npc = NPC(npc_data)
-    db.add_npc(chat_id, npc)
+    try:
+        db.add_npc(chat_id, npc)
+    except EntityExists:
+        return f"NPC '{npc.name}' already exists in this campaign."
     
     return f"NPC '{npc.name}' created successfully!"
 
 def list_npcs(db, chat_id):
     """List all NPCs in the current campaign."""
-    npcs = db.get_npcs(chat_id)
+    npcs = db.get_npc_summaries(chat_id)
     if not npcs:
         return "No NPCs found in this campaign."
     
     response = "NPCs in this campaign:\n"
     for npc in npcs:
-        response += f"\n• {npc.name} (Level {npc.level}, {npc.race} {npc._class})"
+        response += f"\n• {npc.get('name')} (Level {npc.get('level')}, {npc.get('race')} {npc.get('class')})"
     
     return response
 
 def view_npc(txt_args, db, chat_id):
     """View detailed information about an NPC."""
-    if not txt_args:
+    args = txt_args.split()
+    if not args:
         return "Usage: /view_npc <name>"
     
-    name = txt_args[0]
+    name = args[0]
     npc = db.get_npc_by_name(chat_id, name)
     
     if not npc:
@@ -77,15 +81,20 @@ def view_npc(txt_args, db, chat_id):
 
 def update_npc(txt_args, db, chat_id):
     """Update NPC attributes."""
-    if len(txt_args) < 3:
+    args = txt_args.split()
+    if len(args) < 3:
         return "Usage: /update_npc <name> <attribute> <value>"
     
-    name, attribute, value = txt_args[:3]
+    name, attribute, value = args[:3]
     npc = db.get_npc_by_name(chat_id, name)
     
     if not npc:
         return f"NPC '{name}' not found in this campaign."
     
+    if attribute == 'name':
+        # The name is the key the NPC is stored with
+        return f"NPC '{name}' can't be renamed, delete it and create it again."
+
     try:
         setattr(npc, attribute, value)
         db.update_npc(chat_id, npc)
@@ -95,10 +104,11 @@ def update_npc(txt_args, db, chat_id):
 
 def delete_npc(txt_args, db, chat_id):
     """Delete an NPC from the campaign."""
-    if not txt_args:
+    args = txt_args.split()
+    if not args:
         return "Usage: /delete_npc <name>"
     
-    name = txt_args[0]
+    name = args[0]
     npc = db.get_npc_by_name(chat_id, name)
     
     if not npc:
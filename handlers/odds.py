@@ -0,0 +1,55 @@
+import re
+
+import dice
+import odds
+from handlers.character import get_linked_character
+from exceptions import InvalidDiceExpression, InvalidCommand
+
+PERCENTILES = [10, 25, 50, 75, 90]
+
+VS_PATTERN = re.compile(r'\s+vs\.?\s+', re.IGNORECASE)
+
+def handler(bot, update, command, txt_args, username, chat_id, db):
+    """Handle /odds <expression> [vs DC]."""
+    try:
+        response = get_odds(txt_args, db, chat_id, username)
+    except InvalidDiceExpression as e:
+        response = f"{username} {str(e)}"
+
+    return response
+
+def get_odds(txt_args, db, chat_id, username):
+    """
+    Exact odds of a dice expression: mean, percentiles and, with vs DC, the chance to meet the DC
+    (or AC). The expression can use the mods of the character of username (1d20+dex, 1d20+stealth)
+    and its proficiency bonus (prof).
+    """
+    args = VS_PATTERN.split(txt_args.strip())
+    if args[0] == '' or len(args) > 2:
+        return 'Invalid syntax. Usage:\r\n/odds <expression> \\[vs DC]'
+
+    dc = None
+    if len(args) == 2:
+        try:
+            dc = int(args[1])
+        except ValueError:
+            raise InvalidCommand
+
+    expression = dice.compile_expression(re.sub(r'\s+', '', args[0]))
+    dice.check_limits([expression])
+    owner = ''
+    if len(expression.names()) > 0:
+        character = get_linked_character(db, chat_id, username)
+        values = dict(character.mods)
+        values['prof'] = character.proficiency
+        expression = expression.bind(values)
+        owner = f' for {character.name}'
+
+    distribution = odds.distribution(expression)
+    percentiles = ' | '.join(f'{p}%: {distribution.percentile(p)}' for p in PERCENTILES)
+    response = (f'@{username} odds of `{args[0]}`{owner}:'
+                f'\r\nMean: {distribution.mean():.2f} | Min: {distribution.minimum()} | Max: {distribution.maximum()}'
+                f'\r\n{percentiles}')
+    if dc is not None:
+        response += f'\r\nChance of {dc} or more: {distribution.chance_at_least(dc):.2%}'
+    return response
@@ -1,13 +1,19 @@
 import re
-import random
 
-DICE_ROLL_PATTERN = re.compile('(\d+?d\d{1,3}|\d+?d%)([+-])*(\d+)*')
+import dice
+from exceptions import InvalidDiceExpression
+
+# An expression rolled for a group of creatures: 12x1d20+2
+GROUP_PATTERN = re.compile(r'^(\d+)x(.+)$')
 
 # Method to be invoked by telegram
 def handler(bot, update, command, expression, username, chat_id, db):
     try:
-        results = roll(expression)
-        resp = response(username, results)
+        if command == '/group_roll':
+            resp = group_roll(expression, db, chat_id, username)
+        else:
+            results = roll(expression)
+            resp = response(username, results)
     except Exception as e:
         resp = f"{username} {str(e)}"
 
@@ -20,52 +26,83 @@ def handler(bot, update, command, expression, username, chat_id, db):
 # 1d100
 # 2d20
 # 1d%
+# 4d6kh3,2d20kl1+5
+# {4d6,3d8}kh1
+# 12x1d20+2
 def roll(expression):
-    equation = DICE_ROLL_PATTERN.findall(expression)
+    """
+    Rolls the comma separated dice expressions (see dice) and returns their results by expression,
+    in a list per expression as the same one can be rolled several times. Nx<expression> rolls it
+    N times at once, for a group of creatures. Totals are at least 1, like 1d6-10.
+    Raises InvalidDiceExpression when an expression isn't valid.
+    """
     results = {}
-
-    if len(equation) <= 0:
-        raise Exception('your request was not a valid equation! Please use the dice notation (for example: 1d6 to roll a die of 6 sides)')
-
-    for i in range(0, len(equation)):
-        parts = equation[i]
-        key = ''.join(parts)
-        roll_result = process_notation(parts[0], parts[1], parts[2])
+    expressions = [re.sub(r'\s+', '', e) for e in dice.split(expression)]
+
+    if len(expressions) <= 0:
+        raise InvalidDiceExpression(f'your request was not a valid equation! {dice.USAGE}')
+
+    compiled = []
+    times = []
+    for key in expressions:
+        group = GROUP_PATTERN.match(key)
+        compiled.append(dice.compile_expression(group.group(2) if group else key))
+        times.append(int(group.group(1)) if group else 1)
+    dice.check_limits(compiled, times)
+
+    for key, expression, n in zip(expressions, compiled, times):
+        roll_result = expression.roll_many(n) if GROUP_PATTERN.match(key) else [expression.roll()]
+        roll_result = [max(1, total) for total in roll_result]
         if key in results:
-            results[key].append(roll_result)
+            results[key] += roll_result
         else:
-            results[key] = [roll_result]
+            results[key] = roll_result
 
     return results
 
-def process_notation(notation, sign, modifier_amount):
-    result = 0
-
-    modifier = 0
-    if sign != '' and modifier != '':
-        modifier = int(sign + modifier_amount)
-
-    dice_num = int(notation.split('d')[0])
-    sides = notation.split('d')[1]
-    if sides == '100' and dice_num > 1:
-        raise Exception('percentile roll doesn\'t support multiple dice')
-
-    if sides == '100' or sides == '%':
-        result = roll_one(100)
+def group_roll(txt_args, db, chat_id, username):
+    """
+    /group_roll <monster> <n> <check>: rolls a check (an ability, a skill or initiative) for n
+    monsters of the campaign at once.
+    """
+    args = txt_args.split()
+    if len(args) < 3 or not args[-2].isdigit():
+        return ('Invalid syntax. Usage:'
+                '\r\n/group\\_roll <monster> <n> <check>')
+
+    # The name of the monster can have several words
+    name, n, check = ' '.join(args[:-2]), int(args[-2]), args[-1].lower()
+    monster = db.get_monster_by_name(chat_id, name)
+    if monster is None:
+        return f"Monster '{name}' not found in this campaign."
+
+    if check == 'initiative':
+        modifier = monster.initiative
+    elif check in monster.mods:
+        modifier = monster.mods[check]
     else:
-        for n in range(0, dice_num):
-            result += roll_one(int(sides))
-        result = max(1, result + modifier)
-
-    return result
+        return f"Invalid check. Supported options: initiative, {', '.join(monster.mods)}"
 
-def roll_one(sides):
-    return random.randint(1,sides)
+    expression = dice.add(dice.D20, modifier)
+    dice.check_limits([expression], [n])
+    results = {f'{n}x{expression}': expression.roll_many(n)}
+    return response(username, results, f'rolled {check} for {n} {monster.name}')
 
-def response(username, results):
+def response(username, results, title='rolled'):
     rolls = ''
     for key in results:
-        rolls += f"\r\n *{key}*: {results[key]}"
+        if GROUP_PATTERN.match(key):
+            rolls += f"\r\n *{key}*:\r\n{group_table(results[key])}"
+        else:
+            rolls += f"\r\n *{key}*: {results[key]}"
+
+    return f"{username} {title}:{rolls}"
 
-    return f"{username} rolled:{rolls}"
+def group_table(totals):
+    """The totals of a group roll, from the highest, with the number of the creature that rolled each."""
+    rows = sorted(enumerate(totals, 1), key=lambda x: (-x[1], x[0]))
+    number_width = len(str(len(totals))) + 1
+    total_width = max(len(str(total)) for total in totals)
+    lines = [f"{'#' + str(i):<{number_width}} {total:>{total_width}}" for i, total in rows]
+    return '```\r\n' + '\r\n'.join(lines) + '\r\n```'
 
@@ -1,5 +1,3 @@
-from database import Database
-
 def handler(bot, update, command, txt_args, username, chat_id, db):
     if command == '/set_turns':
         response = set_turns(chat_id, txt_args, db)
@@ -35,8 +33,7 @@ def get_current_turn(chat_id, db):
 def update_turn(chat_id, db, is_next=True):
     diff = 1 if is_next else -1
     turns, turn_index, campaign_id = get_turns_info(chat_id, db)
-    turn_index = int(turn_index) + diff
-    db.set_turn_index(campaign_id, turn_index)
+    turn_index = db.change_turn_index(campaign_id, diff)
     return print_turn(turns, turn_index % len(turns))
 
 def print_turns_order(turns):
@@ -3,8 +3,9 @@ import logging
 
 from telegram.ext import Updater, CommandHandler, MessageHandler, Filters
 
+from storage import get_storage
 from commands import ALL_COMMANDS, command_handler, default_handler, parse_command
-from exceptions import CommandNotFound, InvalidCommand, CampaignNotFound, CharacterNotFound, NotADM
+from exceptions import CommandNotFound, InvalidCommand, CampaignNotFound, CharacterNotFound, NotADM, ConcurrentUpdate
 
 TELEGRAM_TOKEN = os.environ.get('TELEGRAM_TOKEN')
 
@@ -14,12 +15,20 @@ logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s
 
 logger = logging.getLogger(__name__)
 
+# Self-hosted bots usually keep their data next to them: run with STORAGE_BACKEND=sqlite
+db = get_storage()
+
 def handler(bot, update):
     command = parse_command(update.message.text)
     txt_args = ' '.join(update.message.text.split(' ')[1:])
+    username = update.message.from_user.username if update.message.from_user.username else update.message.from_user.first_name
+    chat_id = update.message.chat.id
 
     try:
-        command_handler(command)(bot, update, command, txt_args)
+        with db.unit_of_work():
+            response = command_handler(command)(bot, update, command, txt_args, username, chat_id, db)
+            if isinstance(response, str):
+                bot.send_message(chat_id=chat_id, text=response, parse_mode="Markdown")
     except (CommandNotFound, InvalidCommand):
         default_handler(bot, update, 'Invalid command')
     except CharacterNotFound:
@@ -28,6 +37,8 @@ def handler(bot, update):
         default_handler(bot, update, f'Campaign not found. Theres must be an active campaign')
     except NotADM:
         default_handler(bot, update, f'Only the Dungeon Master can execute {command} command')
+    except ConcurrentUpdate:
+        default_handler(bot, update, 'Too many simultaneous changes, try again')
 
 def unknown(update, context):
     chat_id = context.message.chat.id
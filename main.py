@@ -4,12 +4,13 @@ import json
 import logging
 import telegram
 
-from database import Database
-from commands import command_handler, default_handler, is_command, parse_command
-from exceptions import CommandNotFound, CharacterNotFound, CampaignNotFound, InvalidCommand, NotADM
+from telegram.utils.request import Request
 
-from telegram.ext import Updater
-from telegram.ext import CommandHandler
+from replies import InlineReplyBot
+from dedup import UpdateDeduplicator
+from services.http_session import HTTP_POOL_MAXSIZE
+from commands import command_handler, default_handler, is_command, parse_command
+from exceptions import CommandNotFound, CharacterNotFound, CampaignNotFound, InvalidCommand, NotADM, ConcurrentUpdate
 
 logger = logging.getLogger()
 if logger.handlers:
@@ -27,6 +28,15 @@ ERROR_RESPONSE = {
     'body': json.dumps('Oops, something went wrong!')
 }
 
+# When enabled, the reply to a command travels in the body of the webhook response instead of
+# being sent with a second HTTPS request to the Bot API
+INLINE_REPLIES = os.environ.get('INLINE_REPLIES', 'true').lower() != 'false'
+
+# Number of update ids remembered to detect the updates Telegram delivers again. Set SHARED_DEDUP
+# to also record them in the database, so retries that reach another container are detected too.
+DEDUP_WINDOW = int(os.environ.get('DEDUP_WINDOW', '1000'))
+SHARED_DEDUP = os.environ.get('SHARED_DEDUP', 'false').lower() == 'true'
+
 def configure_telegram():
     """
     Configures the bot with a Telegram Token.
@@ -38,14 +48,83 @@ def configure_telegram():
         logger.error('The TELEGRAM_TOKEN must be set')
         raise NotImplementedError
 
-    return telegram.Bot(TELEGRAM_TOKEN)
+    # python-telegram-bot keeps its own urllib3 pool, so it can't use the shared requests session.
+    # The bot lives as long as the container, so its pool is sized like the shared one and its
+    # connections to api.telegram.org are kept alive between invocations.
+    return telegram.Bot(TELEGRAM_TOKEN, request=Request(con_pool_size=HTTP_POOL_MAXSIZE))
+
+# The bot and the database client live as long as the container does, so warm invocations
+# reuse them instead of paying the setup cost (and the Firebase round trips) on every update.
+_bot = None
+_db = None
+_deduplicator = None
+
+def get_bot():
+    """
+    Returns the process-wide bot instance, creating it on first use.
+    """
+
+    global _bot
+    if _bot is None:
+        _bot = configure_telegram()
+    return _bot
+
+def get_database():
+    """
+    Returns the process-wide database instance, creating it on first use.
+    """
+
+    global _db
+    if _db is None:
+        # Imported here: the storage pulls in the models, the races and firebase, which commands like
+        # /roll never use
+        from storage import get_storage
+        _db = get_storage()
+    return _db
+
+class CommandDatabase:
+    """
+    The database handed to the handler of a command. The process-wide database is only created, and
+    the unit of work of the update started (see Storage.unit_of_work), the first time the handler
+    uses it, so a /roll on a cold start doesn't import firebase nor fetch anything.
+    """
+
+    def __init__(self):
+        self._db = None
+        self._scope = None
+
+    def __getattr__(self, name):
+        if self._db is None:
+            self._db = get_database()
+            self._scope = self._db.unit_of_work()
+            self._scope.__enter__()
+        return getattr(self._db, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._scope is None:
+            return False
+        return self._scope.__exit__(*exc_info)
+
+def get_deduplicator():
+    """
+    Returns the process-wide deduplicator of updates, creating it on first use.
+    """
+
+    global _deduplicator
+    if _deduplicator is None:
+        store = get_database() if SHARED_DEDUP else None
+        _deduplicator = UpdateDeduplicator(DEDUP_WINDOW, store)
+    return _deduplicator
 
 def webhook(event, context):
     """
     Runs the Telegram webhook.
     """
 
-    bot = configure_telegram()
+    bot = get_bot()
     logger.info(json.loads(event.get('body')))
 
     if event.get('httpMethod') == 'POST' and event.get('body'):
@@ -54,27 +133,46 @@ def webhook(event, context):
         if not is_command(update):
             return OK_RESPONSE
 
-        db = Database()
+        if get_deduplicator().is_duplicate(update.update_id):
+            logger.info(f'Dropping update {update.update_id}, it was already processed')
+            return OK_RESPONSE
+
+        if INLINE_REPLIES:
+            bot = InlineReplyBot(bot)
+
         chat_id = update.message.chat.id
         username = update.message.from_user.username if update.message.from_user.username else update.message.from_user.first_name
         command = parse_command(update.message.text)
         txt_args = ' '.join(update.message.text.split(' ')[1:])
 
         try:
-            command_handler(command)(bot, update, command, txt_args, username, chat_id, db)
-        except (CommandNotFound, InvalidCommand):
-            default_handler(bot, update, 'Invalid command or command not supported')
-        except CharacterNotFound:
-            default_handler(bot, update, 'Character not found. Cannot execute command')
-        except CampaignNotFound:
-            default_handler(bot, update, 'Campaign not found. There must be an active campaign')
-        except json.JSONDecodeError:
-            default_handler(bot, update, 'Error parsing JSON')
-        except NotADM:
-            default_handler(bot, update, f'Only the Dungeon Master can execute {command} command')
-        #except Exception:
-        #    logger.error(sys.exc_info()[2])
-        #    default_handler(bot, update, 'Unhandled error. Check server logs for more details')
+            with CommandDatabase() as db:
+                try:
+                    response = command_handler(command)(bot, update, command, txt_args, username, chat_id, db)
+                    if isinstance(response, str):
+                        bot.send_message(chat_id=chat_id, text=response, parse_mode="Markdown")
+                except (CommandNotFound, InvalidCommand):
+                    default_handler(bot, update, 'Invalid command or command not supported')
+                except CharacterNotFound:
+                    default_handler(bot, update, 'Character not found. Cannot execute command')
+                except CampaignNotFound:
+                    default_handler(bot, update, 'Campaign not found. There must be an active campaign')
+                except json.JSONDecodeError:
+                    default_handler(bot, update, 'Error parsing JSON')
+                except NotADM:
+                    default_handler(bot, update, f'Only the Dungeon Master can execute {command} command')
+                except ConcurrentUpdate:
+                    default_handler(bot, update, 'Too many simultaneous changes, try again')
+                #except Exception:
+                #    logger.error(sys.exc_info()[2])
+                #    default_handler(bot, update, 'Unhandled error. Check server logs for more details')
+        except Exception:
+            # The command or the writes of its update failed: Telegram retries it, let it through
+            get_deduplicator().release(update.update_id)
+            raise
+
+        if INLINE_REPLIES:
+            return bot.response(OK_RESPONSE)
 
     return OK_RESPONSE
 
@@ -85,7 +183,7 @@ def set_webhook(event, context):
     """
 
     logger.info('Event: {}'.format(event))
-    bot = configure_telegram()
+    bot = get_bot()
     url = 'https://{}/{}/'.format(
         event.get('headers').get('Host'),
         event.get('requestContext').get('stage'),
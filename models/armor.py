@@ -1,7 +1,20 @@
 class Armor:
+    __slots__ = ('type', 'name', 'armor_class', 'equipped')
+
     def __init__(self, json_data):
         definition = json_data['definition']
         self.type = definition['type']
         self.name = definition['name']
         self.armor_class = int(definition['armorClass'])
         self.equipped = True if json_data['equipped'] == "true" else False
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        armor = cls.__new__(cls)
+        for attribute in cls.__slots__:
+            if attribute in snapshot:
+                setattr(armor, attribute, snapshot[attribute])
+        return armor
+
+    def to_snapshot(self):
+        return {attribute: getattr(self, attribute) for attribute in self.__slots__}
@@ -5,6 +5,7 @@ import utils
 from models.armor import Armor
 from models.weapon import Weapon
 from models.spell import Spell
+from models.name_index import NameIndex
 
 LEVEL_CHART = [
     300,
@@ -67,6 +68,25 @@ SKILLS = {
     ]
 }
 
+# Version of the snapshots of the derived attributes (see to_snapshot). Bump it whenever the way
+# Character, Weapon, Spell or Armor derive their attributes changes, so the stored snapshots are
+# built again.
+CHARACTER_SCHEMA_VERSION = 1
+
+# Attributes the bot changes after a character is imported. They are read from the character data
+# instead of the snapshot.
+STATE_ATTRIBUTES = ['removed_hit_points', 'current_hit_points', 'current_experience', 'currencies']
+
+# Attributes of a Character, besides its weapons, armor and spells
+ATTRIBUTES = (
+    'id', 'beyond_url', 'name', 'level', 'race', '_class',
+    'str', 'dex', 'con', 'int', 'wis', 'cha',
+    'str_mod', 'dex_mod', 'con_mod', 'int_mod', 'wis_mod', 'cha_mod',
+    'walking_speed', 'max_hit_points', 'removed_hit_points', 'current_hit_points',
+    'hit_dice', 'hit_dice_used', 'current_experience', 'experience_needed', 'initiative',
+    'proficiencies', 'size', 'proficiency', 'mods', 'currencies', 'spellcasting_ability_mod'
+)
+
 ABILITIES_INDEX = {
     0: 'str',
     1: 'dex',
@@ -77,6 +97,15 @@ ABILITIES_INDEX = {
 }
 
 class Character:
+    # Characters have no per-instance __dict__, which makes each one several KB smaller. Storage only
+    # keeps them for the update that loaded them (see Storage.unit_of_work), so the saving is in the
+    # peak memory of a command. Subclasses declare the attributes they add in their own __slots__.
+    # Weapons, armor and spells are built the first time they are used, from _item_data (the parts
+    # of the JSON data they come from) or _item_snapshots (their snapshots).
+    # get_weapon and get_spell look them up in _weapon_index and _spell_index, also built when used.
+    __slots__ = ATTRIBUTES + ('_weapons', '_armor', '_spells', '_item_data', '_item_snapshots',
+                              '_weapon_index', '_spell_index')
+
     def __init__(self, json_data, race_data, by_id):
         character = json_data if by_id else json_data['character']
 
@@ -107,12 +136,16 @@ class Character:
         self.current_experience = int(character['currentXp'])
         self.experience_needed = int(LEVEL_CHART[self.level - 1])
         self.initiative = self.dex_mod
-        self.weapons = self.__extract_weapons(character)
-        self.armor = [Armor(x) for x in character['inventory'] if x['definition']['filterType'] == "Armor"]
         self.proficiencies = self.__extract_proficiencies(character)
         self.size = character['race']['size']
         self.proficiency = math.floor((self.level + 7) / 4)
-        self.spells = []
+        self._weapons = None
+        self._armor = None
+        self._spells = None
+        self._item_data = {'inventory': character['inventory']}
+        self._item_snapshots = None
+        self._weapon_index = None
+        self._spell_index = None
 
         self.mods = self.__calculate_modifiers()
         #self.currency = self.__calculate_currency(character['currencies'])
@@ -122,36 +155,134 @@ class Character:
         if character['classes'][0]['definition']['canCastSpells'] is True:
             spellcasting_ability_id = int(character['classes'][0]['definition']['spellCastingAbilityId']) - 1
             self.spellcasting_ability_mod = self.mods[ABILITIES_INDEX[spellcasting_ability_id]] + self.proficiency
-            # Load spells from feat
-            if 'spells' in character:
-                if 'feat' in character['spells']:
-                    for x in character['spells']['feat']:
-                        if "Damage" in x['definition']['tags']:
-                            self.spells.append(Spell(x))
-
-            # Load spells from class spells
-            for x in character['classSpells']:
-                if 'spells' in x:
-                    for y in x['spells']:
-                        if "Damage" in y['definition']['tags']:
-                            self.spells.append(Spell(y))
+            self._item_data['spells'] = character.get('spells', {})
+            self._item_data['classSpells'] = character['classSpells']
+
+    @classmethod
+    def from_snapshot(cls, snapshot, json_data):
+        """
+        Build a character from a snapshot taken with to_snapshot(), without deriving anything, and
+        the current hit points, experience and currencies of its JSON data.
+        """
+        character = cls.__new__(cls)
+        for attribute in ATTRIBUTES:
+            if attribute in snapshot:
+                setattr(character, attribute, snapshot[attribute])
+        character._weapons = None
+        character._armor = None
+        character._spells = None
+        character._item_data = None
+        character._item_snapshots = {k: snapshot.get(k, []) for k in ['weapons', 'armor', 'spells']}
+        character._weapon_index = None
+        character._spell_index = None
+        character.proficiencies = set(snapshot.get('proficiencies', []))
+
+        state = json_data['character']
+        character.removed_hit_points = int(state['removedHitPoints'])
+        character.current_hit_points = character.max_hit_points - character.removed_hit_points
+        character.current_experience = int(state['currentXp'])
+        character.currencies = state['currencies']
+        return character
+
+    def _set_stats(self, data):
+        """
+        Sets the name, abilities, mods and hit points from the flat data NPCs and monsters are stored
+        with ({'name': ..., 'str': 10, 'max_hit_points': 10...}) instead of D&D Beyond data. They have
+        no weapons, armor or spells.
+        """
+        self.id = data.get('id')
+        self.name = data['name']
+        self.level = int(data.get('level', 1))
+        for ability in ABILITIES_INDEX.values():
+            score = int(data.get(ability, 10))
+            setattr(self, ability, score)
+            setattr(self, f'{ability}_mod', math.floor((score - 10) / 2))
+        self.max_hit_points = int(data.get('max_hit_points', 10))
+        self.removed_hit_points = 0
+        self.current_hit_points = self.max_hit_points
+        self.initiative = self.dex_mod
+        self.proficiency = math.floor((self.level + 7) / 4)
+        self.proficiencies = set(data.get('proficiencies', []))
+        self._weapons = []
+        self._armor = []
+        self._spells = []
+        self._item_data = None
+        self._item_snapshots = None
+        self._weapon_index = None
+        self._spell_index = None
+        self.mods = self.__calculate_modifiers()
+
+    def to_snapshot(self):
+        """The derived attributes of the character, as a JSON serializable dict."""
+        snapshot = {k: getattr(self, k) for k in ATTRIBUTES if k not in STATE_ATTRIBUTES and hasattr(self, k)}
+        snapshot['proficiencies'] = sorted(self.proficiencies)
+        snapshot['weapons'] = [w.to_snapshot() for w in self.weapons]
+        snapshot['armor'] = [a.to_snapshot() for a in self.armor]
+        snapshot['spells'] = [s.to_snapshot() for s in self.spells]
+        snapshot['schema'] = CHARACTER_SCHEMA_VERSION
+        return snapshot
+
+    @property
+    def weapons(self):
+        if self._weapons is None:
+            if self._item_snapshots is not None:
+                self._weapons = [Weapon.from_snapshot(x) for x in self._item_snapshots['weapons']]
+            else:
+                self._weapons = self.__extract_weapons(self._item_data)
+            self.__release_item_data()
+        return self._weapons
+
+    @weapons.setter
+    def weapons(self, value):
+        self._weapons = value
+        self._weapon_index = None
+        self.__release_item_data()
+
+    @property
+    def armor(self):
+        if self._armor is None:
+            if self._item_snapshots is not None:
+                self._armor = [Armor.from_snapshot(x) for x in self._item_snapshots['armor']]
+            else:
+                self._armor = [Armor(x) for x in self._item_data['inventory'] if x['definition']['filterType'] == "Armor"]
+            self.__release_item_data()
+        return self._armor
+
+    @armor.setter
+    def armor(self, value):
+        self._armor = value
+        self.__release_item_data()
+
+    @property
+    def spells(self):
+        if self._spells is None:
+            if self._item_snapshots is not None:
+                self._spells = [Spell.from_snapshot(x) for x in self._item_snapshots['spells']]
+            else:
+                self._spells = self.__extract_spells(self._item_data)
+            self.__release_item_data()
+        return self._spells
+
+    @spells.setter
+    def spells(self, value):
+        self._spells = value
+        self._spell_index = None
+        self.__release_item_data()
 
     def has_proficiency(self, arg):
         return True if utils.to_snake_case(arg) in self.proficiencies else False
 
     def get_weapon(self, weapon_name):
-        result = [w for w in self.weapons if w.name == weapon_name]
-        if len(result) > 0:
-            return result[0]
-        else:
-            return None
+        """The weapon called weapon_name, or whose name starts with or is a typo of it (see NameIndex)."""
+        if self._weapon_index is None:
+            self._weapon_index = NameIndex(self.weapons)
+        return self._weapon_index.find(weapon_name)
 
     def get_spell(self, spell_name):
-        result = [s for s in self.spells if s.name == spell_name]
-        if len(result) > 0:
-            return result[0]
-        else:
-            return None
+        """The spell called spell_name, or whose name starts with or is a typo of it (see NameIndex)."""
+        if self._spell_index is None:
+            self._spell_index = NameIndex(self.spells)
+        return self._spell_index.find(spell_name)
 
     def heal(self, points):
         self.current_hit_points = min(self.max_hit_points, self.current_hit_points + points)
@@ -188,19 +319,46 @@ class Character:
         for ability in ABILITIES:
             for skill in SKILLS[ability]:
                 mods[skill] = mods[ability]
-                if self.has_proficiency(skill):
+                if skill in self.proficiencies:
                     mods[skill] += self.proficiency
 
         return mods
 
     def __extract_proficiencies(self, character):
-        proficiencies = [x['subType'] for x in character['modifiers']['class'] if x['type'] == 'proficiency']
-        proficiencies += [x['subType'] for x in character['modifiers']['background'] if x['type'] == 'proficiency']
+        proficiencies = {x['subType'] for x in character['modifiers']['class'] if x['type'] == 'proficiency'}
+        proficiencies.update(x['subType'] for x in character['modifiers']['background'] if x['type'] == 'proficiency')
         return proficiencies
 
     def __extract_weapons(self, character):
         return [Weapon(x) for x in character['inventory'] if x['definition']['filterType'] == "Weapon"]
 
+    def __extract_spells(self, character):
+        spells = []
+        # Only spellcasters have spells (see __init__)
+        if 'classSpells' not in character:
+            return spells
+
+        # Load spells from feat
+        if 'feat' in character['spells']:
+            for x in character['spells']['feat']:
+                if "Damage" in x['definition']['tags']:
+                    spells.append(Spell(x))
+
+        # Load spells from class spells
+        for x in character['classSpells']:
+            if 'spells' in x:
+                for y in x['spells']:
+                    if "Damage" in y['definition']['tags']:
+                        spells.append(Spell(y))
+
+        return spells
+
+    def __release_item_data(self):
+        # The JSON data isn't needed once everything has been built from it
+        if self._weapons is not None and self._armor is not None and self._spells is not None:
+            self._item_data = None
+            self._item_snapshots = None
+
     def __str__(self):
         return (f"Character name={self.name}, race={self.race}, str={self.str}({self.str_mod}), dex={self.dex}({self.dex_mod}), "
                 f"con={self.con}({self.con_mod}), int={self.int}({self.int_mod}), wis={self.wis}({self.wis_mod}), "
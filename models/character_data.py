@@ -0,0 +1,115 @@
+"""
+Compact projection of a D&D Beyond character sheet: the part of the JSON that models.character
+reads, with the same shape, so a Character is built from it exactly as from the whole sheet.
+The sheets weigh hundreds of KB and the projection a few KB.
+
+Bump CHARACTER_DATA_VERSION when CHARACTER_DATA_FIELDS changes: stored projections of an older
+version are built again from the raw sheet the next time they are loaded.
+"""
+
+CHARACTER_DATA_VERSION = 1
+
+# Fields kept of each item of the sheet: True keeps the whole value, a dict the listed keys and a
+# list with one element applies it to every element of the list
+_DICE = {'diceString': True}
+
+_SPELL = {
+    'definition': {
+        'name': True,
+        'school': True,
+        'requiresAttackRoll': True,
+        'tags': True,
+        'modifiers': [{
+            'type': True,
+            'subType': True,
+            'die': _DICE,
+            'atHigherLevels': {'higherLevelDefinitions': [{'level': True, 'dice': _DICE}]}
+        }]
+    }
+}
+
+_ITEM = {
+    'equipped': True,
+    'definition': {
+        'name': True,
+        'filterType': True,
+        'type': True,
+        'armorClass': True,
+        'damage': _DICE,
+        'damageType': True,
+        'range': True,
+        'longRange': True,
+        'properties': [{'name': True}]
+    }
+}
+
+_MODIFIER = {'type': True, 'subType': True}
+
+CHARACTER_DATA_FIELDS = {
+    'id': True,
+    'readonlyUrl': True,
+    'name': True,
+    'race': {'baseName': True, 'size': True, 'weightSpeeds': {'normal': {'walk': True}}},
+    'classes': [{
+        'level': True,
+        'hitDiceUsed': True,
+        'definition': {'name': True, 'hitDice': True, 'canCastSpells': True, 'spellCastingAbilityId': True}
+    }],
+    'stats': [{'id': True, 'value': True}],
+    'baseHitPoints': True,
+    'removedHitPoints': True,
+    'currentXp': True,
+    'currencies': True,
+    'inventory': [_ITEM],
+    'modifiers': {'class': [_MODIFIER], 'background': [_MODIFIER]},
+    'spells': {'feat': [_SPELL]},
+    'classSpells': [{'spells': [_SPELL]}]
+}
+
+# Fields the bot changes after the import (see the set_char_* methods of the storage backends),
+# which are kept when a projection is built again from the sheet
+CHARACTER_STATE_FIELDS = ['removedHitPoints', 'currentXp', 'currencies']
+
+def _project(data, fields):
+    if fields is True or data is None:
+        return data
+    if isinstance(fields, list):
+        return [_project(x, fields[0]) for x in data] if isinstance(data, list) else data
+    if isinstance(data, dict):
+        return {key: _project(data[key], value) for key, value in fields.items() if key in data}
+    return data
+
+def _is_damage_spell(spell):
+    return 'Damage' in spell.get('definition', {}).get('tags', [])
+
+def compact_character_data(sheet, state=None):
+    """
+    Returns the versioned projection {'version': ..., 'character': {...}} of the D&D Beyond JSON
+    sheet. state is a previous projection whose CHARACTER_STATE_FIELDS and level are kept.
+    """
+    character = _project(sheet['character'], CHARACTER_DATA_FIELDS)
+
+    # Character only uses the weapons, the armor, the proficiencies and the damage spells
+    if 'inventory' in character:
+        character['inventory'] = [x for x in character['inventory']
+                                  if x.get('definition', {}).get('filterType') in ('Weapon', 'Armor')]
+    for source in character.get('modifiers', {}):
+        character['modifiers'][source] = [x for x in character['modifiers'][source] if x.get('type') == 'proficiency']
+    if 'feat' in character.get('spells', {}):
+        character['spells']['feat'] = [x for x in character['spells']['feat'] if _is_damage_spell(x)]
+    for class_spells in character.get('classSpells', []):
+        if 'spells' in class_spells:
+            class_spells['spells'] = [x for x in class_spells['spells'] if _is_damage_spell(x)]
+
+    if state is not None:
+        for field in CHARACTER_STATE_FIELDS:
+            if field in state['character']:
+                character[field] = state['character'][field]
+        if len(state['character'].get('classes', [])) > 0 and len(character.get('classes', [])) > 0:
+            character['classes'][0]['level'] = state['character']['classes'][0]['level']
+
+    return {'version': CHARACTER_DATA_VERSION, 'character': character}
+
+def is_compact(character_data):
+    """Whether character_data is a projection of the current version (and not a raw sheet or an older one)."""
+    return character_data.get('version') == CHARACTER_DATA_VERSION
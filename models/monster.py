@@ -7,16 +7,22 @@ from models.spell import Spell
 
 class Monster(Character):
     """Class representing a monster in the game."""
-    
+
+    __slots__ = (
+        'challenge_rating', 'type', 'alignment', 'languages', 'senses', 'special_abilities',
+        'legendary_actions', 'legendary_resistance', 'damage_resistances', 'damage_immunities',
+        'condition_immunities', 'armor_class'
+    )
+
     def __init__(self, json_data):
         """
         Initialize a monster from JSON data.
         
         Args:
-            json_data (dict): JSON data containing monster information
+            json_data (dict): JSON data containing monster information, as stored by to_json()
         """
         # Initialize base character attributes
-        super().__init__(json_data, {}, True)
+        self._set_stats(json_data)
         
         # Monster-specific attributes
         self.challenge_rating = json_data.get('challenge_rating', 0)
@@ -34,7 +40,35 @@ class Monster(Character):
         
         # Monster-specific modifiers
         self.armor_class = json_data.get('armor_class', 10 + self.dex_mod)
-        
+        self.walking_speed = json_data.get('speed', 30)
+
+    def to_json(self):
+        """Convert monster to JSON format."""
+        return {
+            'name': self.name,
+            'type': self.type,
+            'challenge_rating': self.challenge_rating,
+            'size': self.size,
+            'alignment': self.alignment,
+            'str': self.str,
+            'dex': self.dex,
+            'con': self.con,
+            'int': self.int,
+            'wis': self.wis,
+            'cha': self.cha,
+            'armor_class': self.armor_class,
+            'max_hit_points': self.max_hit_points,
+            'speed': self.walking_speed,
+            'languages': self.languages,
+            'senses': self.senses,
+            'damage_resistances': self.damage_resistances,
+            'damage_immunities': self.damage_immunities,
+            'condition_immunities': self.condition_immunities,
+            'special_abilities': self.special_abilities,
+            'legendary_actions': self.legendary_actions,
+            'legendary_resistance': self.legendary_resistance
+        }
+
     def get_description(self):
         """Get a formatted description of the monster."""
         return f"""{self.name}
@@ -0,0 +1,41 @@
+import bisect
+import difflib
+
+import utils
+
+# How similar (0 to 1, see difflib) a name has to be to be taken as a typo of another one
+FUZZY_CUTOFF = 0.75
+
+class NameIndex:
+    """
+    Items (weapons, spells...) by their snake_case name. A name is looked up exactly, then as the
+    prefix of a single name, and at last as a typo of a single name.
+    """
+
+    __slots__ = ('items', 'names')
+
+    def __init__(self, items):
+        self.items = {}
+        for item in items:
+            # The first one wins when there are several items with the same name
+            self.items.setdefault(item.name, item)
+        self.names = sorted(self.items)
+
+    def find(self, name):
+        """The item called name, or None when no item or more than one match it."""
+        name = utils.to_snake_case(name)
+        if name in self.items:
+            return self.items[name]
+
+        matches = self.__with_prefix(name)
+        if len(matches) == 0:
+            matches = difflib.get_close_matches(name, self.names, n=2, cutoff=FUZZY_CUTOFF)
+        return self.items[matches[0]] if len(matches) == 1 else None
+
+    def __with_prefix(self, prefix):
+        matches = []
+        i = bisect.bisect_left(self.names, prefix)
+        while i < len(self.names) and self.names[i].startswith(prefix) and len(matches) < 2:
+            matches.append(self.names[i])
+            i += 1
+        return matches
@@ -7,16 +7,23 @@ from models.spell import Spell
 
 class NPC(Character):
     """Class representing a Non-Player Character."""
-    
+
+    __slots__ = (
+        'alignment', 'personality_traits', 'ideal', 'bond', 'flaw', 'background', 'occupation',
+        'charisma_mod', 'intelligence_mod'
+    )
+
     def __init__(self, json_data):
         """
         Initialize an NPC from JSON data.
         
         Args:
-            json_data (dict): JSON data containing NPC information
+            json_data (dict): JSON data containing NPC information, as stored by to_json()
         """
         # Initialize base character attributes
-        super().__init__(json_data, {}, True)
+        self._set_stats(json_data)
+        self.race = json_data.get('race', '')
+        self._class = json_data.get('class', '')
         
         # NPC-specific attributes
         self.alignment = json_data.get('alignment', 'Neutral')
@@ -30,7 +37,30 @@ class NPC(Character):
         # NPC-specific modifiers
         self.charisma_mod = math.floor((self.cha - 10) / 2)
         self.intelligence_mod = math.floor((self.int - 10) / 2)
-        
+
+    def to_json(self):
+        """Convert NPC to JSON format."""
+        return {
+            'name': self.name,
+            'race': self.race,
+            'class': self._class,
+            'level': self.level,
+            'str': self.str,
+            'dex': self.dex,
+            'con': self.con,
+            'int': self.int,
+            'wis': self.wis,
+            'cha': self.cha,
+            'max_hit_points': self.max_hit_points,
+            'alignment': self.alignment,
+            'background': self.background,
+            'occupation': self.occupation,
+            'personality_traits': self.personality_traits,
+            'ideal': self.ideal,
+            'bond': self.bond,
+            'flaw': self.flaw
+        }
+
     def get_description(self):
         """Get a formatted description of the NPC."""
         return f"""{self.name}
@@ -1,6 +1,8 @@
 import utils
 
 class Spell:
+    __slots__ = ('name', 'school', 'requires_attack_roll', 'type', 'sub_type', 'damages')
+
     def __init__(self, json_data):
         definition = json_data['definition']
         modifier = [x for x in definition['modifiers'] if x['type'] == 'damage'][0]
@@ -19,6 +21,25 @@ class Spell:
 
         #self.range = int(definition['range'])
 
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        spell = cls.__new__(cls)
+        for attribute in cls.__slots__:
+            if attribute in snapshot:
+                setattr(spell, attribute, snapshot[attribute])
+        # JSON keys are strings, and Firebase returns objects with small numeric keys as arrays
+        damages = snapshot['damages']
+        if isinstance(damages, list):
+            spell.damages = {level: dice for level, dice in enumerate(damages) if dice is not None}
+        else:
+            spell.damages = {int(level): dice for level, dice in sorted(damages.items(), key=lambda x: int(x[0]))}
+        return spell
+
+    def to_snapshot(self):
+        snapshot = {attribute: getattr(self, attribute) for attribute in self.__slots__}
+        snapshot['damages'] = {str(level): dice for level, dice in self.damages.items()}
+        return snapshot
+
     def get_damage(self, character_level):
         for level in self.damages:
             if character_level <= level:
@@ -1,6 +1,8 @@
 import utils
 
 class Weapon:
+    __slots__ = ('name', 'type', 'damage', 'damage_type', 'equipped', 'range', 'long_range', 'properties')
+
     def __init__(self, json_data):
         definition = json_data['definition']
         self.name = utils.to_snake_case(definition['name']).split(',')[0].strip()
@@ -14,6 +16,18 @@ class Weapon:
         if 'properties' in definition:
             self.properties += [p['name'] for p in definition['properties']]
 
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        weapon = cls.__new__(cls)
+        for attribute in cls.__slots__:
+            if attribute in snapshot:
+                setattr(weapon, attribute, snapshot[attribute])
+        weapon.properties = snapshot.get('properties', [])
+        return weapon
+
+    def to_snapshot(self):
+        return {attribute: getattr(self, attribute) for attribute in self.__slots__}
+
     def has_thrown(self):
         return True if "Thrown" in self.properties else False
 
@@ -0,0 +1,238 @@
+"""
+Exact distribution of the totals of a dice expression (see dice), worked out by convolution instead
+of rolling it. Distributions are kept as the number of ways to get each total out of all the
+possible rolls, so everything is integer arithmetic and exact.
+"""
+import math
+import functools
+
+import dice
+from exceptions import InvalidDiceExpression
+
+# Steps the distribution of a whole expression can take to work out (pairs of totals combined), so
+# an expression can't keep the bot busy. They're counted (see _cost) before working anything out.
+MAX_WORK = 2000000
+
+TOO_BIG = 'your request is too big to work out its odds!'
+
+class Distribution:
+    """ways[total] of the outcomes out of outcomes give total."""
+
+    __slots__ = ('ways', 'outcomes')
+
+    def __init__(self, ways, outcomes):
+        self.ways = ways
+        self.outcomes = outcomes
+
+    def minimum(self):
+        return min(self.ways)
+
+    def maximum(self):
+        return max(self.ways)
+
+    def mean(self):
+        return sum(total * ways for total, ways in self.ways.items()) / self.outcomes
+
+    def percentile(self, p):
+        """The lowest total that p% of the rolls reach or stay under."""
+        target = self.outcomes * p / 100
+        accumulated = 0
+        for total in sorted(self.ways):
+            accumulated += self.ways[total]
+            if accumulated >= target:
+                return total
+        return self.maximum()
+
+    def chance_at_least(self, dc):
+        """Chance (from 0 to 1) of rolling dc or more."""
+        return sum(ways for total, ways in self.ways.items() if total >= dc) / self.outcomes
+
+def distribution(expression):
+    """
+    The Distribution of an expression. Raises InvalidDiceExpression when it has names (bind them
+    first) or exploding dice, or is too big to work out.
+    """
+    if _cost(expression)[3] > MAX_WORK:
+        raise InvalidDiceExpression(TOO_BIG)
+    return _distribution(expression)
+
+def _distribution(expression):
+    if isinstance(expression, dice.Constant):
+        return Distribution({expression.value: 1}, 1)
+    if isinstance(expression, dice.Dice):
+        return _dice(expression.count, expression.sides, expression.keep, expression.explode, expression.reroll)
+    if isinstance(expression, dice.Negate):
+        operand = _distribution(expression.operand)
+        return Distribution({-total: ways for total, ways in operand.ways.items()}, operand.outcomes)
+    if isinstance(expression, dice.BinaryOp):
+        return _combine(expression.operator, _distribution(expression.left), _distribution(expression.right))
+    if isinstance(expression, dice.Group):
+        return _group(expression)
+    # Names can't be rolled, so the expression says which one is missing
+    expression.roll()
+
+def _cost(expression):
+    """
+    (lowest total, highest total, most totals, steps) of working out the distribution of expression:
+    the steps are at least as many as it really takes, counting every node, and nothing is worked out.
+    """
+    if isinstance(expression, dice.Constant):
+        return expression.value, expression.value, 1, 0
+    if isinstance(expression, dice.Dice):
+        count, sides = expression.count, expression.sides
+        if expression.keep is not None and expression.keep[0] < count:
+            n = expression.keep[0]
+            return n, n * sides, n * (sides - 1) + 1, _keep_work(count, sides, n)
+        return count, count * sides, count * (sides - 1) + 1, _pool_work(count, sides)
+    if isinstance(expression, dice.Negate):
+        low, high, totals, work = _cost(expression.operand)
+        return -high, -low, totals, work
+    if isinstance(expression, dice.BinaryOp):
+        return _combine_cost(expression.operator, _cost(expression.left), _cost(expression.right))
+    if isinstance(expression, dice.Group):
+        costs = [_cost(e) for e in expression.expressions]
+        if expression.keep is None or expression.keep[0] >= len(costs):
+            return functools.reduce(lambda left, right: _combine_cost('+', left, right), costs)
+        # Going through every total of every expression for each total
+        totals = sum(c[2] for c in costs)
+        return min(c[0] for c in costs), max(c[1] for c in costs), totals, sum(c[3] for c in costs) + totals * totals
+    return 0, 0, 1, 0
+
+def _combine_cost(operator, left, right):
+    left_low, left_high, left_totals, left_work = left
+    right_low, right_high, right_totals, right_work = right
+    if operator == '+':
+        low, high = left_low + right_low, left_high + right_high
+    elif operator == '-':
+        low, high = left_low - right_high, left_high - right_low
+    elif operator == '*':
+        corners = [l * r for l in (left_low, left_high) for r in (right_low, right_high)]
+        low, high = min(corners), max(corners)
+    else:
+        # Dividing by any whole number other than 0 doesn't make a total bigger
+        high = max(abs(left_low), abs(left_high))
+        low = -high
+    totals = min(left_totals * right_totals, high - low + 1)
+    return low, high, totals, left_work + right_work + left_totals * right_totals
+
+@functools.lru_cache(maxsize=dice.DICE_CACHE_SIZE)
+def _pool_work(count, sides):
+    """Steps _pool(count, sides, reroll) takes."""
+    if count == 1:
+        return sides
+    half = count // 2
+    pairs = (half * (sides - 1) + 1) * ((count - half) * (sides - 1) + 1)
+    return _pool_work(half, sides) + _pool_work(count - half, sides) + pairs
+
+def _keep_work(count, sides, n):
+    """Steps _keep() takes for the n highest or lowest of count dice of sides sides."""
+    return sides * count * count * (n * sides + 1)
+
+def _combine(operator, left, right):
+    if operator == '/' and 0 in right.ways:
+        raise InvalidDiceExpression('your request can divide by zero!')
+
+    ways = {}
+    for l, l_ways in left.ways.items():
+        for r, r_ways in right.ways.items():
+            if operator == '+':
+                total = l + r
+            elif operator == '-':
+                total = l - r
+            elif operator == '*':
+                total = l * r
+            else:
+                total = l // r
+            ways[total] = ways.get(total, 0) + l_ways * r_ways
+    return Distribution(ways, left.outcomes * right.outcomes)
+
+@functools.lru_cache(maxsize=dice.DICE_CACHE_SIZE)
+def _die(sides, reroll):
+    """Distribution of one die, with its rerolls."""
+    if reroll is None:
+        return Distribution({value: 1 for value in range(1, sides + 1)}, sides)
+
+    comparison, target, once = reroll
+    rerolled = [value for value in range(1, sides + 1) if dice.matches(value, comparison, target)]
+    kept = [value for value in range(1, sides + 1) if value not in rerolled]
+    if not once:
+        # Rerolling until it doesn't match is rolling a die of the other values
+        return Distribution({value: 1 for value in kept}, len(kept))
+    # A matching first roll (len(rerolled) of sides) is replaced by a second roll of any value
+    ways = {value: sides + len(rerolled) if value in kept else len(rerolled) for value in range(1, sides + 1)}
+    return Distribution(ways, sides * sides)
+
+@functools.lru_cache(maxsize=dice.DICE_CACHE_SIZE)
+def _dice(count, sides, keep, explode, reroll):
+    if explode is not None:
+        raise InvalidDiceExpression("your request has exploding dice, whose odds can't be worked out exactly!")
+    if keep is not None and keep[0] < count:
+        return _keep(count, _die(sides, reroll), keep)
+    return _pool(count, sides, reroll)
+
+@functools.lru_cache(maxsize=dice.DICE_CACHE_SIZE)
+def _pool(count, sides, reroll):
+    """Distribution of the total of count dice, convolving the halves of the pool."""
+    if count == 1:
+        return _die(sides, reroll)
+    half = count // 2
+    return _combine('+', _pool(half, sides, reroll), _pool(count - half, sides, reroll))
+
+def _keep(count, die, keep):
+    """
+    Distribution of the total of the n highest (or lowest) of count dice, for keep (n, highest).
+
+    The values of the die are gone through from the highest (or lowest) one, choosing how many dice
+    roll each of them: the first n dice placed are the ones kept.
+    """
+    n, highest = keep
+    values = sorted(die.ways, reverse=highest)
+
+    # (dice placed, total kept) -> ways
+    states = {(0, 0): 1}
+    for value in values:
+        next_states = {}
+        for (placed, kept_total), ways in states.items():
+            for j in range(0, count - placed + 1):
+                kept = max(0, min(j, n - placed))
+                key = (placed + j, kept_total + kept * value)
+                next_ways = ways * _binomial(count - placed, j) * die.ways[value] ** j
+                next_states[key] = next_states.get(key, 0) + next_ways
+        states = next_states
+
+    ways = {}
+    for (placed, kept_total), state_ways in states.items():
+        if placed == count:
+            ways[kept_total] = ways.get(kept_total, 0) + state_ways
+    return Distribution(ways, die.outcomes ** count)
+
+def _group(group):
+    distributions = [_distribution(e) for e in group.expressions]
+    n = group.keep[0] if group.keep is not None else len(distributions)
+    if n == len(distributions):
+        result = distributions[0]
+        for d in distributions[1:]:
+            result = _combine('+', result, d)
+        return result
+    if n != 1:
+        raise InvalidDiceExpression("your request keeps several totals of a group, whose odds can't be worked out!")
+
+    # The highest (or lowest) total is t when every total is t or less (or more), but not all below t
+    highest = group.keep[1]
+    totals = sorted(set(total for d in distributions for total in d.ways), reverse=not highest)
+    outcomes = 1
+    for d in distributions:
+        outcomes *= d.outcomes
+    ways = {}
+    previous = 0
+    for total in totals:
+        within = 1
+        for d in distributions:
+            within *= sum(w for t, w in d.ways.items() if (t <= total if highest else t >= total))
+        if within != previous:
+            ways[total] = within - previous
+        previous = within
+    return Distribution(ways, outcomes)
+
+def _binomial(n, k):
+    return math.factorial(n) // (math.factorial(k) * math.factorial(n - k))
@@ -0,0 +1,33 @@
+import json
+
+class InlineReplyBot:
+    """
+    Wraps a telegram.Bot so the first send_message of an update is answered in the body of the
+    webhook response instead of with a separate call to the Bot API. Telegram accepts one method
+    call per webhook reply, so any message after the first one is sent through the real bot.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.reply = None
+
+    def send_message(self, chat_id, text, **kargs):
+        if self.reply is not None:
+            return self.bot.send_message(chat_id=chat_id, text=text, **kargs)
+
+        self.reply = {'method': 'sendMessage', 'chat_id': chat_id, 'text': text}
+        self.reply.update({k: v for k, v in kargs.items() if v is not None})
+
+    def response(self, default):
+        """Returns the webhook response carrying the captured message, or default if none was sent."""
+        if self.reply is None:
+            return default
+
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps(self.reply)
+        }
+
+    def __getattr__(self, name):
+        return getattr(self.bot, name)
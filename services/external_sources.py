@@ -1,6 +1,7 @@
 import requests
 from typing import Dict, List, Optional
 from models.adventure import Adventure
+from services import http_session
 import os
 import hashlib
 import json
@@ -69,7 +70,7 @@ class ExternalSources:
             return Adventure(cached_data)
             
         try:
-            response = requests.get(url)
+            response = http_session.get(url)
             response.raise_for_status()
             data = response.json()
             
@@ -122,7 +123,7 @@ class ExternalSources:
         """
         url = f"{self.DND5E_API_URL}/api/adventures"
         try:
-            response = requests.get(url)
+            response = http_session.get(url)
             response.raise_for_status()
             adventures = response.json()
             
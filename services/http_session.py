@@ -0,0 +1,109 @@
+import os
+import time
+import socket
+import threading
+
+from exceptions import DownloadError
+
+# Hosts whose connection pools are kept (Firebase, Telegram, D&D Beyond, dnd5eapi, gists...) and
+# connections kept alive per host
+HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', '10'))
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', '4'))
+HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', '10'))
+# Size of the chunks read_body() reads, and so how often it checks its limits
+HTTP_CHUNK_SIZE = 16 * 1024
+
+_session = None
+
+def get_session():
+    """
+    Returns the HTTP session shared by the whole process, creating it on first use.
+
+    Its connections are kept alive between requests, so warm invocations reuse the TCP and TLS
+    connections opened by the previous ones instead of doing a new handshake on every request.
+    """
+    global _session
+    if _session is None:
+        # Imported here so reading the settings above (main.py sizes the pool of the bot with them)
+        # doesn't pull requests into every cold start
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+        _session.mount('https://', adapter)
+        _session.mount('http://', adapter)
+    return _session
+
+def get(url, **kargs):
+    """requests.get() through the shared session."""
+    kargs.setdefault('timeout', HTTP_TIMEOUT)
+    return get_session().get(url, **kargs)
+
+def read_body(response, max_bytes, deadline, progress=None, starts_with=None):
+    """
+    Reads the body of a streamed response (get(url, stream=True)) and returns it as a bytearray.
+
+    Raises DownloadError as soon as the body is bigger than max_bytes or has taken longer than
+    deadline seconds. A timer shuts the connection down when the deadline passes, so a server sending
+    the body a few bytes at a time can't keep the read going. progress(received, total) is called
+    after every chunk, total being None when the server didn't send a Content-Length. With
+    starts_with (b'{' for a JSON object, for instance) it fails on the first chunk when the body
+    doesn't start with it, besides whitespace.
+    """
+    started = time.monotonic()
+    length = response.headers.get('Content-Length', '')
+    total = int(length) if length.isdigit() else None
+    if total is not None and total > max_bytes:
+        response.close()
+        raise DownloadError(f'the response is too big ({total} bytes, the limit is {max_bytes})')
+
+    expired = threading.Event()
+    timer = threading.Timer(deadline, _abort, (response, expired))
+    timer.daemon = True
+    timer.start()
+
+    body = bytearray()
+    try:
+        for chunk in response.iter_content(HTTP_CHUNK_SIZE):
+            body += chunk
+            if starts_with is not None and len(body.lstrip()) >= len(starts_with):
+                if not body.lstrip().startswith(starts_with):
+                    raise DownloadError(f'the response doesn\'t start with {starts_with.decode()}')
+                starts_with = None
+            if len(body) > max_bytes:
+                raise DownloadError(f'the response is too big (more than {max_bytes} bytes)')
+            if expired.is_set() or time.monotonic() - started > deadline:
+                raise DownloadError(f'the response took more than {deadline:g} seconds')
+            if progress is not None:
+                progress(len(body), total)
+    except DownloadError:
+        raise
+    except Exception:
+        # Reading from the connection the timer shut down
+        if expired.is_set():
+            raise DownloadError(f'the response took more than {deadline:g} seconds')
+        raise
+    finally:
+        timer.cancel()
+        response.close()
+
+    if expired.is_set():
+        raise DownloadError(f'the response took more than {deadline:g} seconds')
+    return body
+
+def _abort(response, expired):
+    """Makes the reads of response fail, also the one waiting for data right now."""
+    expired.set()
+    # Closing the response doesn't wake up a read blocked on the socket, shutting the socket down does.
+    # urllib3 2.3 does it with shutdown(), the pinned urllib3 1.x keeps the socket in the connection.
+    try:
+        if callable(getattr(type(response.raw), 'shutdown', None)):
+            response.raw.shutdown()
+        else:
+            sock = getattr(getattr(response.raw, '_connection', None), 'sock', None)
+            if isinstance(sock, socket.socket):
+                sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    response.close()
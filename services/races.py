@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import hashlib
+import logging
+
+from services import http_session
+
+logger = logging.getLogger(__name__)
+
+# SRD races shipped with the bot, so building a character doesn't depend on a third-party API
+RACES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'races.json')
+
+# Races that aren't in the bundle are fetched from dnd5eapi once and kept here. In AWS Lambda only
+# /tmp is writable, so set RACE_CACHE_DIR=/tmp/races there.
+RACE_CACHE_DIR = os.environ.get('RACE_CACHE_DIR', './cache/races')
+DND5E_API_URL = "https://www.dnd5eapi.co/api/races"
+# Seconds to wait for dnd5eapi, well under the 6 seconds a Lambda function runs by default. A race
+# that couldn't be fetched isn't asked for again in the next RACE_RETRY_AFTER seconds.
+RACE_FETCH_TIMEOUT = float(os.environ.get('RACE_FETCH_TIMEOUT', '2'))
+RACE_RETRY_AFTER = float(os.environ.get('RACE_RETRY_AFTER', '300'))
+
+ABILITY_SCORES = ['str', 'dex', 'con', 'int', 'wis', 'cha']
+
+_bundled_races = None
+_fetched_races = {}
+# Races dnd5eapi couldn't give, with the time (time.monotonic()) of the failure
+_unavailable_races = {}
+
+def get_race_data(race):
+    """
+    Return the data of a race (ability_bonuses, the bonus to each ability score in the order
+    str, dex, con, int, wis, cha, is the part the models use).
+
+    Races come from the bundle, the cache or dnd5eapi, in that order. When the API can't be reached
+    the race gets no bonuses, so the character can still be built, and the data is marked as
+    'unavailable' so it isn't kept anywhere. The failure is remembered for RACE_RETRY_AFTER seconds,
+    so the characters of that race don't wait for the API on every load meanwhile.
+    """
+    race_data = _get_bundled_races().get(race, None) or _fetched_races.get(race, None) or _read_cache(race)
+    if race_data is None:
+        failed = _unavailable_races.get(race, None)
+        if failed is None or time.monotonic() - failed >= RACE_RETRY_AFTER:
+            race_data = _fetch_race(race)
+            if race_data is None:
+                _unavailable_races[race] = time.monotonic()
+        if race_data is None:
+            return {'name': race, 'ability_bonuses': [0, 0, 0, 0, 0, 0], 'unavailable': True}
+        _unavailable_races.pop(race, None)
+        _write_cache(race, race_data)
+
+    _fetched_races[race] = race_data
+    return race_data
+
+def _get_bundled_races():
+    global _bundled_races
+    if _bundled_races is None:
+        with open(RACES_FILE, 'r') as f:
+            _bundled_races = json.load(f)
+    return _bundled_races
+
+def _cache_file(race):
+    return os.path.join(RACE_CACHE_DIR, f"{hashlib.md5(race.encode()).hexdigest()}.json")
+
+def _read_cache(race):
+    try:
+        with open(_cache_file(race), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_cache(race, race_data):
+    try:
+        os.makedirs(RACE_CACHE_DIR, exist_ok=True)
+        with open(_cache_file(race), 'w') as f:
+            json.dump(race_data, f)
+    except OSError as e:
+        logger.warning(f'Race {race} could not be cached: {e}')
+
+def _fetch_race(race):
+    index = race.lower().replace(' ', '-')
+    try:
+        response = http_session.get(f'{DND5E_API_URL}/{index}', timeout=RACE_FETCH_TIMEOUT)
+        response.raise_for_status()
+        data = response.json()
+    except Exception as e:
+        logger.warning(f'Race {race} could not be fetched: {e}')
+        return None
+
+    # The API lists the bonuses as [{'ability_score': {'index': 'dex'}, 'bonus': 2}, ...]
+    bonuses = [0, 0, 0, 0, 0, 0]
+    for bonus in data.get('ability_bonuses', []):
+        ability = bonus.get('ability_score', {}).get('index', None) if isinstance(bonus, dict) else None
+        if ability in ABILITY_SCORES:
+            bonuses[ABILITY_SCORES.index(ability)] = int(bonus.get('bonus', 0))
+
+    return {
+        'index': data.get('index', index),
+        'name': data.get('name', race),
+        'speed': data.get('speed', None),
+        'size': data.get('size', None),
+        'ability_bonuses': bonuses
+    }
@@ -0,0 +1,436 @@
+import json
+import uuid
+import sqlite3
+import utils
+
+from exceptions import EntityExists
+
+from storage import Storage, character_name_updates, entity_summary
+from models.campaign import Campaign
+from models.character_data import compact_character_data
+from models.adventure import Adventure
+from models.monster import Monster
+from models.npc import NPC
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaigns (
+    id TEXT PRIMARY KEY,
+    chat_id INTEGER NOT NULL,
+    active INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS campaigns_chat_id ON campaigns (chat_id, active);
+
+CREATE TABLE IF NOT EXISTS characters (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS character_sheets (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS character_users (
+    campaign_id TEXT NOT NULL,
+    username TEXT NOT NULL,
+    character_id TEXT NOT NULL,
+    PRIMARY KEY (campaign_id, username)
+);
+
+CREATE TABLE IF NOT EXISTS character_names (
+    campaign_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    character_id TEXT NOT NULL,
+    PRIMARY KEY (campaign_id, key)
+);
+
+CREATE TABLE IF NOT EXISTS npcs (
+    campaign_id TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    data TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    PRIMARY KEY (campaign_id, name_key)
+);
+
+CREATE TABLE IF NOT EXISTS monsters (
+    campaign_id TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    data TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    PRIMARY KEY (campaign_id, name_key)
+);
+
+CREATE TABLE IF NOT EXISTS adventures (
+    campaign_id TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    data TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    PRIMARY KEY (campaign_id, name_key)
+);
+
+CREATE TABLE IF NOT EXISTS processed_updates (
+    update_id INTEGER PRIMARY KEY
+);
+"""
+
+class SQLiteDatabase(Storage):
+    """
+    Storage backed by a local SQLite file, for self-hosted deployments (local.py) and for running
+    benchmarks without the network. Campaigns and characters keep the same JSON documents the
+    Firebase backend stores, in tables indexed by the keys the commands look them up with.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+
+    def _commit(self):
+        self.connection.commit()
+
+    def _rollback(self):
+        self.connection.rollback()
+
+    def _execute(self, sql, params=()):
+        cursor = self.connection.execute(sql, params)
+        if not self._in_unit_of_work():
+            self.connection.commit()
+        return cursor
+
+    def _fetch_one(self, sql, params=()):
+        row = self.connection.execute(sql, params).fetchone()
+        return row[0] if row is not None else None
+
+    # Updates
+
+    def claim_update(self, update_id, window):
+        """Record update_id as processed. Returns False if it had already been recorded."""
+        cursor = self.connection.execute('INSERT OR IGNORE INTO processed_updates (update_id) VALUES (?)', (update_id,))
+        self.connection.execute('DELETE FROM processed_updates WHERE update_id <= ?', (update_id - window,))
+        self.connection.commit()
+        return cursor.rowcount == 1
+
+    def release_update(self, update_id):
+        """Forget that update_id was processed, so it is processed when it is delivered again."""
+        self.connection.execute('DELETE FROM processed_updates WHERE update_id = ?', (update_id,))
+        self.connection.commit()
+
+    # Campaigns
+
+    def create_campaign(self, chat_id, campaign_name):
+        """Create a new active campaign for the chat."""
+        campaign_id = uuid.uuid4().hex
+        campaign = Campaign(chat_id, campaign_name)
+        self._execute('INSERT INTO campaigns (id, chat_id, active, data) VALUES (?, ?, 1, ?)',
+                      (campaign_id, int(chat_id), json.dumps(campaign.to_json())))
+        self._forget(('campaign', int(chat_id)))
+        return campaign_id
+
+    def _load_campaign(self, chat_id):
+        row = self.connection.execute('SELECT id, data FROM campaigns WHERE chat_id = ? AND active = 1',
+                                      (int(chat_id),)).fetchone()
+        if row is None:
+            return (None, None)
+
+        return (row[0], json.loads(row[1]))
+
+    def close_campaign(self, campaign_id):
+        """Mark a campaign as inactive."""
+        self._forget_campaign(campaign_id)
+        self._update_campaign_data(campaign_id, {'active': False})
+        return self._execute('UPDATE campaigns SET active = 0 WHERE id = ?', (campaign_id,)).rowcount
+
+    def delete_campaign(self, campaign_id):
+        """Delete a campaign."""
+        self._forget_campaign(campaign_id)
+        for table in ('character_users', 'character_names', 'npcs', 'monsters', 'adventures'):
+            self._execute(f'DELETE FROM {table} WHERE campaign_id = ?', (campaign_id,))
+        return self._execute('DELETE FROM campaigns WHERE id = ?', (campaign_id,)).rowcount
+
+    def _update_campaign_data(self, campaign_id, fields):
+        data = self._fetch_one('SELECT data FROM campaigns WHERE id = ?', (campaign_id,))
+        if data is None:
+            return None
+
+        campaign = json.loads(data)
+        campaign.update(fields)
+        self._execute('UPDATE campaigns SET data = ? WHERE id = ?', (json.dumps(campaign), campaign_id))
+        return campaign
+
+    def set_dm(self, campaign_id, user_id, username):
+        """Set the Dungeon Master of a campaign."""
+        fields = {'dm_user_id': int(user_id), 'dm_username': username}
+        self._update_cached_campaign(campaign_id, fields)
+        return self._update_campaign_data(campaign_id, fields)
+
+    def set_turns(self, campaign_id, turns):
+        """Set the turns order and restart the turn index."""
+        fields = {'turns': turns, 'turn_index': 0}
+        self._update_cached_campaign(campaign_id, fields)
+        return self._update_campaign_data(campaign_id, fields)
+
+    def set_turn_index(self, campaign_id, turn_index):
+        """Set the turn index of a campaign."""
+        self._update_cached_campaign(campaign_id, {'turn_index': turn_index})
+        return self._update_campaign_data(campaign_id, {'turn_index': turn_index})
+
+    def change_turn_index(self, campaign_id, diff):
+        """Add diff to the turn index of a campaign and return the new index."""
+        # A single UPDATE is atomic, SQLite serializes the writers
+        self._execute("UPDATE campaigns SET data = json_set(data, '$.turn_index', "
+                      "coalesce(json_extract(data, '$.turn_index'), 0) + ?) WHERE id = ?", (diff, campaign_id))
+        turn_index = self._fetch_one("SELECT json_extract(data, '$.turn_index') FROM campaigns WHERE id = ?", (campaign_id,))
+        self._update_cached_campaign(campaign_id, {'turn_index': turn_index})
+        return turn_index
+
+    def start_battle(self, campaign_id, battle_field):
+        """Create a new battle field for a campaign."""
+        self._update_cached_campaign(campaign_id, {'battle_field': battle_field})
+        return self._update_campaign_data(campaign_id, {'battle_field': battle_field})
+
+    def set_battle_positions(self, campaign_id, positions):
+        """Set the positions of the characters in the battle field."""
+        self._forget_campaign(campaign_id)
+        data = self._fetch_one('SELECT data FROM campaigns WHERE id = ?', (campaign_id,))
+        if data is None:
+            return None
+
+        battle_field = json.loads(data).get('battle_field', None) or {}
+        battle_field['positions'] = positions
+        return self._update_campaign_data(campaign_id, {'battle_field': battle_field})
+
+    def set_char_position(self, campaign_id, username, position):
+        """Move a character in the battle field. Returns None if the character is not in it."""
+        data = self._fetch_one('SELECT data FROM campaigns WHERE id = ?', (campaign_id,))
+        if data is None:
+            return None
+
+        battle_field = json.loads(data).get('battle_field', None) or {}
+        positions = battle_field.get('positions', None) or {}
+        if username not in positions:
+            return None
+
+        self._forget_campaign(campaign_id)
+        positions[username] = position
+        battle_field['positions'] = positions
+        self._update_campaign_data(campaign_id, {'battle_field': battle_field})
+        return position
+
+    # Characters
+
+    def save_character_info(self, character_id, character_data):
+        """Store the compact projection of a D&D Beyond character and, apart, its raw sheet."""
+        self._forget(('character', str(character_id)))
+        self._execute('INSERT OR REPLACE INTO character_sheets (id, data) VALUES (?, ?)',
+                      (str(character_id), json.dumps(character_data)))
+        self._save_character_data(character_id, compact_character_data(character_data))
+        return character_data
+
+    def get_character_sheet(self, character_id):
+        """Return the raw D&D Beyond sheet of a character, or None."""
+        data = self._fetch_one('SELECT data FROM character_sheets WHERE id = ?', (str(character_id),))
+        return json.loads(data) if data is not None else None
+
+    def _save_character_data(self, character_id, character_data):
+        self._execute('INSERT OR REPLACE INTO characters (id, data) VALUES (?, ?)',
+                      (str(character_id), json.dumps(character_data)))
+
+    def _save_character_snapshot(self, character_id, snapshot):
+        self._execute("UPDATE characters SET data = json_set(data, '$.snapshot', json(?)) WHERE id = ?",
+                      (json.dumps(snapshot), str(character_id)))
+
+    def set_character_link(self, campaign_id, username, character_id):
+        """Link a character to a player of a campaign, indexing it by name too (see character_name_updates)."""
+        links = dict(self.connection.execute('SELECT username, character_id FROM character_users WHERE campaign_id = ?',
+                                             (campaign_id,)).fetchall())
+        names = dict(self.connection.execute('SELECT key, character_id FROM character_names WHERE campaign_id = ?',
+                                             (campaign_id,)).fetchall())
+        data = self._fetch_one('SELECT data FROM characters WHERE id = ?', (str(character_id),))
+        name = json.loads(data)['character']['name'] if data is not None else None
+
+        self._execute('INSERT OR REPLACE INTO character_users (campaign_id, username, character_id) VALUES (?, ?, ?)',
+                      (campaign_id, username, str(character_id)))
+        for key, value in character_name_updates(names, links, username, character_id, name).items():
+            if value is None:
+                self._execute('DELETE FROM character_names WHERE campaign_id = ? AND key = ?', (campaign_id, key))
+            else:
+                self._execute('INSERT OR REPLACE INTO character_names (campaign_id, key, character_id) VALUES (?, ?, ?)',
+                              (campaign_id, key, value))
+
+        self._forget_character_ids(campaign_id)
+        self._remember(('character_id', campaign_id, username), character_id)
+        return character_id
+
+    def _load_character_id(self, campaign_id, search):
+        # Usernames come first, so a character name can never take the place of a player
+        character_id = self._fetch_one('SELECT character_id FROM character_users WHERE campaign_id = ? AND username = ?',
+                                       (campaign_id, search))
+        if character_id is None:
+            character_id = self._fetch_one('SELECT character_id FROM character_names WHERE campaign_id = ? AND key = ?',
+                                           (campaign_id, utils.index_key(search)))
+        return character_id
+
+    def _load_character(self, character_id):
+        data = self._fetch_one('SELECT data FROM characters WHERE id = ?', (str(character_id),))
+        if data is None:
+            return None
+
+        return self._character_from_data(character_id, json.loads(data))
+
+    def _update_character_data(self, character_id, update):
+        data = self._fetch_one('SELECT data FROM characters WHERE id = ?', (str(character_id),))
+        if data is None:
+            return None
+
+        character_data = json.loads(data)
+        update(character_data['character'])
+        self._execute('UPDATE characters SET data = ? WHERE id = ?', (json.dumps(character_data), str(character_id)))
+        return character_data
+
+    def set_char_hp(self, character_id, hit_points):
+        """Set the removed hit points of a character."""
+        return self._update_character_data(character_id, lambda c: c.update({'removedHitPoints': hit_points}))
+
+    def change_char_hp(self, character_id, points, max_hit_points):
+        """Remove points hit points from a character (negative points heal it). Returns the new removed hit points."""
+        self._execute("UPDATE characters SET data = json_set(data, '$.character.removedHitPoints', "
+                      "min(?, max(0, coalesce(json_extract(data, '$.character.removedHitPoints'), 0) + ?))) WHERE id = ?",
+                      (max_hit_points, points, str(character_id)))
+        return self._fetch_one("SELECT json_extract(data, '$.character.removedHitPoints') FROM characters WHERE id = ?",
+                               (str(character_id),))
+
+    def set_char_xp(self, character_id, xp):
+        """Set the experience points of a character."""
+        return self._update_character_data(character_id, lambda c: c.update({'currentXp': xp}))
+
+    def set_char_level(self, character_id, level):
+        """Set the level of a character."""
+        # Most derived attributes depend on the level, so the snapshot is built again on the next load
+        self._forget(('character', str(character_id)))
+        self._execute("UPDATE characters SET data = json_remove(data, '$.snapshot') WHERE id = ?", (str(character_id),))
+        return self._update_character_data(character_id, lambda c: c['classes'][0].update({'level': level}))
+
+    def set_char_currency(self, character_id, currencies):
+        """Set the currency pouch of a character."""
+        return self._update_character_data(character_id, lambda c: c.update({'currencies': currencies}))
+
+    # NPCs, monsters and adventures are stored by campaign and name key, with the summary the
+    # listings print in a column of its own
+
+    def _add_entity(self, table, chat_id, data):
+        campaign_id = self._get_campaign_id(chat_id)
+        try:
+            self._execute(f'INSERT INTO {table} (campaign_id, name_key, data, summary) VALUES (?, ?, ?, ?)',
+                          (campaign_id, utils.index_key(data['name']), json.dumps(data), json.dumps(entity_summary(table, data))))
+        except sqlite3.IntegrityError:
+            raise EntityExists(data['name'])
+        return data
+
+    def _get_entities(self, table, chat_id):
+        campaign_id = self._get_campaign_id(chat_id)
+        rows = self.connection.execute(f'SELECT data FROM {table} WHERE campaign_id = ? ORDER BY name_key',
+                                       (campaign_id,)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def _get_entity(self, table, chat_id, name):
+        campaign_id = self._get_campaign_id(chat_id)
+        data = self._fetch_one(f'SELECT data FROM {table} WHERE campaign_id = ? AND name_key = ?',
+                               (campaign_id, utils.index_key(name)))
+        return json.loads(data) if data is not None else None
+
+    def _get_summaries(self, table, chat_id):
+        campaign_id = self._get_campaign_id(chat_id)
+        rows = self.connection.execute(f'SELECT summary FROM {table} WHERE campaign_id = ? ORDER BY name_key',
+                                       (campaign_id,)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def _update_entity(self, table, chat_id, data):
+        campaign_id = self._get_campaign_id(chat_id)
+        self._execute(f'UPDATE {table} SET data = ?, summary = ? WHERE campaign_id = ? AND name_key = ?',
+                      (json.dumps(data), json.dumps(entity_summary(table, data)), campaign_id, utils.index_key(data['name'])))
+
+    def _delete_entity(self, table, chat_id, name):
+        campaign_id = self._get_campaign_id(chat_id)
+        self._execute(f'DELETE FROM {table} WHERE campaign_id = ? AND name_key = ?', (campaign_id, utils.index_key(name)))
+
+    def add_npc(self, chat_id, npc):
+        """Add an NPC to the active campaign."""
+        return self._add_entity('npcs', chat_id, npc.to_json())
+
+    def get_npcs(self, chat_id):
+        """Get all NPCs in the active campaign."""
+        return [NPC(npc) for npc in self._get_entities('npcs', chat_id)]
+
+    def get_npc_summaries(self, chat_id):
+        """Get the summaries of the NPCs in the active campaign, as a list of dicts."""
+        return self._get_summaries('npcs', chat_id)
+
+    def get_npc_by_name(self, chat_id, name):
+        """Get an NPC by name."""
+        npc_data = self._get_entity('npcs', chat_id, name)
+        return NPC(npc_data) if npc_data is not None else None
+
+    def update_npc(self, chat_id, npc):
+        """Update an existing NPC."""
+        self._update_entity('npcs', chat_id, npc.to_json())
+
+    def delete_npc(self, chat_id, npc):
+        """Delete an NPC from the active campaign."""
+        self._delete_entity('npcs', chat_id, npc.name)
+
+    def add_monster(self, chat_id, monster):
+        """Add a monster to the active campaign."""
+        return self._add_entity('monsters', chat_id, monster.to_json())
+
+    def get_monsters(self, chat_id):
+        """Get all monsters in the active campaign."""
+        return [Monster(monster) for monster in self._get_entities('monsters', chat_id)]
+
+    def get_monster_summaries(self, chat_id):
+        """Get the summaries of the monsters in the active campaign, as a list of dicts."""
+        return self._get_summaries('monsters', chat_id)
+
+    def get_monster_by_name(self, chat_id, name):
+        """Get a monster by name."""
+        monster_data = self._get_entity('monsters', chat_id, name)
+        return Monster(monster_data) if monster_data is not None else None
+
+    def update_monster(self, chat_id, monster):
+        """Update an existing monster."""
+        self._update_entity('monsters', chat_id, monster.to_json())
+
+    def delete_monster(self, chat_id, monster):
+        """Delete a monster from the active campaign."""
+        self._delete_entity('monsters', chat_id, monster.name)
+
+    def add_adventure(self, chat_id, adventure):
+        """Add an adventure to the active campaign."""
+        adventure_data = adventure.to_json()
+        adventure_data['chat_id'] = chat_id
+        return self._add_entity('adventures', chat_id, adventure_data)
+
+    def get_adventures(self, chat_id):
+        """Get all adventures in the active campaign."""
+        return [Adventure(adventure) for adventure in self._get_entities('adventures', chat_id)]
+
+    def get_adventure_summaries(self, chat_id):
+        """Get the summaries of the adventures in the active campaign, as a list of dicts."""
+        return self._get_summaries('adventures', chat_id)
+
+    def get_adventure_by_name(self, chat_id, name):
+        """Get an adventure by name."""
+        adventure_data = self._get_entity('adventures', chat_id, name)
+        return Adventure(adventure_data) if adventure_data is not None else None
+
+    def update_adventure(self, chat_id, adventure):
+        """Update an existing adventure."""
+        adventure_data = adventure.to_json()
+        adventure_data['chat_id'] = chat_id
+        self._update_entity('adventures', chat_id, adventure_data)
+
+    def delete_adventure(self, chat_id, adventure):
+        """Delete an adventure from the campaign."""
+        self._delete_entity('adventures', chat_id, adventure.name)
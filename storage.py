@@ -0,0 +1,420 @@
+import os
+import utils
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+from models.character import Character, CHARACTER_SCHEMA_VERSION
+from models.character_data import compact_character_data, is_compact
+from services.races import get_race_data
+
+# Backend used by get_storage(): 'firebase' (default) or 'sqlite'
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'firebase')
+SQLITE_PATH = os.environ.get('SQLITE_PATH', 'dndbot.db')
+
+# Value of the name keys shared by different characters (like the first word of "John Smith" and
+# "John Doe"), which resolve to none of them. Character ids are numbers, so it can't be one.
+AMBIGUOUS_NAME = '#ambiguous'
+
+def character_name_keys(name):
+    """Index keys of a character name: the full name and, for names with several words, the first one."""
+    keys = [utils.index_key(name)]
+    words = name.split()
+    if len(words) > 1:
+        keys.append(utils.index_key(words[0]))
+    return keys
+
+def character_name_updates(names, links, username, character_id, name):
+    """
+    Changes to the name index of a campaign ({key: character id}, see character_name_keys) when
+    username links character_id, called name (None if unknown). links are the characters linked to
+    each username before this link. Returns {key: value}, None removing the key.
+
+    The keys of the character the username had are removed, unless another username still links it,
+    and the keys other characters already have are marked AMBIGUOUS_NAME.
+    """
+    character_id = str(character_id)
+    updates = {}
+    previous = links.get(username)
+    others = set(str(c) for u, c in links.items() if u != username)
+    if previous is not None and str(previous) != character_id and str(previous) not in others:
+        for key, value in names.items():
+            if str(value) == str(previous):
+                updates[key] = None
+
+    for key in character_name_keys(name) if name is not None else []:
+        current = None if key in updates else names.get(key)
+        updates[key] = character_id if current is None or str(current) == character_id else AMBIGUOUS_NAME
+    return updates
+
+# Fields kept in the summary of each kind of entity, which is all the /list_* commands print
+SUMMARY_FIELDS = {
+    'npcs': ('name', 'level', 'race', 'class'),
+    'monsters': ('name', 'type', 'challenge_rating', 'max_hit_points'),
+    'adventures': ('name', 'level_range', 'status'),
+}
+
+def entity_summary(kind, data):
+    """Summary of the JSON data of an NPC, monster or adventure (kind is 'npcs', 'monsters' or 'adventures')."""
+    return {field: data[field] for field in SUMMARY_FIELDS[kind] if data.get(field) is not None}
+
+def get_storage():
+    """Create the storage backend selected with STORAGE_BACKEND."""
+    if STORAGE_BACKEND == 'sqlite':
+        from sqlite_database import SQLiteDatabase
+        return SQLiteDatabase(SQLITE_PATH)
+
+    from database import Database
+    return Database()
+
+class Storage(ABC):
+    """
+    Interface the handlers and decorators use to read and write the bot data (the `db` argument of
+    every handler). Campaigns are returned as a tuple (campaign_id, campaign dict), characters as
+    models.character.Character instances.
+
+    The request-scoped identity map lives here, so every backend gets it: inside unit_of_work()
+    each campaign, character link and character is loaded at most once.
+    """
+
+    def __init__(self):
+        self._identity_map = None
+
+    @contextmanager
+    def unit_of_work(self):
+        """
+        Scope of a single update. Inside it every campaign, character link and character is fetched at
+        most once, and later lookups are served from memory (the same objects are returned, so changes
+        the handlers make to them are seen by the next lookups too).
+
+        The writes of the scope are applied together when it ends. Nothing is written if the command
+        raises.
+        """
+        self._identity_map = {}
+        self._begin()
+        try:
+            yield self
+            self._commit()
+        except BaseException:
+            self._rollback()
+            raise
+        finally:
+            self._identity_map = None
+
+    def _begin(self):
+        pass
+
+    def _commit(self):
+        pass
+
+    def _rollback(self):
+        pass
+
+    def _in_unit_of_work(self):
+        return self._identity_map is not None
+
+    def _cached(self, key, loader):
+        if self._identity_map is None:
+            return loader()
+
+        if key not in self._identity_map:
+            self._identity_map[key] = loader()
+        return self._identity_map[key]
+
+    def _forget(self, key):
+        if self._identity_map is not None:
+            self._identity_map.pop(key, None)
+
+    def _remember(self, key, value):
+        if self._identity_map is not None:
+            self._identity_map[key] = value
+
+    def _update_cached_campaign(self, campaign_id, fields):
+        if self._identity_map is None:
+            return
+
+        for key, value in self._identity_map.items():
+            if key[0] == 'campaign' and value[0] == campaign_id:
+                value[1].update(fields)
+
+    def _forget_campaign(self, campaign_id):
+        if self._identity_map is None:
+            return
+
+        for key in [k for k, v in self._identity_map.items() if k[0] == 'campaign' and v[0] == campaign_id]:
+            del self._identity_map[key]
+
+    def _cached_campaign_chat_id(self, campaign_id):
+        for key, value in (self._identity_map or {}).items():
+            if key[0] == 'campaign' and value[0] == campaign_id:
+                return key[1]
+        return None
+
+    def _character_from_data(self, character_id, character_data):
+        if not is_compact(character_data):
+            character_data = self._upgrade_character_data(character_id, character_data)
+
+        # The derived attributes are stored with the character the first time it's built, so the
+        # next loads don't derive them again (nor fetch the race data)
+        snapshot = character_data.get('snapshot', None)
+        if snapshot is not None and snapshot.get('schema') == CHARACTER_SCHEMA_VERSION:
+            return Character.from_snapshot(snapshot, character_data)
+
+        race_data = get_race_data(character_data['character']['race']['baseName'])
+        character = Character(character_data, race_data, False)
+        if not race_data.get('unavailable', False):
+            self._save_character_snapshot(character_id, character.to_snapshot())
+        return character
+
+    def _upgrade_character_data(self, character_id, character_data):
+        if 'version' not in character_data:
+            # Stored before the projections existed: the whole sheet, kept up to date by the bot
+            self.save_character_info(character_id, character_data)
+            return compact_character_data(character_data)
+
+        sheet = self.get_character_sheet(character_id)
+        if sheet is None:
+            return character_data
+
+        character_data = compact_character_data(sheet, state=character_data)
+        self._save_character_data(character_id, character_data)
+        return character_data
+
+    # Updates
+
+    @abstractmethod
+    def claim_update(self, update_id, window):
+        """Record update_id as processed. Returns False if it had already been recorded."""
+
+    @abstractmethod
+    def release_update(self, update_id):
+        """Forget that update_id was processed, so it is processed when it is delivered again."""
+
+    # Campaigns
+
+    @abstractmethod
+    def create_campaign(self, chat_id, campaign_name):
+        """Create a new active campaign for the chat. Returns its id."""
+
+    def get_campaign(self, chat_id):
+        """Return a tuple (campaign_id, campaign) with the active campaign of the chat."""
+        return self._cached(('campaign', int(chat_id)), lambda: self._load_campaign(chat_id))
+
+    @abstractmethod
+    def _load_campaign(self, chat_id):
+        pass
+
+    @abstractmethod
+    def close_campaign(self, campaign_id):
+        """Mark a campaign as inactive."""
+
+    @abstractmethod
+    def delete_campaign(self, campaign_id):
+        """Delete a campaign."""
+
+    @abstractmethod
+    def set_dm(self, campaign_id, user_id, username):
+        """Set the Dungeon Master of a campaign."""
+
+    @abstractmethod
+    def set_turns(self, campaign_id, turns):
+        """Set the turns order and restart the turn index."""
+
+    @abstractmethod
+    def set_turn_index(self, campaign_id, turn_index):
+        """Set the turn index of a campaign."""
+
+    @abstractmethod
+    def change_turn_index(self, campaign_id, diff):
+        """
+        Add diff to the turn index of a campaign and return the new index. The change is applied on
+        the stored value, so concurrent commands don't overwrite each other.
+        """
+
+    @abstractmethod
+    def start_battle(self, campaign_id, battle_field):
+        """Create a new battle field for a campaign."""
+
+    @abstractmethod
+    def set_battle_positions(self, campaign_id, positions):
+        """Set the positions of the characters in the battle field."""
+
+    @abstractmethod
+    def set_char_position(self, campaign_id, username, position):
+        """Move a character in the battle field. Returns None if the character is not in it."""
+
+    # Characters
+
+    @abstractmethod
+    def save_character_info(self, character_id, character_data):
+        """
+        Store a character imported from D&D Beyond: the compact projection of its sheet the bot reads
+        (models.character_data) and, apart, the raw sheet. Returns None if it couldn't be stored.
+        """
+
+    @abstractmethod
+    def get_character_sheet(self, character_id):
+        """Return the raw D&D Beyond sheet of a character, or None."""
+
+    @abstractmethod
+    def _save_character_data(self, character_id, character_data):
+        pass
+
+    @abstractmethod
+    def _save_character_snapshot(self, character_id, snapshot):
+        pass
+
+    @abstractmethod
+    def set_character_link(self, campaign_id, username, character_id):
+        """Link a character to a player of a campaign."""
+
+    def get_character_id(self, campaign_id, search):
+        """
+        Return the id of the character linked to a username, or else with a given name, in the
+        campaign. Names several characters share resolve to none.
+        """
+        def load():
+            character_id = self._load_character_id(campaign_id, search)
+            return character_id if character_id != AMBIGUOUS_NAME else None
+
+        return self._cached(('character_id', campaign_id, search), load)
+
+    @abstractmethod
+    def _load_character_id(self, campaign_id, search):
+        pass
+
+    def _forget_character_ids(self, campaign_id):
+        if self._identity_map is None:
+            return
+
+        for key in [k for k in self._identity_map if k[0] == 'character_id' and k[1] == campaign_id]:
+            del self._identity_map[key]
+
+    def get_character(self, character_id, find_by_id=False):
+        """Load a character by id. Returns None if it doesn't exist."""
+        if character_id is None:
+            return None
+
+        return self._cached(('character', str(character_id)), lambda: self._load_character(character_id))
+
+    @abstractmethod
+    def _load_character(self, character_id):
+        pass
+
+    @abstractmethod
+    def set_char_hp(self, character_id, hit_points):
+        """Set the removed hit points of a character."""
+
+    @abstractmethod
+    def change_char_hp(self, character_id, points, max_hit_points):
+        """
+        Remove points hit points from a character (negative points heal it), keeping the removed hit
+        points between 0 and max_hit_points, and return the new removed hit points. The change is
+        applied on the stored value, so concurrent commands don't overwrite each other.
+        """
+
+    @abstractmethod
+    def set_char_xp(self, character_id, xp):
+        """Set the experience points of a character."""
+
+    @abstractmethod
+    def set_char_level(self, character_id, level):
+        """Set the level of a character."""
+
+    @abstractmethod
+    def set_char_currency(self, character_id, currencies):
+        """Set the currency pouch of a character."""
+
+    # NPCs
+
+    @abstractmethod
+    def add_npc(self, chat_id, npc):
+        """Add an NPC to the active campaign. Raises EntityExists if one with the same name exists."""
+
+    @abstractmethod
+    def get_npcs(self, chat_id):
+        """Get all NPCs in the active campaign."""
+
+    @abstractmethod
+    def get_npc_summaries(self, chat_id):
+        """Get the summaries of the NPCs in the active campaign, as a list of dicts."""
+
+    @abstractmethod
+    def get_npc_by_name(self, chat_id, name):
+        """Get an NPC by name."""
+
+    @abstractmethod
+    def update_npc(self, chat_id, npc):
+        """Update an existing NPC. Its name can't change, it's the key it's stored with."""
+
+    @abstractmethod
+    def delete_npc(self, chat_id, npc):
+        """Delete an NPC from the active campaign."""
+
+    # Monsters
+
+    @abstractmethod
+    def add_monster(self, chat_id, monster):
+        """Add a monster to the active campaign. Raises EntityExists if one with the same name exists."""
+
+    @abstractmethod
+    def get_monsters(self, chat_id):
+        """Get all monsters in the active campaign."""
+
+    @abstractmethod
+    def get_monster_summaries(self, chat_id):
+        """Get the summaries of the monsters in the active campaign, as a list of dicts."""
+
+    @abstractmethod
+    def get_monster_by_name(self, chat_id, name):
+        """Get a monster by name."""
+
+    @abstractmethod
+    def update_monster(self, chat_id, monster):
+        """Update an existing monster. Its name can't change, it's the key it's stored with."""
+
+    @abstractmethod
+    def delete_monster(self, chat_id, monster):
+        """Delete a monster from the active campaign."""
+
+    # Adventures
+
+    @abstractmethod
+    def add_adventure(self, chat_id, adventure):
+        """Add an adventure to the active campaign. Raises EntityExists if one with the same name exists."""
+
+    @abstractmethod
+    def get_adventures(self, chat_id):
+        """Get all adventures in the active campaign."""
+
+    @abstractmethod
+    def get_adventure_summaries(self, chat_id):
+        """Get the summaries of the adventures in the active campaign, as a list of dicts."""
+
+    @abstractmethod
+    def get_adventure_by_name(self, chat_id, name):
+        """Get an adventure by name."""
+
+    @abstractmethod
+    def update_adventure(self, chat_id, adventure):
+        """Update an existing adventure. Its name can't change, it's the key it's stored with."""
+
+    @abstractmethod
+    def delete_adventure(self, chat_id, adventure):
+        """Delete an adventure from the campaign."""
+
+    def _get_campaign_id(self, chat_id):
+        campaign_id, campaign = self.get_campaign(chat_id)
+        if campaign_id is None:
+            raise CampaignNotFoundException("No active campaign found")
+        return campaign_id
+
+
+class CampaignActiveException(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class CampaignNotFoundException(Exception):
+    def __init__(self, message):
+        super().__init__(message)
@@ -0,0 +1,258 @@
+import json
+import time
+import uuid
+import copy
+import hashlib
+
+from urllib.parse import urlparse, parse_qsl
+from requests import HTTPError, Response
+from requests.adapters import BaseAdapter
+
+class FakeFirebaseApplication:
+    """
+    In-process stand-in for firebase.FirebaseApplication, following the semantics of the Firebase
+    Realtime Database REST API: get, put, post, patch (including multi-location updates on '/') and
+    delete, plus the shallow, orderBy and equalTo query parameters.
+
+    The requests Database sends directly through the HTTP session (the conditional writes) are
+    served by adapter(), a transport for requests.Session that maps the REST URLs to the same tree
+    and supports the X-Firebase-ETag and if-match headers.
+
+    Every call is recorded in `requests` as a dict with the method, the path and the bytes sent and
+    received, so tests can check how many round trips and how much payload a command costs:
+
+        with patch('database.firebase.FirebaseApplication', FakeFirebaseApplication):
+            db = Database()
+        db.firebase_db.load({'campaigns': {...}})
+    """
+
+    def __init__(self, dsn=None, authentication=None):
+        self.dsn = dsn
+        self.authentication = authentication
+        self.root = {}
+        self.requests = []
+
+    # Test helpers
+
+    def load(self, data):
+        """Replace the whole tree with a copy of data."""
+        self.root = copy.deepcopy(data)
+
+    def dump(self):
+        """Return a copy of the whole tree."""
+        return copy.deepcopy(self.root)
+
+    def reset_stats(self):
+        self.requests = []
+
+    @property
+    def request_count(self):
+        return len(self.requests)
+
+    @property
+    def bytes_sent(self):
+        return sum(r['sent'] for r in self.requests)
+
+    @property
+    def bytes_received(self):
+        return sum(r['received'] for r in self.requests)
+
+    def count(self, method):
+        """Number of requests made with the given HTTP method."""
+        return len([r for r in self.requests if r['method'] == method])
+
+    # REST API
+
+    def get(self, url, name, connection=None, params=None, headers=None):
+        params = params or {}
+        node = self._node(self._keys(url, name))
+
+        if 'orderBy' in params:
+            node = self._query(node, params)
+        if params.get('shallow') == 'true':
+            if 'orderBy' in params:
+                raise HTTPError('400 Client Error: shallow cannot be mixed with query parameters')
+            if isinstance(node, dict):
+                node = {key: True for key in node}
+
+        result = copy.deepcopy(node)
+        self._record('GET', url, name, None, result)
+        return result
+
+    def put(self, url, name, data, connection=None, params=None, headers=None):
+        keys = self._keys(url, name)
+        data = self._server_values(data)
+        self._set(keys, data)
+        self._record('PUT', url, name, data, data)
+        return copy.deepcopy(data)
+
+    def post(self, url, data, connection=None, params=None, headers=None):
+        key = '-' + uuid.uuid4().hex[:19]
+        data = self._server_values(data)
+        self._set(self._keys(url, key), data)
+        result = {'name': key}
+        self._record('POST', url, None, data, result)
+        return result
+
+    def patch(self, url, data, connection=None, params=None, headers=None):
+        base = self._keys(url, None)
+        paths = [self._keys(path, None) for path in data.keys()]
+        for i, path in enumerate(paths):
+            for other in paths[i + 1:]:
+                shorter, longer = sorted((path, other), key=len)
+                if longer[:len(shorter)] == shorter:
+                    raise HTTPError('400 Client Error: Invalid data; multi-location paths overlap')
+
+        values = self._server_values(data)
+        for path, value in zip(paths, values.values()):
+            self._set(base + path, value)
+        self._record('PATCH', url, None, values, values)
+        return copy.deepcopy(values)
+
+    def delete(self, url, name, connection=None, params=None, headers=None):
+        self._set(self._keys(url, name), None)
+        self._record('DELETE', url, name, None, None)
+
+    def adapter(self):
+        """A requests transport serving the REST URLs (<dsn>/<path>.json) from this tree."""
+        return FakeFirebaseAdapter(self)
+
+    def etag(self, path):
+        return hashlib.md5(json.dumps(self._node(self._keys(path, None))).encode()).hexdigest()
+
+    # Internals
+
+    def _keys(self, url, name):
+        path = f'{url}/{name}' if name is not None else url
+        return [key for key in str(path).split('/') if key != '']
+
+    def _child(self, node, key):
+        # Arrays are stored by Firebase as objects with numeric keys
+        if isinstance(node, list) and key.isdigit() and int(key) < len(node):
+            return int(key)
+        if isinstance(node, dict) and key in node:
+            return key
+        return None
+
+    def _node(self, keys):
+        node = self.root
+        for key in keys:
+            child = self._child(node, key)
+            if child is None:
+                return None
+            node = node[child]
+        return node
+
+    def _set(self, keys, value):
+        if len(keys) == 0:
+            self.root = value if isinstance(value, dict) else {}
+            return
+
+        node = self.root
+        parents = []
+        for key in keys[:-1]:
+            child = self._child(node, key)
+            if child is None or not isinstance(node[child], (dict, list)):
+                if value is None:
+                    return
+                child = key
+                node[child] = {}
+            parents.append((node, child))
+            node = node[child]
+
+        child = self._child(node, keys[-1])
+        if value is None or value == {}:
+            if isinstance(node, dict) and child is not None:
+                del node[child]
+            elif child is not None:
+                node[child] = None
+        else:
+            node[child if child is not None else keys[-1]] = copy.deepcopy(value)
+
+        # Firebase doesn't keep empty nodes
+        for parent, key in reversed(parents):
+            if parent[key]:
+                break
+            del parent[key]
+
+    def _query(self, node, params):
+        if not isinstance(node, dict):
+            return node
+
+        order_by = json.loads(params['orderBy'])
+        items = list(node.items())
+        if order_by == '$key':
+            sort_key = lambda item: item[0]
+        elif order_by == '$value':
+            sort_key = lambda item: item[1]
+        else:
+            sort_key = lambda item: item[1].get(order_by) if isinstance(item[1], dict) else None
+        items = [item for item in items if order_by in ('$key', '$value') or sort_key(item) is not None]
+
+        if 'equalTo' in params:
+            expected = json.loads(params['equalTo'])
+            items = [item for item in items if sort_key(item) == expected]
+        items.sort(key=lambda item: (str(type(sort_key(item))), sort_key(item)))
+        if 'limitToFirst' in params:
+            items = items[:int(params['limitToFirst'])]
+        if 'limitToLast' in params:
+            items = items[-int(params['limitToLast']):]
+        return dict(items)
+
+    def _server_values(self, data):
+        if isinstance(data, dict):
+            if data == {'.sv': 'timestamp'}:
+                return int(time.time() * 1000)
+            return {key: self._server_values(value) for key, value in data.items()}
+        if isinstance(data, list):
+            return [self._server_values(value) for value in data]
+        return data
+
+    def _record(self, method, url, name, sent, received):
+        self.requests.append({
+            'method': method,
+            'path': '/' + '/'.join(self._keys(url, name)),
+            'sent': len(json.dumps(sent)) if sent is not None else 0,
+            'received': len(json.dumps(received)),
+        })
+
+
+class FakeFirebaseAdapter(BaseAdapter):
+    """Transport for requests.Session serving GET and PUT on the REST URLs of a FakeFirebaseApplication."""
+
+    def __init__(self, firebase):
+        super().__init__()
+        self.firebase = firebase
+
+    def send(self, request, **kargs):
+        url = urlparse(request.url)
+        path = url.path[:-len('.json')] if url.path.endswith('.json') else url.path
+        headers = {}
+
+        if request.method == 'GET':
+            status = 200
+            body = self.firebase.get(path, None, params=dict(parse_qsl(url.query)))
+        elif request.method == 'PUT':
+            if_match = request.headers.get('if-match')
+            if if_match is not None and if_match != self.firebase.etag(path):
+                status = 412
+                body = self.firebase.get(path, None)
+            else:
+                status = 200
+                body = self.firebase.put(path, None, json.loads(request.body))
+        else:
+            raise NotImplementedError(request.method)
+
+        if request.headers.get('X-Firebase-ETag') == 'true' or status == 412:
+            headers['ETag'] = self.firebase.etag(path)
+
+        response = Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response._content = json.dumps(body).encode()
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
@@ -1,11 +1,14 @@
 import json
 import unittest
+import tracemalloc
 
 from unittest.mock import patch, Mock, PropertyMock
 
 from models.character import Character
+from replies import InlineReplyBot
 from handlers.character import talk, import_character, link_character, get_status, ability_check, get_spells, \
-                               initiative_roll, short_rest_roll, get_weapons, set_hp, handler, set_currency
+                               initiative_roll, short_rest_roll, get_weapons, set_hp, handler, set_currency, \
+                               import_progress
 
 CHARACTER_JSON = {
     'character': {
@@ -98,7 +101,8 @@ class TestCharacterHandler(unittest.TestCase):
         # conditions
         response = Mock()
         response.status_code = 200
-        response.json = Mock(return_value=CHARACTER_JSON)
+        response.headers = {}
+        response.iter_content = Mock(return_value=[json.dumps(CHARACTER_JSON).encode()])
         get = Mock(return_value=response)
 
         # execution
@@ -109,6 +113,110 @@ class TestCharacterHandler(unittest.TestCase):
         self.db.save_character_info.assert_called_with('123456', CHARACTER_JSON)
         self.assertEqual(rtn, 'Character "John Wick" imported successfully!')
 
+    def test_import_too_big(self):
+        # conditions
+        response = Mock()
+        response.status_code = 200
+        response.headers = {}
+        response.iter_content = Mock(return_value=[b'{"character": {', b' ' * 2048, b'}}'])
+        get = Mock(return_value=response)
+
+        # execution
+        with patch('handlers.character.IMPORT_MAX_BYTES', 1024):
+            rtn = import_character('http://example.com/my/character', self.db, get)
+
+        # expected
+        self.db.save_character_info.assert_not_called()
+        self.assertEqual(rtn, 'Error fetching http://example.com/my/character: the response is too big (more than 1024 bytes)')
+
+    def test_import_not_json(self):
+        # conditions
+        response = Mock()
+        response.status_code = 200
+        response.headers = {}
+        response.iter_content = Mock(return_value=iter([b'<html>', b'never read']))
+        get = Mock(return_value=response)
+
+        # execution
+        rtn = import_character('http://example.com/my/character', self.db, get)
+
+        # expected
+        self.db.save_character_info.assert_not_called()
+        self.assertEqual(rtn, "Error fetching http://example.com/my/character: the response doesn't start with {")
+        self.assertEqual(b'never read', next(response.iter_content.return_value))
+
+    def test_import_not_a_character(self):
+        # conditions
+        response = Mock()
+        response.status_code = 200
+        response.headers = {}
+        response.iter_content = Mock(return_value=[b'{"foo": "bar"}'])
+        get = Mock(return_value=response)
+
+        # execution
+        rtn = import_character('http://example.com/my/character', self.db, get)
+
+        # expected
+        self.db.save_character_info.assert_not_called()
+        self.assertEqual(rtn, 'http://example.com/my/character is not a D&D Beyond character')
+
+    def test_import_peak_memory(self):
+        # conditions
+        with open('tests/fixtures/character.json', 'rb') as jd:
+            body = jd.read()
+        response = Mock()
+        response.status_code = 200
+        response.headers = {'Content-Length': str(len(body))}
+        response.iter_content = lambda size: (body[i:i + size] for i in range(0, len(body), size))
+        get = Mock(return_value=response)
+
+        # execution
+        tracemalloc.start()
+        rtn = import_character('http://example.com/my/character', self.db, get)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # expected
+        self.assertEqual(rtn, 'Character "Amarok Skullsorrow" imported successfully!')
+        self.assertLess(peak, 4 * len(body))
+
+    def test_import_progress(self):
+        # conditions
+        bot = Mock()
+        bot.send_message = Mock(return_value=Mock(message_id=42))
+        progress = import_progress(bot, self.chat_id)
+
+        # execution
+        with patch('handlers.character.IMPORT_PROGRESS_STEP', 100 * 1024):
+            progress(50 * 1024, 300 * 1024)
+            progress(100 * 1024, 300 * 1024)
+            progress(150 * 1024, 300 * 1024)
+            progress(300 * 1024, 300 * 1024)
+
+        # expected
+        bot.send_message.assert_called_once_with(chat_id=self.chat_id, text='Downloading character... 100 KB of 300 KB')
+        bot.edit_message_text.assert_called_once_with(text='Downloading character... 300 KB of 300 KB',
+                                                      chat_id=self.chat_id, message_id=42)
+
+    def test_import_progress_with_inline_replies(self):
+        # conditions
+        bot = Mock()
+        bot.send_message = Mock(return_value=Mock(message_id=42))
+        inline_bot = InlineReplyBot(bot)
+        progress = import_progress(inline_bot, self.chat_id)
+
+        # execution
+        with patch('handlers.character.IMPORT_PROGRESS_STEP', 100 * 1024):
+            progress(100 * 1024, 300 * 1024)
+            progress(300 * 1024, 300 * 1024)
+        inline_bot.send_message(chat_id=self.chat_id, text='Character imported')
+
+        # expected
+        bot.send_message.assert_called_once_with(chat_id=self.chat_id, text='Downloading character... 100 KB of 300 KB')
+        bot.edit_message_text.assert_called_once_with(text='Downloading character... 300 KB of 300 KB',
+                                                      chat_id=self.chat_id, message_id=42)
+        self.assertEqual('Character imported', inline_bot.reply['text'])
+
     def test_link_character_without_params(self):
         # execution
         args = '987654321'
@@ -264,12 +372,27 @@ class TestCharacterHandler(unittest.TestCase):
         self.assertEqual('Invalid command. Usage: /damage <username|character> <hp>', rtn)
 
     def test_set_hp_with_valid_params(self):
+        # conditions
+        self.db.change_char_hp = Mock(return_value=6)
+
         # execution
         rtn = set_hp('/damage', '@foobar 9', self.db, self.chat_id, self.username)
 
         # expected
+        self.db.change_char_hp.assert_called_with(15376426, 9, 6)
         self.assertEqual('Amarok Skullsorrow received 9 pts of damage. HP: 0/6', rtn)
 
+    def test_heal_is_a_negative_change(self):
+        # conditions
+        self.db.change_char_hp = Mock(return_value=0)
+
+        # execution
+        rtn = set_hp('/heal', '@foobar 9', self.db, self.chat_id, self.username)
+
+        # expected
+        self.db.change_char_hp.assert_called_with(15376426, -9, 6)
+        self.assertEqual('Amarok Skullsorrow received 9 pts of heal. HP: 6/6', rtn)
+
     def test_ability_check_with_empty_params(self):
         # execution
         rtn = ability_check('', self.db, self.chat_id, self.username)
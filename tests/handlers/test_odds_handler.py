@@ -0,0 +1,70 @@
+import unittest
+
+from unittest.mock import Mock
+
+from exceptions import InvalidCommand
+from handlers.odds import handler, get_odds
+
+class TestOddsHandler(unittest.TestCase):
+    def setUp(self):
+        self.chat_id = 123456
+        self.username = 'foo'
+        self.character = Mock()
+        self.character.name = 'Amarok Skullsorrow'
+        self.character.mods = {'dex': 1, 'stealth': 3}
+        self.character.proficiency = 2
+
+        self.db = Mock()
+        self.db.get_campaign = Mock(return_value=(666, {}))
+        self.db.get_character_id = Mock(return_value=987654321)
+        self.db.get_character = Mock(return_value=self.character)
+
+    def test_odds(self):
+        # execution
+        rtn = get_odds('1d20+5', self.db, self.chat_id, self.username)
+
+        # expected
+        self.assertEqual(('@foo odds of `1d20+5`:'
+                          '\r\nMean: 15.50 | Min: 6 | Max: 25'
+                          '\r\n10%: 7 | 25%: 10 | 50%: 15 | 75%: 20 | 90%: 23'), rtn)
+        self.db.get_character.assert_not_called()
+
+    def test_odds_vs_dc(self):
+        # execution
+        rtn = get_odds('2d20kh1 vs 11', self.db, self.chat_id, self.username)
+
+        # expected
+        self.assertTrue(rtn.endswith('\r\nChance of 11 or more: 75.00%'))
+
+    def test_odds_with_character_mods(self):
+        # execution
+        rtn = get_odds('1d20 + stealth + prof VS 15', self.db, self.chat_id, self.username)
+
+        # expected
+        self.db.get_character.assert_called_with(987654321, find_by_id=True)
+        self.assertTrue(rtn.startswith('@foo odds of `1d20 + stealth + prof` for Amarok Skullsorrow:\r\nMean: 15.50'))
+        self.assertTrue(rtn.endswith('\r\nChance of 15 or more: 55.00%'))
+
+    def test_odds_with_invalid_dc(self):
+        with self.assertRaises(InvalidCommand):
+            get_odds('1d20 vs hard', self.db, self.chat_id, self.username)
+
+    def test_odds_with_invalid_expression(self):
+        # execution
+        rtn = handler(Mock(), Mock(), '/odds', '1d20 please', self.username, self.chat_id, self.db)
+
+        # expected
+        self.assertTrue(rtn.startswith("foo your request was not a valid equation!"))
+
+    def test_odds_over_the_limits(self):
+        # execution
+        too_many_terms = handler(Mock(), Mock(), '/odds', '1d6+' * 30 + '1d6', self.username, self.chat_id, self.db)
+        too_deep = handler(Mock(), Mock(), '/odds', '(' * 150 + '1d6' + ')' * 150, self.username, self.chat_id, self.db)
+
+        # expected
+        self.assertEqual('foo your request can have up to 20 dice terms!', too_many_terms)
+        self.assertTrue(too_deep.startswith('foo your request is too long!'))
+
+    def test_odds_without_expression(self):
+        self.assertEqual('Invalid syntax. Usage:\r\n/odds <expression> \\[vs DC]',
+                         get_odds('', self.db, self.chat_id, self.username))
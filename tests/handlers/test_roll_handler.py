@@ -2,7 +2,9 @@ import unittest
 
 from unittest.mock import Mock
 
-from handlers.roll import roll, process_notation, roll_one, response, handler
+from exceptions import InvalidDiceExpression
+
+from handlers.roll import roll, response, handler, group_roll, group_table
 
 class TestRoll(unittest.TestCase):
     def setUp(self):
@@ -45,34 +47,123 @@ class TestRoll(unittest.TestCase):
             self.assertTrue(result['1d20'][0] >= 1 and result['1d20'][0] <= 20)
             self.assertTrue(result['1d20'][1] >= 1 and result['1d20'][1] <= 20)
 
-    def test_process_notation(self):
-        for i in range(0, 1000):
-            result = process_notation('1d20', '', '')
-            self.assertTrue(result >= 1 and result <= 20)
+    def test_roll_totals_are_at_least_one(self):
+        # execution
+        result = roll('1d6-10, 3x1d4-8')
 
-        for i in range(0, 1000):
-            result = process_notation('1d20', '+', '5')
-            self.assertTrue(result >= 1 and result <= 25)
+        # expected
+        self.assertEqual({'1d6-10': [1], '3x1d4-8': [1, 1, 1]}, result)
 
-        for i in range(0, 1000):
-            result = process_notation('2d20', '-', '5')
-            self.assertTrue(result >= 1 and result <= 35)
+    def test_roll_expressions(self):
+        # execution
+        result = roll('4d6kh3, {1d6, 1d8}kh1 + 2, 4d6 kh3')
 
-        for i in range(0, 1000):
-            result = process_notation('1d100', '', '')
-            self.assertTrue(result >= 1 and result <= 100)
+        # expected
+        self.assertEqual(['4d6kh3', '{1d6,1d8}kh1+2'], list(result.keys()))
+        self.assertEqual(2, len(result['4d6kh3']))
+        self.assertTrue(3 <= result['{1d6,1d8}kh1+2'][0] <= 10)
 
-        for i in range(0, 1000):
-            result = process_notation('1d%', '', '')
-            self.assertTrue(result >= 1 and result <= 100)
+    def test_roll_invalid_expression(self):
+        # execution
+        self.bot.send_message = Mock()
+        handler(self.bot, self.update, '/roll', '1d20 please', self.username, self.chat_id, self.db)
 
-        with self.assertRaises(Exception):
-            result = process_notation('2d100', '', '')
+        # expected
+        self.bot.send_message.assert_called_with(
+            chat_id=self.chat_id, parse_mode="Markdown",
+            text=("foo your request was not a valid equation! 'please' was not expected. "
+                  "Please use the dice notation (for example: 1d6 to roll a die of 6 sides)"))
 
-    def test_roll_one(self):
-        for i in range(0, 1000):
-            result = roll_one(20)
-            self.assertTrue(result >= 1 and result <= 20)
+    def test_roll_for_a_group(self):
+        # execution
+        result = roll('12x1d20+2, 1d6')
+
+        # expected
+        self.assertEqual(['12x1d20+2', '1d6'], list(result.keys()))
+        self.assertEqual(12, len(result['12x1d20+2']))
+        self.assertTrue(all(3 <= total <= 22 for total in result['12x1d20+2']))
+
+    def test_roll_for_a_group_over_the_limit(self):
+        with self.assertRaises(InvalidDiceExpression):
+            roll('51x1d20')
+        with self.assertRaises(InvalidDiceExpression):
+            roll('50x21d6')
+
+    def test_group_table(self):
+        # execution
+        table = group_table([12, 20, 3, 20, 15, 8, 9, 10, 11, 1])
+
+        # expected
+        self.assertEqual('```\r\n#2  20\r\n#4  20\r\n#5  15\r\n#1  12\r\n#9  11\r\n#8  10\r\n'
+                         '#7   9\r\n#6   8\r\n#3   3\r\n#10  1\r\n```', table)
+
+    def test_group_response(self):
+        # execution
+        rtn = response(self.username, {'2x1d20+2': [5, 17]})
+
+        # expected
+        self.assertEqual('foo rolled:\r\n *2x1d20+2*:\r\n```\r\n#2 17\r\n#1  5\r\n```', rtn)
+
+    def test_group_roll(self):
+        # conditions
+        monster = Mock()
+        monster.name = 'goblin'
+        monster.mods = {'dex': 2, 'stealth': 6}
+        monster.initiative = 2
+        self.db.get_monster_by_name = Mock(return_value=monster)
+
+        # execution
+        rtn = group_roll('goblin 12 stealth', self.db, self.chat_id, self.username)
+
+        # expected
+        self.db.get_monster_by_name.assert_called_with(self.chat_id, 'goblin')
+        self.assertTrue(rtn.startswith('foo rolled stealth for 12 goblin:\r\n *12x1d20+6*:\r\n```'))
+        self.assertEqual(12 + 4, len(rtn.split('\r\n')))
+
+    def test_group_roll_of_a_monster_with_several_words(self):
+        # conditions
+        monster = Mock()
+        monster.name = 'Goblin Boss'
+        monster.mods = {'dex': 2}
+        monster.initiative = 2
+        self.db.get_monster_by_name = Mock(return_value=monster)
+
+        # execution
+        rtn = group_roll('Goblin Boss 4 initiative', self.db, self.chat_id, self.username)
+
+        # expected
+        self.db.get_monster_by_name.assert_called_with(self.chat_id, 'Goblin Boss')
+        self.assertTrue(rtn.startswith('foo rolled initiative for 4 Goblin Boss:\r\n *4x1d20+2*:'))
+
+    def test_group_roll_with_invalid_check(self):
+        # conditions
+        monster = Mock()
+        monster.mods = {'dex': 2}
+        self.db.get_monster_by_name = Mock(return_value=monster)
+
+        # execution
+        rtn = group_roll('goblin 12 luck', self.db, self.chat_id, self.username)
+
+        # expected
+        self.assertEqual('Invalid check. Supported options: initiative, dex', rtn)
+
+    def test_group_roll_without_monster(self):
+        # conditions
+        self.db.get_monster_by_name = Mock(return_value=None)
+
+        # execution
+        rtn = group_roll('goblin 12 dex', self.db, self.chat_id, self.username)
+
+        # expected
+        self.assertEqual("Monster 'goblin' not found in this campaign.", rtn)
+
+    def test_group_roll_handler(self):
+        # execution
+        handler(self.bot, self.update, '/group_roll', 'goblin', self.username, self.chat_id, self.db)
+
+        # expected
+        self.bot.send_message.assert_called_with(chat_id=self.chat_id, parse_mode="Markdown",
+                                                 text='Invalid syntax. Usage:\r\n/group\\_roll <monster> <n> <check>')
 
     def test_response(self):
         pass
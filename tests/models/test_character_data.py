@@ -0,0 +1,51 @@
+import json
+import unittest
+
+from models.character import Character
+from models.character_data import compact_character_data, is_compact, CHARACTER_DATA_VERSION
+
+class TestCharacterData(unittest.TestCase):
+    def setUp(self):
+        with open('tests/fixtures/character.json', 'r') as jd:
+            self.sheet = json.loads(jd.read())
+
+        with open('tests/fixtures/race_data.json', 'r') as rd:
+            self.race_data = json.loads(rd.read())
+
+    def test_projection_builds_the_same_character(self):
+        # execution
+        expected = Character(self.sheet, self.race_data, False)
+        character = Character(compact_character_data(self.sheet), self.race_data, False)
+
+        # expected
+        for attribute in ['name', 'level', 'race', '_class', 'str', 'dex', 'con', 'int', 'wis', 'cha',
+                          'max_hit_points', 'current_hit_points', 'walking_speed', 'hit_dice', 'proficiencies',
+                          'currencies', 'mods', 'spellcasting_ability_mod']:
+            self.assertEqual(getattr(expected, attribute), getattr(character, attribute), attribute)
+        self.assertEqual([w.to_snapshot() for w in expected.weapons], [w.to_snapshot() for w in character.weapons])
+        self.assertEqual([s.to_snapshot() for s in expected.spells], [s.to_snapshot() for s in character.spells])
+
+    def test_projection_is_small(self):
+        # execution
+        data = compact_character_data(self.sheet)
+
+        # expected
+        self.assertLess(len(json.dumps(data)), len(json.dumps(self.sheet)) / 50)
+
+    def test_projection_is_versioned(self):
+        self.assertEqual(CHARACTER_DATA_VERSION, compact_character_data(self.sheet)['version'])
+        self.assertTrue(is_compact(compact_character_data(self.sheet)))
+        self.assertFalse(is_compact(self.sheet))
+
+    def test_state_is_kept(self):
+        # conditions
+        state = compact_character_data(self.sheet)
+        state['character']['removedHitPoints'] = 3
+        state['character']['classes'][0]['level'] = 2
+
+        # execution
+        data = compact_character_data(self.sheet, state=state)
+
+        # expected
+        self.assertEqual(3, data['character']['removedHitPoints'])
+        self.assertEqual(2, data['character']['classes'][0]['level'])
@@ -70,6 +70,67 @@ class TestCharacterModel(unittest.TestCase):
         self.assertTrue(rtn)
         self.assertEqual(self.character.currencies['cp'], 35)
 
+    def test_snapshot_round_trip(self):
+        # conditions
+        with open('tests/fixtures/character.json', 'r') as jd:
+            json_data = json.loads(jd.read())
+
+        # execution
+        snapshot = json.loads(json.dumps(self.character.to_snapshot()))
+        character = Character.from_snapshot(snapshot, json_data)
+
+        # expected
+        self.assertEqual(self.character.to_snapshot(), character.to_snapshot())
+        for attribute in ['name', 'level', 'str', 'mods', 'max_hit_points', 'current_hit_points', 'proficiencies']:
+            self.assertEqual(getattr(self.character, attribute), getattr(character, attribute))
+        self.assertEqual(self.character.currencies, character.currencies)
+
+    def test_no_instance_dict(self):
+        for obj in [self.character] + self.character.weapons + self.character.armor + self.character.spells:
+            self.assertFalse(hasattr(obj, '__dict__'), type(obj).__name__)
+
+    def test_items_are_built_when_used(self):
+        # conditions
+        with open('tests/fixtures/character.json', 'r') as jd:
+            json_data = json.loads(jd.read())
+        snapshot = json.loads(json.dumps(self.character.to_snapshot()))
+
+        # execution
+        with patch('models.character.Weapon') as weapon, patch('models.character.Spell') as spell:
+            character = Character(json_data, {'ability_bonuses': [0, 0, 0, 0, 0, 0]}, False)
+            from_snapshot = Character.from_snapshot(snapshot, json_data)
+            character.max_hit_points, from_snapshot.max_hit_points
+
+        # expected
+        weapon.assert_not_called()
+        weapon.from_snapshot.assert_not_called()
+        spell.assert_not_called()
+        spell.from_snapshot.assert_not_called()
+        self.assertEqual(6, len(character.weapons))
+        self.assertEqual(6, len(from_snapshot.weapons))
+        self.assertEqual(4, len(from_snapshot.spells))
+
+    def test_get_weapon_by_prefix(self):
+        self.assertEqual('quarterstaff', self.character.get_weapon('quarter').name)
+        self.assertIsNone(self.character.get_weapon('d'))
+
+    def test_get_spell_with_typo(self):
+        self.assertEqual('fire-bolt', self.character.get_spell('fire-blot').name)
+
+    def test_snapshot_spell_damages_stored_as_array(self):
+        # conditions
+        spell = self.character.spells[0].to_snapshot()
+        spell['damages'] = [None, '1d10']
+
+        # execution
+        snapshot = self.character.to_snapshot()
+        snapshot['spells'] = [spell]
+        with open('tests/fixtures/character.json', 'r') as jd:
+            character = Character.from_snapshot(snapshot, json.loads(jd.read()))
+
+        # expected
+        self.assertEqual({1: '1d10'}, character.spells[0].damages)
+
     def __get_character(self):
         with open('tests/fixtures/character.json', 'r') as jd:
             json_data = json.loads(jd.read())
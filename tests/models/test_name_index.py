@@ -0,0 +1,35 @@
+import unittest
+
+from unittest.mock import Mock
+from models.name_index import NameIndex
+
+class TestNameIndex(unittest.TestCase):
+    def setUp(self):
+        self.items = [Mock(), Mock(), Mock(), Mock(), Mock()]
+        for item, name in zip(self.items, ['dagger', 'dagger', 'dart', 'longsword', 'longbow']):
+            item.name = name
+        self.index = NameIndex(self.items)
+
+    def test_exact_match(self):
+        self.assertIs(self.items[2], self.index.find('dart'))
+
+    def test_exact_match_is_snake_case(self):
+        self.assertIs(self.items[2], self.index.find('Dart'))
+
+    def test_first_item_with_the_same_name(self):
+        self.assertIs(self.items[0], self.index.find('dagger'))
+
+    def test_unique_prefix(self):
+        self.assertIs(self.items[3], self.index.find('longs'))
+        self.assertIs(self.items[0], self.index.find('dag'))
+
+    def test_ambiguous_prefix(self):
+        self.assertIsNone(self.index.find('long'))
+        self.assertIsNone(self.index.find('d'))
+
+    def test_typo(self):
+        self.assertIs(self.items[3], self.index.find('lonsgword'))
+        self.assertIs(self.items[0], self.index.find('dagegr'))
+
+    def test_no_match(self):
+        self.assertIsNone(self.index.find('halberd'))
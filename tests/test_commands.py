@@ -1,7 +1,8 @@
 import unittest
 
-from unittest.mock import Mock
-from commands import parse_command, is_command
+from unittest.mock import Mock, patch
+from commands import parse_command, is_command, command_handler, import_times, LazyHandler
+from exceptions import CommandNotFound
 
 class TestCommands(unittest.TestCase):
 
@@ -28,3 +29,31 @@ class TestCommands(unittest.TestCase):
         update.message.text = "foobar"
         self.assertEqual(False, is_command(update))
 
+    def test_command_handler_loads_handler_module(self):
+        from handlers.roll import handler as roll_handler
+
+        self.assertEqual(roll_handler, command_handler('/roll'))
+
+    def test_command_handler_with_unknown_command(self):
+        with self.assertRaises(CommandNotFound):
+            command_handler('/foobar')
+
+    def test_lazy_handler_imports_on_first_call(self):
+        # conditions
+        lazy = LazyHandler('utils', 'normalized_username')
+
+        # execution
+        rtn = lazy('@foo')
+
+        # expected
+        self.assertEqual('foo', rtn)
+        self.assertIsNotNone(lazy._handler)
+
+    def test_import_times(self):
+        # execution
+        with patch('commands.ALL_COMMANDS', {'/dm': (LazyHandler('handlers.dm'), None)}):
+            times = dict(import_times())
+
+        # expected
+        self.assertEqual({'main', 'commands', 'handlers.dm'}, set(times))
+        self.assertGreater(times['handlers.dm'], 0)
@@ -0,0 +1,239 @@
+import unittest
+
+from unittest.mock import patch, Mock
+
+import database
+from database import Database
+
+CHAT_ID = 123456
+CAMPAIGN_ID = '-Lcampaign'
+
+class TestDatabase(unittest.TestCase):
+    def setUp(self):
+        patcher = patch('database.firebase.FirebaseApplication')
+        self.addCleanup(patcher.stop)
+        self.firebase_db = patcher.start().return_value
+        self.data = {
+            '/chat_campaigns': {str(CHAT_ID): CAMPAIGN_ID},
+            '/campaigns': {CAMPAIGN_ID: {'active': True, 'chat_id': CHAT_ID, 'turn_index': 0}}
+        }
+        self.firebase_db.get = Mock(side_effect=self.__get)
+        database._campaigns_directory_ready = False
+
+        self.db = Database()
+        self.firebase_db.get.reset_mock()
+
+    def __get(self, path, name, connection=None, params=None):
+        node = self.data.get(path, None)
+        return node.get(name, None) if name is not None and node is not None else node
+
+    def test_campaigns_directory_is_checked_once_per_process(self):
+        # execution
+        Database()
+
+        # expected
+        self.firebase_db.get.assert_not_called()
+
+    def test_get_campaign_outside_unit_of_work(self):
+        # execution
+        self.db.get_campaign(CHAT_ID)
+        self.db.get_campaign(CHAT_ID)
+
+        # expected
+        self.assertEqual(4, self.firebase_db.get.call_count)
+
+    def test_get_campaign_uses_chat_index(self):
+        # execution
+        campaign_id, campaign = self.db.get_campaign(CHAT_ID)
+
+        # expected
+        self.firebase_db.get.assert_any_call('/chat_campaigns', str(CHAT_ID), connection=database.get_session(), params={'auth': None})
+        self.firebase_db.get.assert_called_with('/campaigns', CAMPAIGN_ID, connection=database.get_session(), params={'auth': None})
+        self.assertEqual(CAMPAIGN_ID, campaign_id)
+
+    def test_get_campaign_without_index_entry(self):
+        # conditions
+        self.data['/chat_campaigns'] = {}
+
+        # execution
+        rtn = self.db.get_campaign(CHAT_ID)
+
+        # expected
+        self.assertEqual((None, None), rtn)
+        self.assertEqual(1, self.firebase_db.get.call_count)
+
+    def test_create_campaign_indexes_it(self):
+        # conditions
+        self.firebase_db.post = Mock(return_value={'name': '-Lnew'})
+
+        # execution
+        self.db.create_campaign(CHAT_ID, 'Lost Mine')
+
+        # expected
+        self.firebase_db.put.assert_called_with('/chat_campaigns', str(CHAT_ID), '-Lnew', connection=database.get_session(), params={'auth': None})
+
+    def test_get_campaign_inside_unit_of_work(self):
+        # execution
+        with self.db.unit_of_work():
+            campaign_id, campaign = self.db.get_campaign(CHAT_ID)
+            self.db.get_campaign(str(CHAT_ID))
+
+        # expected
+        self.assertEqual(CAMPAIGN_ID, campaign_id)
+        self.assertEqual(2, self.firebase_db.get.call_count)
+
+    def test_writes_update_the_cached_campaign(self):
+        # execution
+        with self.db.unit_of_work():
+            self.db.get_campaign(CHAT_ID)
+            self.db.set_turn_index(CAMPAIGN_ID, 3)
+            campaign_id, campaign = self.db.get_campaign(CHAT_ID)
+
+        # expected
+        self.assertEqual(3, campaign['turn_index'])
+        self.assertEqual(2, self.firebase_db.get.call_count)
+
+    def test_closing_campaign_forgets_it(self):
+        # execution
+        with self.db.unit_of_work():
+            self.db.get_campaign(CHAT_ID)
+            self.db.close_campaign(CAMPAIGN_ID)
+            self.db.get_campaign(CHAT_ID)
+
+        # expected
+        self.firebase_db.patch.assert_called_with('/', {f'campaigns/{CAMPAIGN_ID}/active': False,
+                                                        f'chat_campaigns/{CHAT_ID}': None}, connection=database.get_session(), params={'auth': None})
+        self.assertEqual(4, self.firebase_db.get.call_count)
+
+    def test_backfill_chat_campaigns(self):
+        # conditions
+        self.data['/campaigns']['-Lclosed'] = {'active': False, 'chat_id': 42}
+        self.data['/campaigns']['-Lother'] = {'active': True, 'chat_id': 42}
+
+        # execution
+        rtn = self.db.backfill_chat_campaigns()
+
+        # expected
+        self.assertEqual(2, rtn)
+        self.firebase_db.patch.assert_called_with('/chat_campaigns', {str(CHAT_ID): CAMPAIGN_ID, '42': '-Lother'},
+                                                  connection=database.get_session(), params={'auth': None})
+
+    def test_character_link_is_cached(self):
+        # conditions
+        self.data[f'/campaigns/{CAMPAIGN_ID}/characters'] = {'foo': '777'}
+
+        # execution
+        with self.db.unit_of_work():
+            self.db.get_character_id(CAMPAIGN_ID, 'foo')
+            character_id = self.db.get_character_id(CAMPAIGN_ID, 'foo')
+
+        # expected
+        self.assertEqual('777', character_id)
+        self.assertEqual(1, self.firebase_db.get.call_count)
+
+    def test_set_character_link_indexes_the_name(self):
+        # conditions
+        self.data['/characters/777/character'] = {'name': 'Amarok Skullsorrow'}
+
+        # execution
+        self.db.set_character_link(CAMPAIGN_ID, 'Foo', '777')
+
+        # expected
+        self.firebase_db.patch.assert_called_with('/', {
+            f'campaigns/{CAMPAIGN_ID}/characters/Foo': '777',
+            f'campaigns/{CAMPAIGN_ID}/character_names/amarok-skullsorrow': '777',
+            f'campaigns/{CAMPAIGN_ID}/character_names/amarok': '777'
+        }, connection=database.get_session(), params={'auth': None})
+
+    def test_relink_removes_the_names_of_the_previous_character(self):
+        # conditions
+        self.data[f'/campaigns/{CAMPAIGN_ID}'] = {
+            'characters': {'Foo': '666'},
+            'character_names': {'boris-the-blade': '666', 'boris': '666'}
+        }
+        self.data['/characters/777/character'] = {'name': 'Amarok'}
+
+        # execution
+        self.db.set_character_link(CAMPAIGN_ID, 'Foo', '777')
+
+        # expected
+        self.firebase_db.patch.assert_called_with('/', {
+            f'campaigns/{CAMPAIGN_ID}/characters/Foo': '777',
+            f'campaigns/{CAMPAIGN_ID}/character_names/boris-the-blade': None,
+            f'campaigns/{CAMPAIGN_ID}/character_names/boris': None,
+            f'campaigns/{CAMPAIGN_ID}/character_names/amarok': '777'
+        }, connection=database.get_session(), params={'auth': None})
+
+    def test_get_character_id_by_name(self):
+        # conditions
+        self.data[f'/campaigns/{CAMPAIGN_ID}/character_names'] = {'amarok': '777'}
+
+        # execution
+        rtn = self.db.get_character_id(CAMPAIGN_ID, 'Amarok')
+
+        # expected
+        self.assertEqual('777', rtn)
+
+    def test_get_character_id_prefers_the_username(self):
+        # conditions
+        self.data[f'/campaigns/{CAMPAIGN_ID}/characters'] = {'bob': '777'}
+        self.data[f'/campaigns/{CAMPAIGN_ID}/character_names'] = {'bob': '666'}
+
+        # execution
+        rtn = self.db.get_character_id(CAMPAIGN_ID, 'bob')
+
+        # expected
+        self.assertEqual('777', rtn)
+        self.assertEqual(1, self.firebase_db.get.call_count)
+
+    def test_rebuild_character_names(self):
+        # conditions
+        self.data['/campaigns'][CAMPAIGN_ID]['characters'] = {'alice': '1', 'bob': '2'}
+        self.data[f'/campaigns/{CAMPAIGN_ID}'] = self.data['/campaigns'][CAMPAIGN_ID]
+        self.data['/characters/1/character'] = {'name': 'John Smith'}
+        self.data['/characters/2/character'] = {'name': 'John Doe'}
+
+        # execution
+        rtn = self.db.rebuild_character_names()
+
+        # expected
+        self.assertEqual(2, rtn)
+        self.firebase_db.patch.assert_called_with(f'/campaigns/{CAMPAIGN_ID}', {
+            'character_names': {'john-smith': '1', 'john': '#ambiguous', 'john-doe': '2'},
+            'character_index': None
+        }, connection=database.get_session(), params={'auth': None})
+
+    def test_writes_of_a_unit_of_work_are_sent_together(self):
+        # execution
+        with self.db.unit_of_work():
+            self.db.set_char_xp('777', xp=326)
+            self.db.set_char_level('777', level=2)
+            self.firebase_db.patch.assert_not_called()
+
+        # expected
+        self.firebase_db.patch.assert_called_once_with('/', {
+            'characters/777/character/currentXp': 326,
+            'characters/777/character/classes/0/level': 2,
+            'characters/777/snapshot': None
+        }, connection=database.get_session(), params={'auth': None})
+
+    def test_writes_are_discarded_when_the_command_fails(self):
+        # execution
+        with self.assertRaises(ValueError):
+            with self.db.unit_of_work():
+                self.db.set_char_hp('777', hit_points=3)
+                raise ValueError
+
+        # expected
+        self.firebase_db.patch.assert_not_called()
+
+    def test_nested_writes_are_merged(self):
+        # execution
+        with self.db.unit_of_work():
+            self.db.start_battle(CAMPAIGN_ID, {'width': 10, 'heigth': 10})
+            self.db.set_battle_positions(CAMPAIGN_ID, {'foo': 'A1'})
+
+        # expected
+        self.firebase_db.patch.assert_called_once_with('/', {
+            f'campaigns/{CAMPAIGN_ID}/battle_field': {'width': 10, 'heigth': 10, 'positions': {'foo': 'A1'}}
+        }, connection=database.get_session(), params={'auth': None})
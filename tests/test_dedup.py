@@ -0,0 +1,92 @@
+import unittest
+
+from unittest.mock import Mock
+from dedup import UpdateDeduplicator
+
+class TestUpdateDeduplicator(unittest.TestCase):
+
+    def test_new_update(self):
+        deduplicator = UpdateDeduplicator()
+
+        self.assertFalse(deduplicator.is_duplicate(1))
+
+    def test_redelivered_update(self):
+        deduplicator = UpdateDeduplicator()
+        deduplicator.is_duplicate(1)
+
+        self.assertTrue(deduplicator.is_duplicate(1))
+
+    def test_window_is_bounded(self):
+        # conditions
+        deduplicator = UpdateDeduplicator(window=2)
+
+        # execution
+        for update_id in range(1, 4):
+            deduplicator.is_duplicate(update_id)
+
+        # expected
+        self.assertEqual([2, 3], list(deduplicator.seen.keys()))
+        self.assertFalse(deduplicator.is_duplicate(1))
+
+    def test_update_claimed_by_another_container(self):
+        # conditions
+        store = Mock()
+        store.claim_update = Mock(return_value=False)
+        deduplicator = UpdateDeduplicator(window=10, store=store)
+
+        # execution
+        rtn = deduplicator.is_duplicate(1)
+
+        # expected
+        store.claim_update.assert_called_with(1, 10)
+        self.assertTrue(rtn)
+
+    def test_store_is_not_asked_for_known_updates(self):
+        # conditions
+        store = Mock()
+        store.claim_update = Mock(return_value=True)
+        deduplicator = UpdateDeduplicator(store=store)
+
+        # execution
+        deduplicator.is_duplicate(1)
+        deduplicator.is_duplicate(1)
+
+        # expected
+        store.claim_update.assert_called_once_with(1, 1000)
+
+    def test_store_errors_do_not_drop_updates(self):
+        # conditions
+        store = Mock()
+        store.claim_update = Mock(side_effect=Exception('timeout'))
+        deduplicator = UpdateDeduplicator(store=store)
+
+        # expected
+        self.assertFalse(deduplicator.is_duplicate(1))
+
+    def test_released_update_is_processed_again(self):
+        # conditions
+        store = Mock()
+        store.claim_update = Mock(return_value=True)
+        deduplicator = UpdateDeduplicator(store=store)
+        deduplicator.is_duplicate(1)
+
+        # execution
+        deduplicator.release(1)
+
+        # expected
+        store.release_update.assert_called_with(1)
+        self.assertFalse(deduplicator.is_duplicate(1))
+
+    def test_store_errors_do_not_stop_the_release(self):
+        # conditions
+        store = Mock()
+        store.claim_update = Mock(return_value=True)
+        store.release_update = Mock(side_effect=Exception('timeout'))
+        deduplicator = UpdateDeduplicator(store=store)
+        deduplicator.is_duplicate(1)
+
+        # execution
+        deduplicator.release(1)
+
+        # expected
+        self.assertEqual([], list(deduplicator.seen.keys()))
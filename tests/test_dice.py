@@ -0,0 +1,171 @@
+import sys
+import unittest
+
+from unittest.mock import Mock, patch
+
+import dice
+from exceptions import InvalidDiceExpression
+from models.character import SKILLS
+
+class FakeRandom:
+    """A random number generator whose dice roll values in order."""
+    def __init__(self, values):
+        self.values = list(values)
+
+    def choices(self, population, k):
+        values, self.values = self.values[:k], self.values[k:]
+        return values
+
+def rng(*values):
+    return FakeRandom(values)
+
+class TestDice(unittest.TestCase):
+    def test_arithmetic(self):
+        # execution
+        expression = dice.compile_expression('2d6+3*(1d4-1)/2')
+
+        # expected
+        self.assertEqual(5 + 6 + (3 * (4 - 1)) // 2, expression.roll(rng(5, 6, 4)))
+
+    def test_percentile(self):
+        # execution
+        expression = dice.compile_expression('1d%')
+
+        # expected
+        self.assertEqual(100, expression.sides)
+
+    def test_keep_and_drop(self):
+        self.assertEqual(15, dice.compile_expression('4d6kh3').roll(rng(1, 5, 6, 4)))
+        self.assertEqual(3, dice.compile_expression('2d20kl1').roll(rng(17, 3)))
+        self.assertEqual(15, dice.compile_expression('4d6dl1').roll(rng(1, 5, 6, 4)))
+        self.assertEqual(3, dice.compile_expression('2d20dh1').roll(rng(17, 3)))
+
+    def test_exploding_dice(self):
+        self.assertEqual(6 + 6 + 2 + 3, dice.compile_expression('2d6!').roll(rng(6, 6, 2, 3)))
+        self.assertEqual(5 + 1 + 2, dice.compile_expression('2d6!>5').roll(rng(5, 1, 2)))
+
+    def test_explosions_are_limited(self):
+        # execution
+        total = dice.compile_expression('1d6!').roll(rng(*[6] * (dice.MAX_EXPLOSIONS + 1)))
+
+        # expected
+        self.assertEqual(6 * (dice.MAX_EXPLOSIONS + 1), total)
+
+    def test_rerolls(self):
+        self.assertEqual(2 + 4, dice.compile_expression('2d6r1').roll(rng(1, 1, 2, 4)))
+        self.assertEqual(3 + 4, dice.compile_expression('2d6r<2').roll(rng(1, 2, 3, 4)))
+        self.assertEqual(1 + 4, dice.compile_expression('2d6ro1').roll(rng(1, 1, 4)))
+
+    def test_group(self):
+        # execution
+        expression = dice.compile_expression('{2d6, 1d8+2}kh1')
+
+        # expected
+        self.assertEqual(9, expression.roll(rng(1, 2, 7)))
+        self.assertEqual('{2d6,1d8+2}kh1', str(expression))
+
+    def test_names(self):
+        # execution
+        expression = dice.compile_expression('1d20+dex-str')
+        skill = dice.compile_expression('1d20+sleight-of-hand-1')
+
+        # expected
+        self.assertEqual(('dex', 'str'), expression.names())
+        self.assertEqual(('sleight-of-hand',), skill.names())
+        self.assertTrue(3 <= expression.bind({'dex': 3, 'str': 1}).roll() <= 22)
+        self.assertTrue(5 <= skill.bind({'sleight-of-hand': 5}).roll() <= 24)
+
+    def test_hyphenated_names_are_the_skills(self):
+        skills = [skill for skills in SKILLS.values() for skill in skills if '-' in skill]
+        self.assertEqual(sorted(skills), sorted(dice.HYPHENATED_NAMES))
+
+    def test_compiled_expressions_are_cached(self):
+        self.assertIs(dice.compile_expression('3d8+2'), dice.compile_expression('3d8+2'))
+
+    def test_add(self):
+        self.assertEqual('1d20+0', str(dice.add(dice.D20, 0)))
+        self.assertEqual('1d20-1', str(dice.add(dice.D20, -1)))
+        self.assertIs(dice.add(dice.D20, 3), dice.add(dice.D20, 3))
+
+    def test_split(self):
+        self.assertEqual(['1d20+2', '{1d6, 1d8}kh1'], dice.split('1d20+2, {1d6, 1d8}kh1,'))
+
+    def test_invalid_expressions(self):
+        for text in ['', '1d20x', '1d20+', '(1d4', '1d4)', 'd', '1d0', '1001d6', '5d6kh6', '1d6r<6', '1d6!>1']:
+            with self.assertRaises(InvalidDiceExpression, msg=text):
+                dice.compile_expression(text)
+
+    def test_long_expressions(self):
+        for text in ['(' * 1000 + '1d6' + ')' * 1000, '-' * 3000 + '1d6', '1+' * 5000 + '1']:
+            with self.assertRaises(InvalidDiceExpression):
+                dice.compile_expression(text)
+
+    def test_deepest_expressions_are_rolled(self):
+        for text in ['(' * 98 + '1d6' + ')' * 98, '-' * 197 + '1d6', '1+' * 98 + '1d6']:
+            # execution
+            expression = dice.compile_expression(text)
+
+            # expected
+            self.assertTrue(-6 <= expression.roll() <= 105)
+            self.assertNotEqual('', str(expression))
+
+    def test_rolls_stay_in_range(self):
+        for text, lowest, highest in [('1d20', 1, 20), ('1d20+5', 6, 25), ('2d20-5', -3, 35), ('1d100', 1, 100), ('1d%', 1, 100)]:
+            expression = dice.compile_expression(text)
+            for i in range(0, 1000):
+                self.assertTrue(lowest <= expression.roll() <= highest, msg=text)
+
+    def test_exact_sampler(self):
+        # conditions
+        random = Mock(randrange=Mock(return_value=0))
+
+        # execution
+        with patch('dice.EXACT_SAMPLER_MIN_DICE', 2):
+            lowest = dice.compile_expression('3d6').roll(random)
+            random.randrange = Mock(return_value=6 ** 3 - 1)
+            highest = dice.compile_expression('3d6').roll(random)
+
+        # expected
+        self.assertEqual(3, lowest)
+        self.assertEqual(18, highest)
+
+    def test_sum_distribution(self):
+        self.assertEqual([1, 3, 6, 10, 15, 21, 26, 30, 33, 35, 36], dice.sum_distribution(2, 6))
+
+    def test_exact_sampler_is_not_used_for_big_distributions(self):
+        self.assertTrue(dice.use_exact_sampler(dice.EXACT_SAMPLER_MIN_DICE, 6))
+        self.assertTrue(dice.use_exact_sampler(100, 6))
+        self.assertFalse(dice.use_exact_sampler(999, 999))
+        self.assertFalse(dice.use_exact_sampler(100, 20))
+        self.assertFalse(dice.use_exact_sampler(50, 400))
+        self.assertFalse(dice.use_exact_sampler(dice.EXACT_SAMPLER_MIN_DICE - 1, 6))
+
+    def test_distribution_size(self):
+        # execution
+        table = dice.sum_distribution(50, 20)
+
+        # expected
+        size = sum(sys.getsizeof(ways) for ways in table)
+        self.assertLess(abs(dice.distribution_size(50, 20) - size), size // 5)
+
+    def test_limits(self):
+        # conditions
+        expressions = [dice.compile_expression('500d6'), dice.compile_expression('501d6')]
+
+        # execution / expected
+        with self.assertRaises(InvalidDiceExpression):
+            dice.check_limits(expressions)
+        with self.assertRaises(InvalidDiceExpression):
+            dice.check_limits([dice.compile_expression('1d6')] * (dice.MAX_TERMS + 1))
+        dice.check_limits(expressions[:1] * 2)
+
+    def test_roll_many(self):
+        # execution
+        totals = dice.compile_expression('2d6+1').roll_many(3, rng(1, 2, 3, 4, 5, 6))
+
+        # expected
+        self.assertEqual([4, 8, 12], totals)
+
+    def test_division_by_zero(self):
+        with self.assertRaises(InvalidDiceExpression):
+            dice.compile_expression('1d6/0').roll()
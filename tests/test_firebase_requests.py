@@ -0,0 +1,539 @@
+import json
+import requests
+import unittest
+
+from unittest.mock import patch, Mock
+
+import database
+from database import Database
+from tests.firebase_fake import FakeFirebaseApplication
+from handlers.turns import handler as turns_handler
+from handlers.character import handler as character_handler
+from handlers.adventure.handlers import handler as adventure_handler
+from handlers.monster.handlers import handler as monster_handler
+from handlers.npc.handlers import handler as npc_handler
+from handlers.roll import group_roll
+from handlers.dm import handler as dm_handler
+from models.adventure import Adventure
+from exceptions import ConcurrentUpdate, EntityExists
+from models.character import Character, CHARACTER_SCHEMA_VERSION
+from models.character_data import compact_character_data, CHARACTER_DATA_VERSION
+
+CHAT_ID = 123456
+CAMPAIGN_ID = '-Lcampaign'
+CHARACTER_ID = '15376426'
+FIREBASE_DB_URL = 'https://fake.firebaseio.com'
+
+class TestFakeFirebase(unittest.TestCase):
+    def setUp(self):
+        self.firebase = FakeFirebaseApplication()
+        self.firebase.load({
+            'campaigns': {
+                '-La': {'chat_id': 1, 'active': True, 'name': 'a'},
+                '-Lb': {'chat_id': 2, 'active': False, 'name': 'b'}
+            }
+        })
+
+    def test_shallow_get(self):
+        # execution
+        rtn = self.firebase.get('/campaigns', None, params={'shallow': 'true'})
+
+        # expected
+        self.assertEqual({'-La': True, '-Lb': True}, rtn)
+
+    def test_order_by_equal_to(self):
+        # execution
+        rtn = self.firebase.get('/campaigns', None, params={'orderBy': '"chat_id"', 'equalTo': '2'})
+
+        # expected
+        self.assertEqual(['-Lb'], list(rtn.keys()))
+
+    def test_post_returns_the_new_key(self):
+        # execution
+        rtn = self.firebase.post('/campaigns', {'chat_id': 3})
+
+        # expected
+        self.assertEqual({'chat_id': 3}, self.firebase.get('/campaigns', rtn['name']))
+
+    def test_multi_location_patch(self):
+        # execution
+        self.firebase.patch('/', {'campaigns/-La/active': False, 'campaigns/-Lb': None})
+
+        # expected
+        self.assertEqual({'-La': {'chat_id': 1, 'active': False, 'name': 'a'}}, self.firebase.dump()['campaigns'])
+
+    def test_overlapping_patch_is_rejected(self):
+        with self.assertRaises(Exception):
+            self.firebase.patch('/', {'campaigns/-La': {}, 'campaigns/-La/active': False})
+
+    def test_requests_are_counted(self):
+        # execution
+        self.firebase.get('/campaigns', '-La')
+        self.firebase.put('/campaigns/-La', 'name', 'c')
+
+        # expected
+        self.assertEqual(2, self.firebase.request_count)
+        self.assertEqual(1, self.firebase.count('PUT'))
+        self.assertEqual(len('"c"'), self.firebase.bytes_sent)
+        self.assertEqual(len('{"chat_id": 1, "active": true, "name": "a"}') + len('"c"'), self.firebase.bytes_received)
+
+
+class TestCommandRequests(unittest.TestCase):
+    """Round trips to Firebase made by each command, to catch regressions in the request pattern."""
+
+    def setUp(self):
+        with open('tests/fixtures/character.json', 'r') as jd:
+            character_data = json.loads(jd.read())
+        with open('tests/fixtures/race_data.json', 'r') as rd:
+            race_data = json.loads(rd.read())
+        race_patcher = patch('storage.get_race_data', return_value=race_data)
+        self.addCleanup(race_patcher.stop)
+        self.get_race_data = race_patcher.start()
+
+        # A character as stored after its first load: projection of the sheet plus snapshot
+        stored_character = compact_character_data(character_data)
+        stored_character['snapshot'] = Character(stored_character, race_data, False).to_snapshot()
+
+        patcher = patch('database.firebase.FirebaseApplication', FakeFirebaseApplication)
+        self.addCleanup(patcher.stop)
+        patcher.start()
+        url_patcher = patch('database.FIREBASE_DB_URL', FIREBASE_DB_URL)
+        self.addCleanup(url_patcher.stop)
+        url_patcher.start()
+        database._campaigns_directory_ready = False
+
+        self.db = Database()
+        self.firebase = self.db.firebase_db
+
+        session = requests.Session()
+        session.mount(FIREBASE_DB_URL, self.firebase.adapter())
+        session_patcher = patch('database.get_session', return_value=session)
+        self.addCleanup(session_patcher.stop)
+        session_patcher.start()
+        self.firebase.load({
+            'chat_campaigns': {str(CHAT_ID): CAMPAIGN_ID},
+            'campaigns': {
+                CAMPAIGN_ID: {
+                    'active': True,
+                    'chat_id': CHAT_ID,
+                    'dm_username': 'dm',
+                    'turns': ['foo', 'bar'],
+                    'turn_index': 0,
+                    'characters': {'foo': CHARACTER_ID}
+                }
+            },
+            'characters': {CHARACTER_ID: stored_character},
+            'character_sheets': {CHARACTER_ID: character_data}
+        })
+        self.firebase.reset_stats()
+        self.bot = Mock()
+
+    def run_command(self, handler, command, txt_args, username):
+        with self.db.unit_of_work():
+            handler(self.bot, Mock(), command, txt_args, username, CHAT_ID, self.db)
+
+    def test_turn(self):
+        # execution
+        self.run_command(turns_handler, '/turn', '', 'foo')
+
+        # expected
+        self.assertEqual(2, self.firebase.request_count)
+        self.assertEqual(2, self.firebase.count('GET'))
+
+    def test_next_turn(self):
+        # execution
+        self.run_command(turns_handler, '/next_turn', '', 'foo')
+
+        # expected
+        self.assertEqual(4, self.firebase.request_count)
+        self.assertEqual(1, self.firebase.count('PUT'))
+        self.assertEqual(1, self.firebase.dump()['campaigns'][CAMPAIGN_ID]['turn_index'])
+
+    def test_concurrent_next_turns_are_not_lost(self):
+        # conditions
+        change_turn_index = self.db.change_turn_index
+        def next_turn_from_another_chat_member(campaign_id, diff):
+            # the other command reads the same turn_index and writes it while this one is running
+            self.firebase.put(f'/campaigns/{CAMPAIGN_ID}', 'turn_index', 1)
+            return change_turn_index(campaign_id, diff)
+        self.db.change_turn_index = next_turn_from_another_chat_member
+
+        # execution
+        self.run_command(turns_handler, '/next_turn', '', 'foo')
+
+        # expected
+        self.assertEqual(2, self.firebase.dump()['campaigns'][CAMPAIGN_ID]['turn_index'])
+        self.bot.send_message.assert_called_with(chat_id=CHAT_ID, text='Next in line is foo', parse_mode='Markdown')
+
+    def test_damage(self):
+        # execution
+        self.run_command(character_handler, '/damage', 'foo 3', 'dm')
+
+        # expected
+        self.assertEqual(6, self.firebase.request_count)
+        self.assertEqual(1, self.firebase.count('PUT'))
+        self.assertEqual(3, self.firebase.dump()['characters'][CHARACTER_ID]['character']['removedHitPoints'])
+
+    def test_character_reads_the_projection(self):
+        # execution
+        self.run_command(character_handler, '/status', '', 'foo')
+
+        # expected
+        character_read = self.firebase.requests[-1]
+        self.assertEqual(f'/characters/{CHARACTER_ID}', character_read['path'])
+        self.assertLess(character_read['received'], 10000)
+
+    def test_character_is_built_from_the_snapshot(self):
+        # execution
+        character = self.db.get_character(CHARACTER_ID)
+
+        # expected
+        self.get_race_data.assert_not_called()
+        self.assertEqual('Amarok Skullsorrow', character.name)
+        self.assertEqual(6, len(character.weapons))
+
+    def test_snapshot_is_written_on_first_load(self):
+        # conditions
+        data = self.firebase.dump()
+        del data['characters'][CHARACTER_ID]['snapshot']
+        self.firebase.load(data)
+
+        # execution
+        with self.db.unit_of_work():
+            self.db.get_character(CHARACTER_ID)
+
+        # expected
+        snapshot = self.firebase.dump()['characters'][CHARACTER_ID]['snapshot']
+        self.assertEqual(CHARACTER_SCHEMA_VERSION, snapshot['schema'])
+
+    def test_snapshot_is_kept_when_the_level_does_not_change(self):
+        # execution
+        self.run_command(dm_handler, '/add_xp', '@foo 10', 'dm')
+
+        # expected
+        stored = self.firebase.dump()['characters'][CHARACTER_ID]
+        self.assertEqual(35, stored['character']['currentXp'])
+        self.assertIn('snapshot', stored)
+
+    def test_snapshot_is_dropped_when_the_level_changes(self):
+        # execution
+        self.run_command(dm_handler, '/add_xp', '@foo 301', 'dm')
+
+        # expected
+        stored = self.firebase.dump()['characters'][CHARACTER_ID]
+        self.assertEqual(2, stored['character']['classes'][0]['level'])
+        self.assertNotIn('snapshot', stored)
+
+    def test_snapshot_of_an_older_schema_is_ignored(self):
+        # conditions
+        self.firebase.put(f'/characters/{CHARACTER_ID}/snapshot', 'schema', CHARACTER_SCHEMA_VERSION - 1)
+
+        # execution
+        self.db.get_character(CHARACTER_ID)
+
+        # expected
+        self.get_race_data.assert_called_once()
+        self.assertEqual(CHARACTER_SCHEMA_VERSION, self.firebase.dump()['characters'][CHARACTER_ID]['snapshot']['schema'])
+
+    def test_state_is_read_from_the_character_data(self):
+        # conditions
+        self.firebase.put(f'/characters/{CHARACTER_ID}/character', 'removedHitPoints', 2)
+
+        # execution
+        character = self.db.get_character(CHARACTER_ID)
+
+        # expected
+        self.assertEqual(2, character.removed_hit_points)
+        self.assertEqual(character.max_hit_points - 2, character.current_hit_points)
+
+    def test_import_stores_the_projection_and_the_sheet(self):
+        # conditions
+        sheet = self.firebase.dump()['character_sheets'][CHARACTER_ID]
+        self.firebase.load({})
+
+        # execution
+        self.db.save_character_info(CHARACTER_ID, sheet)
+
+        # expected
+        data = self.firebase.dump()
+        self.assertEqual(sheet, data['character_sheets'][CHARACTER_ID])
+        self.assertEqual(compact_character_data(sheet), data['characters'][CHARACTER_ID])
+
+    def test_characters_stored_as_sheets_are_projected(self):
+        # conditions
+        sheet = self.firebase.dump()['character_sheets'][CHARACTER_ID]
+        sheet['character']['removedHitPoints'] = 2
+        self.firebase.load({'characters': {CHARACTER_ID: sheet}})
+
+        # execution
+        character = self.db.get_character(CHARACTER_ID)
+
+        # expected
+        data = self.firebase.dump()
+        self.assertEqual(2, character.removed_hit_points)
+        self.assertEqual(CHARACTER_DATA_VERSION, data['characters'][CHARACTER_ID]['version'])
+        self.assertEqual(sheet, data['character_sheets'][CHARACTER_ID])
+
+    def test_old_projections_are_built_again_keeping_the_state(self):
+        # conditions
+        data = self.firebase.dump()
+        data['characters'][CHARACTER_ID]['version'] = CHARACTER_DATA_VERSION - 1
+        data['characters'][CHARACTER_ID]['character']['removedHitPoints'] = 4
+        self.firebase.load(data)
+
+        # execution
+        character = self.db.get_character(CHARACTER_ID)
+
+        # expected
+        self.assertEqual(4, character.removed_hit_points)
+        self.assertEqual(CHARACTER_DATA_VERSION, self.firebase.dump()['characters'][CHARACTER_ID]['version'])
+
+    def test_conflicting_write_is_retried(self):
+        # conditions
+        path = f'characters/{CHARACTER_ID}/character/removedHitPoints'
+        def damage(value):
+            if self.firebase.dump()['characters'][CHARACTER_ID]['character']['removedHitPoints'] == 0:
+                self.firebase.put(f'/characters/{CHARACTER_ID}/character', 'removedHitPoints', 2)
+            return value + 3
+
+        # execution
+        rtn = self.db._transaction(path, damage)
+
+        # expected
+        self.assertEqual(5, rtn)
+        self.assertEqual(5, self.firebase.dump()['characters'][CHARACTER_ID]['character']['removedHitPoints'])
+
+    def test_transaction_gives_up(self):
+        # conditions
+        def always_changed(value):
+            self.firebase.put(f'/campaigns/{CAMPAIGN_ID}', 'turn_index', value + 10)
+            return value + 1
+
+        # execution / expected
+        with self.assertRaises(ConcurrentUpdate):
+            self.db._transaction(f'campaigns/{CAMPAIGN_ID}/turn_index', always_changed)
+
+    def test_claim_update(self):
+        # execution
+        first = self.db.claim_update(10, 5)
+        second = self.db.claim_update(10, 5)
+        self.db.claim_update(15, 5)
+
+        # expected
+        self.assertTrue(first)
+        self.assertFalse(second)
+        self.assertEqual(['15'], list(self.firebase.dump()['processed_updates'].keys()))
+
+    def test_released_update_is_claimed_again(self):
+        # conditions
+        self.db.claim_update(10, 5)
+
+        # execution
+        self.db.release_update(10)
+
+        # expected
+        self.assertNotIn('processed_updates', self.firebase.dump())
+        self.assertTrue(self.db.claim_update(10, 5))
+
+    def test_concurrent_claims_of_an_update(self):
+        # conditions
+        get_with_etag = self.db._get_with_etag
+        def claimed_meanwhile(path):
+            # Both containers read the update as not processed, then the other one claims it first
+            response = get_with_etag(path)
+            self.firebase.put('/processed_updates', '10', 1)
+            return response
+
+        # execution
+        with patch.object(self.db, '_get_with_etag', side_effect=claimed_meanwhile):
+            rtn = self.db.claim_update(10, 5)
+
+        # expected
+        self.assertFalse(rtn)
+        self.assertEqual({'10': 1}, self.firebase.dump()['processed_updates'])
+
+    def test_heal_is_capped(self):
+        # execution
+        rtn = self.db.change_char_hp(CHARACTER_ID, -4, 6)
+
+        # expected
+        self.assertEqual(0, rtn)
+
+    def test_failed_command_writes_nothing(self):
+        # execution
+        with self.assertRaises(Exception):
+            self.run_command(character_handler, '/damage', 'nobody 3', 'dm')
+
+        # expected
+        self.assertEqual(0, self.firebase.count('PATCH'))
+
+    def test_list_adventures_downloads_the_summaries(self):
+        # conditions
+        big_adventure = {'name': 'Phandelver', 'level_range': [1, 5], 'locations': ['x' * 10000]}
+        self.firebase.patch('/', {
+            f'campaigns/{CAMPAIGN_ID}/adventures/-La': big_adventure,
+            f'campaigns/{CAMPAIGN_ID}/summaries/adventures/-La': {'name': 'Phandelver', 'level_range': [1, 5]}
+        })
+        self.firebase.reset_stats()
+
+        # execution
+        with self.db.unit_of_work():
+            response = adventure_handler(self.bot, Mock(), '/list_adventures', '', 'dm', CHAT_ID, self.db)
+
+        # expected
+        self.assertIn('Phandelver (Level 1-5)', response)
+        listing = self.firebase.requests[-1]
+        self.assertEqual(f'/campaigns/{CAMPAIGN_ID}/summaries/adventures', listing['path'])
+        self.assertLess(listing['received'], 100)
+
+    def test_summaries_are_built_for_old_entries(self):
+        # conditions
+        self.firebase.patch('/', {f'campaigns/{CAMPAIGN_ID}/adventures/-La': {'name': 'Phandelver', 'items': ['sword']}})
+
+        # execution
+        summaries = self.db.get_adventure_summaries(CHAT_ID)
+
+        # expected
+        self.assertEqual([{'name': 'Phandelver'}], summaries)
+        self.assertEqual({'-La': {'name': 'Phandelver'}},
+                         self.firebase.dump()['campaigns'][CAMPAIGN_ID]['summaries']['adventures'])
+
+    def test_summaries_are_built_for_old_entries_next_to_new_ones(self):
+        # conditions
+        self.firebase.patch('/', {f'campaigns/{CAMPAIGN_ID}/adventures/-La': {'name': 'Phandelver', 'items': ['sword']}})
+        self.db.add_adventure(CHAT_ID, Adventure({'name': 'Curse of Strahd', 'level_range': [1, 10]}))
+
+        # execution
+        summaries = self.db.get_adventure_summaries(CHAT_ID)
+        self.firebase.reset_stats()
+        self.db.get_adventure_summaries(CHAT_ID)
+
+        # expected
+        self.assertEqual(['Curse of Strahd', 'Phandelver'], [summary['name'] for summary in summaries])
+        # The campaign, the keys of the adventures and their summaries: nothing is built again
+        self.assertEqual(4, self.firebase.request_count)
+        self.assertEqual(0, self.firebase.count('PATCH'))
+
+    def test_adventure_with_the_same_name_is_rejected(self):
+        # conditions
+        self.db.add_adventure(CHAT_ID, Adventure({'name': 'Phandelver', 'status': 'active'}))
+
+        # execution
+        with self.assertRaises(EntityExists):
+            self.db.add_adventure(CHAT_ID, Adventure({'name': 'phandelver'}))
+
+        # expected
+        self.assertEqual('active', self.db.get_adventure_by_name(CHAT_ID, 'Phandelver').status)
+
+    def test_group_roll_of_a_stored_monster(self):
+        # conditions
+        with self.db.unit_of_work():
+            created = monster_handler(self.bot, Mock(), '/create_monster', 'Goblin humanoid 0.25', 'dm', CHAT_ID, self.db)
+        with self.db.unit_of_work():
+            updated = monster_handler(self.bot, Mock(), '/update_monster', 'goblin dex 14', 'dm', CHAT_ID, self.db)
+
+        # execution
+        with self.db.unit_of_work():
+            rtn = group_roll('goblin 3 stealth', self.db, CHAT_ID, 'dm')
+
+        # expected
+        self.assertEqual("Monster 'Goblin' created successfully!", created)
+        self.assertEqual("Monster 'goblin' updated successfully!", updated)
+        self.assertTrue(rtn.startswith('dm rolled stealth for 3 Goblin:\r\n *3x1d20+2*:'))
+        self.assertEqual(2, self.db.get_monster_by_name(CHAT_ID, 'goblin').mods['dex'])
+
+    def test_stored_npc(self):
+        # conditions
+        with self.db.unit_of_work():
+            created = npc_handler(self.bot, Mock(), '/create_npc', 'Sildar human fighter', 'dm', CHAT_ID, self.db)
+
+        # execution
+        with self.db.unit_of_work():
+            rtn = npc_handler(self.bot, Mock(), '/view_npc', 'sildar', 'dm', CHAT_ID, self.db)
+
+        # expected
+        self.assertEqual("NPC 'Sildar' created successfully!", created)
+        self.assertTrue(rtn.startswith('Sildar\nLevel: 1\nRace: human\nClass: fighter'))
+
+    def test_adventure_commands(self):
+        # conditions
+        with self.db.unit_of_work():
+            created = adventure_handler(self.bot, Mock(), '/create_adventure', 'LostMine Goblins 1-3', 'dm', CHAT_ID, self.db)
+            other = adventure_handler(self.bot, Mock(), '/create_adventure', 'Lair Dragons 5', 'dm', CHAT_ID, self.db)
+
+        # execution
+        with self.db.unit_of_work():
+            updated = adventure_handler(self.bot, Mock(), '/update_adventure', 'lostmine status active', 'dm', CHAT_ID, self.db)
+        with self.db.unit_of_work():
+            viewed = adventure_handler(self.bot, Mock(), '/view_adventure', 'LostMine', 'dm', CHAT_ID, self.db)
+
+        # expected
+        self.assertEqual("Adventure 'LostMine' created successfully!", created)
+        self.assertEqual("Adventure 'Lair' created successfully!", other)
+        self.assertEqual("Adventure 'lostmine' updated successfully!", updated)
+        self.assertTrue(viewed.startswith('Adventure: LostMine\nStatus: active\nLevel Range: [1, 3]'))
+
+    def test_create_adventure_with_invalid_levels(self):
+        # execution
+        with self.db.unit_of_work():
+            rtn = adventure_handler(self.bot, Mock(), '/create_adventure', 'LostMine Goblins easy', 'dm', CHAT_ID, self.db)
+
+        # expected
+        self.assertEqual('Usage: /create_adventure <name> <description> <level_range>', rtn)
+
+    def test_delete_adventure_removes_its_summary(self):
+        # conditions
+        self.db.add_adventure(CHAT_ID, Adventure({'name': 'Phandelver'}))
+
+        # execution
+        self.db.delete_adventure(CHAT_ID, Adventure({'name': 'Phandelver'}))
+
+        # expected
+        self.assertNotIn('summaries', self.firebase.dump()['campaigns'][CAMPAIGN_ID])
+        self.assertNotIn('adventures', self.firebase.dump()['campaigns'][CAMPAIGN_ID])
+
+    def test_view_adventure_is_a_keyed_read(self):
+        # conditions
+        self.db.add_adventure(CHAT_ID, Adventure({'name': 'Lost Mine', 'level_range': [1, 5]}))
+        self.db.add_adventure(CHAT_ID, Adventure({'name': 'Curse of Strahd', 'level_range': [1, 10]}))
+        self.firebase.reset_stats()
+
+        # execution
+        with self.db.unit_of_work():
+            adventure = self.db.get_adventure_by_name(CHAT_ID, 'lost mine')
+
+        # expected
+        self.assertEqual('Lost Mine', adventure.name)
+        self.assertEqual(f'/campaigns/{CAMPAIGN_ID}/adventures/lost-mine', self.firebase.requests[-1]['path'])
+
+    def test_update_adventure_is_a_keyed_write(self):
+        # conditions
+        self.db.add_adventure(CHAT_ID, Adventure({'name': 'Lost Mine'}))
+        adventure = self.db.get_adventure_by_name(CHAT_ID, 'Lost Mine')
+        adventure.status = 'active'
+        self.firebase.reset_stats()
+
+        # execution
+        with self.db.unit_of_work():
+            self.db.update_adventure(CHAT_ID, adventure)
+
+        # expected
+        self.assertEqual(2, self.firebase.count('GET'))  # the campaign lookup
+        self.assertEqual(1, self.firebase.count('PATCH'))
+        self.assertEqual('active', self.firebase.dump()['campaigns'][CAMPAIGN_ID]['adventures']['lost-mine']['status'])
+
+    def test_rekey_entities(self):
+        # conditions
+        self.firebase.patch('/', {
+            f'campaigns/{CAMPAIGN_ID}/adventures/-La': {'name': 'Lost Mine'},
+            f'campaigns/{CAMPAIGN_ID}/summaries/adventures/-La': {'name': 'Lost Mine'}
+        })
+
+        # execution
+        moved = self.db.rekey_entities()
+
+        # expected
+        campaign = self.firebase.dump()['campaigns'][CAMPAIGN_ID]
+        self.assertEqual(1, moved)
+        self.assertEqual({'lost-mine': {'name': 'Lost Mine'}}, campaign['adventures'])
+        self.assertEqual({'lost-mine': {'name': 'Lost Mine'}}, campaign['summaries']['adventures'])
@@ -0,0 +1,97 @@
+import time
+import socket
+import threading
+import unittest
+
+from unittest.mock import patch, Mock
+
+from exceptions import DownloadError
+
+from services import http_session
+
+class TestHttpSession(unittest.TestCase):
+    def test_session_is_shared(self):
+        self.assertIs(http_session.get_session(), http_session.get_session())
+
+    def test_connections_are_pooled_per_host(self):
+        # execution
+        adapter = http_session.get_session().get_adapter('https://api.telegram.org')
+
+        # expected
+        self.assertEqual(http_session.HTTP_POOL_MAXSIZE, adapter._pool_maxsize)
+
+    def test_get_has_a_timeout(self):
+        # conditions
+        with patch.object(http_session.get_session(), 'get') as get:
+            # execution
+            http_session.get('https://www.dnd5eapi.co/api/races/1')
+
+        # expected
+        get.assert_called_with('https://www.dnd5eapi.co/api/races/1', timeout=http_session.HTTP_TIMEOUT)
+
+    def test_read_body(self):
+        # conditions
+        response = Mock()
+        response.headers = {'Content-Length': '6'}
+        response.iter_content = Mock(return_value=[b'foo', b'bar'])
+        progress = Mock()
+
+        # execution
+        body = http_session.read_body(response, 10, 5, progress)
+
+        # expected
+        self.assertEqual(b'foobar', body)
+        progress.assert_called_with(6, 6)
+        response.close.assert_called_once()
+
+    def test_read_body_too_big_content_length(self):
+        # conditions
+        response = Mock()
+        response.headers = {'Content-Length': '11'}
+
+        # execution / expected
+        with self.assertRaises(DownloadError):
+            http_session.read_body(response, 10, 5)
+        response.iter_content.assert_not_called()
+        response.close.assert_called_once()
+
+    def test_read_body_deadline(self):
+        # conditions
+        response = Mock()
+        response.headers = {}
+        response.iter_content = Mock(return_value=[b'foo', b'bar'])
+
+        # execution / expected
+        with patch('services.http_session.time.monotonic', side_effect=[0, 6]):
+            with self.assertRaises(DownloadError):
+                http_session.read_body(response, 10, 5)
+        response.close.assert_called_once()
+
+    def test_read_body_deadline_with_a_slow_server(self):
+        # conditions
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        self.addCleanup(server.close)
+
+        def drip():
+            # Sends the body a byte at a time, so every read gets something before its timeout
+            connection, _ = server.accept()
+            connection.recv(1024)
+            connection.sendall(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n{')
+            try:
+                for _ in range(200):
+                    time.sleep(0.01)
+                    connection.sendall(b' ')
+            except OSError:
+                pass
+            connection.close()
+        threading.Thread(target=drip, daemon=True).start()
+
+        response = http_session.get(f'http://127.0.0.1:{server.getsockname()[1]}/', stream=True, timeout=1)
+        started = time.monotonic()
+
+        # execution / expected
+        with self.assertRaises(DownloadError):
+            http_session.read_body(response, 10000, 0.2)
+        self.assertLess(time.monotonic() - started, 1)
@@ -0,0 +1,85 @@
+import itertools
+import unittest
+
+from fractions import Fraction
+
+import dice
+import odds
+from exceptions import InvalidDiceExpression
+
+def chances(distribution):
+    return {total: Fraction(ways, distribution.outcomes) for total, ways in distribution.ways.items()}
+
+def brute_force(count, sides, keep=None):
+    """Chances of every total, rolling every combination of the dice."""
+    ways = {}
+    for dice_rolled in itertools.product(range(1, sides + 1), repeat=count):
+        if keep is not None:
+            dice_rolled = sorted(dice_rolled, reverse=keep[1])[:keep[0]]
+        ways[sum(dice_rolled)] = ways.get(sum(dice_rolled), 0) + 1
+    return {total: Fraction(w, sides ** count) for total, w in ways.items()}
+
+class TestOdds(unittest.TestCase):
+    def test_pool(self):
+        self.assertEqual(brute_force(3, 6), chances(odds.distribution(dice.compile_expression('3d6'))))
+
+    def test_keep(self):
+        self.assertEqual(brute_force(4, 6, (3, True)), chances(odds.distribution(dice.compile_expression('4d6kh3'))))
+        self.assertEqual(brute_force(3, 8, (2, False)), chances(odds.distribution(dice.compile_expression('3d8kl2'))))
+
+    def test_arithmetic(self):
+        # execution
+        distribution = odds.distribution(dice.compile_expression('2d20kh1+7'))
+
+        # expected
+        self.assertEqual({t + 7: c for t, c in brute_force(2, 20, (1, True)).items()}, chances(distribution))
+        self.assertEqual(8, distribution.minimum())
+        self.assertEqual(27, distribution.maximum())
+
+    def test_rerolls(self):
+        self.assertEqual({2: Fraction(1, 5), 3: Fraction(1, 5), 4: Fraction(1, 5), 5: Fraction(1, 5), 6: Fraction(1, 5)},
+                         chances(odds.distribution(dice.compile_expression('1d6r1'))))
+        self.assertEqual(Fraction(1, 36), chances(odds.distribution(dice.compile_expression('1d6ro1')))[1])
+
+    def test_group(self):
+        # execution
+        distribution = odds.distribution(dice.compile_expression('{1d6, 1d8}kh1'))
+
+        # expected
+        self.assertEqual(Fraction(1, 48), chances(distribution)[1])
+        self.assertEqual(Fraction(6, 48), chances(distribution)[8])
+
+    def test_statistics(self):
+        # execution
+        distribution = odds.distribution(dice.compile_expression('1d20+5'))
+
+        # expected
+        self.assertEqual(15.5, distribution.mean())
+        self.assertEqual(15, distribution.percentile(50))
+        self.assertEqual(0.55, distribution.chance_at_least(15))
+
+    def test_unsupported(self):
+        for text in ['3d6!', '999d999', '{1d6, 1d6, 1d6}kh2', '1d6/(1d2-1)', '1d20+dex']:
+            with self.assertRaises(InvalidDiceExpression, msg=text):
+                odds.distribution(dice.compile_expression(text))
+
+    def test_work_is_counted_for_the_whole_expression(self):
+        # conditions
+        product = dice.compile_expression('1d1000*1d1000')
+
+        # execution / expected
+        self.assertLess(odds._cost(product)[3], odds.MAX_WORK)
+        for text in ['1d1000*1d1000' + '+1' * 10, '1000d6', '200d20']:
+            with self.assertRaises(InvalidDiceExpression, msg=text):
+                odds.distribution(dice.compile_expression(text))
+
+    def test_cost_covers_the_totals(self):
+        for text in ['3d6', '4d6kh3', '2d6*1d4-3', '-1d8/(1d4+1)', '{1d6, 2d4}kh1', '{1d6, 2d4}']:
+            # execution
+            low, high, totals, _ = odds._cost(dice.compile_expression(text))
+            distribution = odds.distribution(dice.compile_expression(text))
+
+            # expected
+            self.assertLessEqual(low, distribution.minimum(), msg=text)
+            self.assertGreaterEqual(high, distribution.maximum(), msg=text)
+            self.assertGreaterEqual(totals, len(distribution.ways), msg=text)
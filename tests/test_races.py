@@ -0,0 +1,87 @@
+import unittest
+import tempfile
+
+from unittest.mock import patch, Mock
+
+from services import races
+
+class TestRaces(unittest.TestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        patcher = patch('services.races.RACE_CACHE_DIR', cache_dir.name)
+        self.addCleanup(patcher.stop)
+        patcher.start()
+        races._fetched_races.clear()
+        races._unavailable_races.clear()
+
+        get_patcher = patch('services.races.http_session.get')
+        self.addCleanup(get_patcher.stop)
+        self.get = get_patcher.start()
+
+    def test_bundled_race(self):
+        # execution
+        race_data = races.get_race_data('Half-Orc')
+
+        # expected
+        self.assertEqual([2, 0, 1, 0, 0, 0], race_data['ability_bonuses'])
+        self.get.assert_not_called()
+
+    def test_race_not_in_the_bundle_is_fetched_and_cached(self):
+        # conditions
+        response = Mock()
+        response.json = Mock(return_value={
+            'index': 'aasimar',
+            'name': 'Aasimar',
+            'ability_bonuses': [
+                {'ability_score': {'index': 'cha'}, 'bonus': 2},
+                {'ability_score': {'index': 'wis'}, 'bonus': 1}
+            ]
+        })
+        self.get.return_value = response
+
+        # execution
+        race_data = races.get_race_data('Aasimar')
+        races._fetched_races.clear()
+        cached_race_data = races.get_race_data('Aasimar')
+
+        # expected
+        self.assertEqual([0, 0, 0, 0, 1, 2], race_data['ability_bonuses'])
+        self.assertEqual(race_data, cached_race_data)
+        self.get.assert_called_once_with('https://www.dnd5eapi.co/api/races/aasimar', timeout=races.RACE_FETCH_TIMEOUT)
+
+    def test_api_down(self):
+        # conditions
+        self.get.side_effect = Exception('timeout')
+
+        # execution
+        race_data = races.get_race_data('Aasimar')
+
+        # expected
+        self.assertEqual([0, 0, 0, 0, 0, 0], race_data['ability_bonuses'])
+        self.assertTrue(race_data['unavailable'])
+        self.assertNotIn('Aasimar', races._fetched_races)
+
+    def test_api_down_is_not_retried_right_away(self):
+        # conditions
+        self.get.side_effect = Exception('timeout')
+        races.get_race_data('Aasimar')
+
+        # execution
+        race_data = races.get_race_data('Aasimar')
+
+        # expected
+        self.assertTrue(race_data['unavailable'])
+        self.assertEqual(1, self.get.call_count)
+
+    def test_api_is_retried_after_a_while(self):
+        # conditions
+        self.get.side_effect = Exception('timeout')
+        races.get_race_data('Aasimar')
+        races._unavailable_races['Aasimar'] -= races.RACE_RETRY_AFTER
+
+        # execution
+        races.get_race_data('Aasimar')
+
+        # expected
+        self.assertEqual(2, self.get.call_count)
@@ -0,0 +1,40 @@
+import json
+import unittest
+
+from unittest.mock import Mock
+from replies import InlineReplyBot
+
+OK_RESPONSE = {'statusCode': 200, 'body': json.dumps('ok')}
+
+class TestInlineReplyBot(unittest.TestCase):
+    def setUp(self):
+        self.bot = Mock()
+        self.bot.send_message = Mock()
+        self.reply_bot = InlineReplyBot(self.bot)
+
+    def test_response_without_messages(self):
+        # execution
+        rtn = self.reply_bot.response(OK_RESPONSE)
+
+        # expected
+        self.assertEqual(OK_RESPONSE, rtn)
+
+    def test_first_message_goes_in_the_response(self):
+        # execution
+        self.reply_bot.send_message(chat_id=123456, text='foo rolled: 4', parse_mode='Markdown')
+        rtn = self.reply_bot.response(OK_RESPONSE)
+
+        # expected
+        self.bot.send_message.assert_not_called()
+        self.assertEqual(200, rtn['statusCode'])
+        self.assertEqual({'method': 'sendMessage', 'chat_id': 123456, 'text': 'foo rolled: 4', 'parse_mode': 'Markdown'},
+                         json.loads(rtn['body']))
+
+    def test_next_messages_use_the_bot(self):
+        # execution
+        self.reply_bot.send_message(chat_id=123456, text='first')
+        self.reply_bot.send_message(chat_id=123456, text='second', parse_mode='Markdown')
+
+        # expected
+        self.bot.send_message.assert_called_once_with(chat_id=123456, text='second', parse_mode='Markdown')
+        self.assertEqual('first', json.loads(self.reply_bot.response(OK_RESPONSE)['body'])['text'])
@@ -0,0 +1,287 @@
+import json
+import unittest
+
+from unittest.mock import patch
+
+from sqlite_database import SQLiteDatabase
+from storage import CampaignNotFoundException
+from exceptions import EntityExists
+from models.adventure import Adventure
+from models.monster import Monster
+from models.npc import NPC
+
+CHAT_ID = 123456
+
+class TestSQLiteDatabase(unittest.TestCase):
+    def setUp(self):
+        with open('tests/fixtures/race_data.json', 'r') as rd:
+            race_data = json.loads(rd.read())
+        patcher = patch('storage.get_race_data', return_value=race_data)
+        self.addCleanup(patcher.stop)
+        patcher.start()
+
+        with open('tests/fixtures/character.json', 'r') as jd:
+            self.character_data = json.loads(jd.read())
+
+        self.db = SQLiteDatabase(':memory:')
+        self.campaign_id = self.db.create_campaign(CHAT_ID, 'The Lost Mine')
+
+    def test_get_campaign(self):
+        # execution
+        campaign_id, campaign = self.db.get_campaign(CHAT_ID)
+
+        # expected
+        self.assertEqual(self.campaign_id, campaign_id)
+        self.assertEqual('The Lost Mine', campaign['name'])
+        self.assertEqual(CHAT_ID, campaign['chat_id'])
+
+    def test_closed_campaign_is_not_active(self):
+        # execution
+        self.db.close_campaign(self.campaign_id)
+
+        # expected
+        self.assertEqual((None, None), self.db.get_campaign(CHAT_ID))
+
+    def test_set_turns_restarts_turn_index(self):
+        # conditions
+        self.db.set_turn_index(self.campaign_id, 2)
+
+        # execution
+        self.db.set_turns(self.campaign_id, ['alice', 'bob'])
+
+        # expected
+        campaign_id, campaign = self.db.get_campaign(CHAT_ID)
+        self.assertEqual(['alice', 'bob'], campaign['turns'])
+        self.assertEqual(0, campaign['turn_index'])
+
+    def test_change_turn_index(self):
+        # execution
+        self.db.change_turn_index(self.campaign_id, 1)
+        rtn = self.db.change_turn_index(self.campaign_id, 1)
+
+        # expected
+        campaign_id, campaign = self.db.get_campaign(CHAT_ID)
+        self.assertEqual(2, rtn)
+        self.assertEqual(2, campaign['turn_index'])
+
+    def test_set_char_position(self):
+        # conditions
+        self.db.start_battle(self.campaign_id, {'width': 10, 'height': 10, 'positions': {'alice': 'A1'}})
+
+        # execution
+        moved = self.db.set_char_position(self.campaign_id, 'alice', 'B2')
+        missing = self.db.set_char_position(self.campaign_id, 'bob', 'C3')
+
+        # expected
+        campaign_id, campaign = self.db.get_campaign(CHAT_ID)
+        self.assertEqual('B2', moved)
+        self.assertIsNone(missing)
+        self.assertEqual({'alice': 'B2'}, campaign['battle_field']['positions'])
+
+    def test_character_link_by_username_and_name(self):
+        # conditions
+        self.db.save_character_info('1234', self.character_data)
+
+        # execution
+        self.db.set_character_link(self.campaign_id, 'Alice', '1234')
+
+        # expected
+        name = self.character_data['character']['name']
+        self.assertEqual('1234', self.db.get_character_id(self.campaign_id, 'Alice'))
+        self.assertEqual('1234', self.db.get_character_id(self.campaign_id, name))
+        self.assertIsNone(self.db.get_character_id(self.campaign_id, 'Bob'))
+
+    def save_character(self, character_id, name):
+        character_data = json.loads(json.dumps(self.character_data))
+        character_data['character']['name'] = name
+        self.db.save_character_info(character_id, character_data)
+
+    def test_character_name_does_not_take_the_place_of_a_username(self):
+        # conditions
+        self.save_character('1', 'Bob the Brave')
+        self.save_character('2', 'Rogue')
+        self.db.set_character_link(self.campaign_id, 'bob', '2')
+
+        # execution
+        self.db.set_character_link(self.campaign_id, 'alice', '1')
+
+        # expected
+        self.assertEqual('2', self.db.get_character_id(self.campaign_id, 'bob'))
+        self.assertEqual('1', self.db.get_character_id(self.campaign_id, 'Bob the Brave'))
+
+    def test_shared_first_words_resolve_to_no_character(self):
+        # conditions
+        self.save_character('1', 'John Smith')
+        self.save_character('2', 'John Doe')
+
+        # execution
+        self.db.set_character_link(self.campaign_id, 'alice', '1')
+        self.db.set_character_link(self.campaign_id, 'bob', '2')
+
+        # expected
+        self.assertIsNone(self.db.get_character_id(self.campaign_id, 'John'))
+        self.assertEqual('1', self.db.get_character_id(self.campaign_id, 'John Smith'))
+        self.assertEqual('2', self.db.get_character_id(self.campaign_id, 'John Doe'))
+
+    def test_relink_removes_the_names_of_the_previous_character(self):
+        # conditions
+        self.save_character('1', 'Boris the Blade')
+        self.save_character('2', 'Amarok')
+        self.db.set_character_link(self.campaign_id, 'alice', '1')
+
+        # execution
+        self.db.set_character_link(self.campaign_id, 'alice', '2')
+
+        # expected
+        self.assertIsNone(self.db.get_character_id(self.campaign_id, 'Boris'))
+        self.assertEqual('2', self.db.get_character_id(self.campaign_id, 'Amarok'))
+
+    def test_set_char_hp(self):
+        # conditions
+        self.db.save_character_info('1234', self.character_data)
+
+        # execution
+        self.db.set_char_hp('1234', 5)
+
+        # expected
+        character = self.db.get_character('1234')
+        self.assertEqual(5, character.removed_hit_points)
+
+    def test_change_char_hp_is_capped(self):
+        # conditions
+        self.db.save_character_info('1234', self.character_data)
+
+        # execution
+        damaged = self.db.change_char_hp('1234', 10, 6)
+        healed = self.db.change_char_hp('1234', -2, 6)
+
+        # expected
+        self.assertEqual(6, damaged)
+        self.assertEqual(4, healed)
+
+    def test_character_is_stored_as_a_projection(self):
+        # execution
+        self.db.save_character_info('1234', self.character_data)
+
+        # expected
+        stored = self.db._fetch_one('SELECT data FROM characters WHERE id = ?', ('1234',))
+        self.assertLess(len(stored), 10000)
+        self.assertEqual(self.character_data, self.db.get_character_sheet('1234'))
+
+    def test_unit_of_work_is_rolled_back(self):
+        # execution
+        with self.assertRaises(ValueError):
+            with self.db.unit_of_work():
+                self.db.set_dm(self.campaign_id, 42, 'dm')
+                raise ValueError()
+
+        # expected
+        campaign_id, campaign = self.db.get_campaign(CHAT_ID)
+        self.assertIsNone(campaign['dm_username'])
+
+    def test_unit_of_work_is_committed(self):
+        # execution
+        with self.db.unit_of_work():
+            self.db.set_dm(self.campaign_id, 42, 'dm')
+
+        # expected
+        campaign_id, campaign = self.db.get_campaign(CHAT_ID)
+        self.assertEqual(42, campaign['dm_user_id'])
+        self.assertEqual('dm', campaign['dm_username'])
+
+    def test_adventures_by_name(self):
+        # conditions
+        self.db.add_adventure(CHAT_ID, Adventure({'name': 'Phandelver'}))
+
+        # execution
+        adventure = self.db.get_adventure_by_name(CHAT_ID, 'phandelver')
+
+        # expected
+        self.assertEqual('Phandelver', adventure.name)
+        self.assertEqual(1, len(self.db.get_adventures(CHAT_ID)))
+
+    def test_adventure_with_the_same_name_is_rejected(self):
+        # conditions
+        self.db.add_adventure(CHAT_ID, Adventure({'name': 'Phandelver', 'status': 'active'}))
+
+        # execution
+        with self.assertRaises(EntityExists):
+            self.db.add_adventure(CHAT_ID, Adventure({'name': 'phandelver'}))
+
+        # expected
+        self.assertEqual('active', self.db.get_adventure_by_name(CHAT_ID, 'Phandelver').status)
+
+    def test_adventure_summaries(self):
+        # conditions
+        self.db.add_adventure(CHAT_ID, Adventure({'name': 'Phandelver', 'level_range': [1, 5], 'items': ['sword']}))
+
+        # execution
+        summaries = self.db.get_adventure_summaries(CHAT_ID)
+
+        # expected
+        self.assertEqual([{'name': 'Phandelver', 'level_range': [1, 5], 'status': 'draft'}], summaries)
+
+    def test_delete_adventure(self):
+        # conditions
+        self.db.add_adventure(CHAT_ID, Adventure({'name': 'Phandelver'}))
+
+        # execution
+        self.db.delete_adventure(CHAT_ID, Adventure({'name': 'Phandelver'}))
+
+        # expected
+        self.assertIsNone(self.db.get_adventure_by_name(CHAT_ID, 'Phandelver'))
+
+    def test_monsters_by_name(self):
+        # conditions
+        self.db.add_monster(CHAT_ID, Monster({'name': 'Goblin', 'type': 'humanoid', 'dex': 14, 'max_hit_points': 7}))
+
+        # execution
+        monster = self.db.get_monster_by_name(CHAT_ID, 'goblin')
+
+        # expected
+        self.assertEqual('Goblin', monster.name)
+        self.assertEqual(2, monster.initiative)
+        self.assertEqual(2, monster.mods['stealth'])
+        self.assertEqual([{'name': 'Goblin', 'type': 'humanoid', 'challenge_rating': 0, 'max_hit_points': 7}],
+                         self.db.get_monster_summaries(CHAT_ID))
+
+    def test_npcs_by_name(self):
+        # conditions
+        self.db.add_npc(CHAT_ID, NPC({'name': 'Sildar', 'race': 'human', 'class': 'fighter', 'str': 16}))
+
+        # execution
+        npc = self.db.get_npc_by_name(CHAT_ID, 'sildar')
+
+        # expected
+        self.assertEqual('fighter', npc._class)
+        self.assertEqual(3, npc.mods['athletics'])
+        self.assertEqual(1, len(self.db.get_npcs(CHAT_ID)))
+
+    def test_npcs_without_campaign(self):
+        # conditions
+        self.db.close_campaign(self.campaign_id)
+
+        # execution / expected
+        with self.assertRaises(CampaignNotFoundException):
+            self.db.get_npcs(CHAT_ID)
+
+    def test_claim_update(self):
+        # execution
+        first = self.db.claim_update(10, 5)
+        second = self.db.claim_update(10, 5)
+        self.db.claim_update(20, 5)
+
+        # expected
+        self.assertTrue(first)
+        self.assertFalse(second)
+        self.assertTrue(self.db.claim_update(10, 5))
+
+    def test_released_update_is_claimed_again(self):
+        # conditions
+        self.db.claim_update(10, 5)
+
+        # execution
+        self.db.release_update(10)
+
+        # expected
+        self.assertTrue(self.db.claim_update(10, 5))
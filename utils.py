@@ -5,3 +5,10 @@ def to_snake_case(text):
     text = text.lower()
     text = text.replace(' ', '-')
     return text
+
+def index_key(text):
+    """Key used to look up a username or a character name in the database indexes."""
+    key = to_snake_case(normalized_username(text))
+    for c in '.$#[]/':
+        key = key.replace(c, '')
+    return key